@@ -6,6 +6,7 @@ from threading import Thread
 import requests
 
 import isodesign
+import isodesign.ui.cli
 
 def get_last_version():
     """Get last IsoDesign version."""
@@ -23,7 +24,7 @@ def main():
     """The main routine"""
 
     if len(sys.argv) > 1:
-        isodesign.ui.cli.main()
+        return isodesign.ui.cli.main()
     else:
         thread = Thread(target=get_last_version)
         thread.start()
@@ -0,0 +1,469 @@
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import os
+from pathlib import Path
+import numpy as np
+
+logger = logging.getLogger(f"IsoDesign.{__name__}")
+
+# Columns of the linp files
+LINP_COLUMNS = ["Id", "Comment", "Specie", "Isotopomer", "Value", "Price"]
+
+
+class CombinationStore:
+    """
+    Compact storage of the combinations of labelled substrates that will be
+    written in linp files. Species and labelling patterns are shared by all
+    combinations, so that only the fractions (one row per combination and
+    one column per isotopomer) are stored for each combination.
+
+    Combinations are selected with a boolean mask over their rows ("enabled"): 
+    they are never moved nor deleted, so that their IDs stay stable. Changes 
+    of the selection are recorded and can be undone.
+    """
+    # Maximal number of changes of the selection that can be undone
+    HISTORY_SIZE = 100
+
+    def __init__(self, species: list, patterns: list, prices: list = None, dtype=np.float64):
+        """
+        :param species: species (substrate names) of the isotopomers
+        :param patterns: labelling patterns of the isotopomers
+        :param prices: prices of the isotopomers (None if unknown)
+        :param dtype: dtype of the fractions matrix
+        """
+        if len(species) != len(patterns):
+            raise ValueError("Species and labelling patterns must have the same length")
+
+        self.species = list(species)
+        self.patterns = list(patterns)
+        # Price of each isotopomer (NaN if unknown)
+        self.prices = np.array([np.nan if price is None else price
+                                for price in (prices if prices is not None else [None] * len(species))], dtype=np.float64)
+        # Fractions of each isotopomer, one row per combination
+        self.fractions = np.empty((0, len(self.species)), dtype=dtype)
+        # Combinations to write in linp files (False for the removed ones)
+        self.enabled = np.ones(0, dtype=bool)
+        # Number of digits of the combination IDs ("ID_{row number:0{id_digits}d}"),
+        # computed from the number of combinations of the store
+        self.id_digits = 1
+        # Combinations added when the IDs needed more digits (see append) keep the IDs of
+        # the previous combinations unchanged: list of tuples of the first row with more
+        # digits and of the number of digits of its IDs
+        self.id_widenings = []
+        # IDs of the combinations when they cannot be deduced from the row numbers
+        self._ids = None
+        # Changes of the selection, as tuples of the changed rows and their previous states
+        self.history = []
+
+    def __setstate__(self, state):
+        # The selection history and the widenings of the IDs were not saved in previous versions
+        self.__dict__.update({"history": [], "id_widenings": [], **state})
+
+    def __len__(self):
+        return len(self.fractions)
+
+    def __repr__(self) -> str:
+        return f"CombinationStore({len(self)} combinations, {int(self.enabled.sum())} enabled, " \
+               f"{len(self.species)} isotopomers)"
+
+    @classmethod
+    def from_blocks(cls, species, patterns, prices, blocks, nb_combinations, dtype=np.float64, max_combinations=None):
+        """
+        Build a store from blocks of combinations. Each block is copied in the
+        fractions matrix as soon as it is read.
+
+        :param species: species (substrate names) of the isotopomers
+        :param patterns: labelling patterns of the isotopomers
+        :param prices: prices of the isotopomers (None if unknown)
+        :param blocks: iterable of 2D arrays of fractions (one row per combination)
+        :param nb_combinations: total number of combinations in the blocks. If None (e.g. when 
+                                the blocks are filtered), see max_combinations.
+        :param dtype: dtype of the fractions matrix
+        :param max_combinations: upper bound of the number of combinations in the blocks, used
+                                 when nb_combinations is None: the fractions matrix is allocated
+                                 for this number of combinations and shrunk once all blocks are read.
+                                 If both are None, the blocks are concatenated once all read.
+
+        :return: CombinationStore object
+        """
+        store = cls(species, patterns, prices, dtype)
+        if nb_combinations is None and max_combinations is None:
+            blocks = [np.asarray(block, dtype=dtype).reshape(-1, len(store.species)) for block in blocks]
+            store.fractions = np.concatenate(blocks) if blocks else store.fractions
+            nb_combinations = len(store.fractions)
+        else:
+            size = nb_combinations if nb_combinations is not None else max_combinations
+            store.fractions = np.empty((size, len(store.species)), dtype=dtype)
+
+            start = 0
+            for block in blocks:
+                if start + len(block) > size:
+                    raise ValueError(f"More than {size} combinations have been read")
+                store.fractions[start:start + len(block)] = block
+                start += len(block)
+            if nb_combinations is None:
+                # Rows of the combinations removed from the blocks are released
+                store.fractions.resize((start, len(store.species)), refcheck=False)
+                nb_combinations = start
+            elif start != nb_combinations:
+                raise ValueError(f"{start} combinations have been read instead of {nb_combinations}")
+
+        store.enabled = np.ones(nb_combinations, dtype=bool)
+        store.id_digits = len(str(nb_combinations))
+        return store
+
+    @classmethod
+    def from_linp_dataframes(cls, linp_dataframes: dict):
+        """
+        Build a store from linp dataframes in dictionary format
+        (key : combination ID, value : dictionary with "Specie", "Isotopomer",
+        "Value" and "Price" lists). Isotopomers missing from a combination
+        get a fraction of 0.
+
+        :param linp_dataframes: dictionary of linp dataframes
+
+        :return: CombinationStore object
+        """
+        # Shared index of the isotopomers. Isotopomers missing from the previous 
+        # combinations are inserted after the isotopomer preceding them in their combination
+        ordered_columns = []
+        prices = {}
+        for dataframe in linp_dataframes.values():
+            position = 0
+            for specie, isotopomer, value, price in zip(dataframe["Specie"], dataframe["Isotopomer"],
+                                                        dataframe["Value"], dataframe["Price"]):
+                if (specie, isotopomer) in ordered_columns:
+                    position = ordered_columns.index((specie, isotopomer)) + 1
+                else:
+                    ordered_columns.insert(position, (specie, isotopomer))
+                    position += 1
+                # Price of the isotopomer is deduced from the price of the row
+                if value and price is not None and not np.isnan(price):
+                    prices[(specie, isotopomer)] = price / value
+        columns = {column: index for index, column in enumerate(ordered_columns)}
+
+        store = cls([specie for specie, _ in columns], [isotopomer for _, isotopomer in columns],
+                    [prices.get(column) for column in columns])
+        store.fractions = np.zeros((len(linp_dataframes), len(columns)), dtype=np.float64)
+        for row, dataframe in enumerate(linp_dataframes.values()):
+            for specie, isotopomer, value in zip(dataframe["Specie"], dataframe["Isotopomer"], dataframe["Value"]):
+                store.fractions[row, columns[(specie, isotopomer)]] = value
+
+        store.enabled = np.ones(len(linp_dataframes), dtype=bool)
+        store.id_digits = len(str(len(linp_dataframes)))
+        if list(linp_dataframes.keys()) != [store.get_id(row) for row in range(len(store))]:
+            store._ids = list(linp_dataframes.keys())
+        return store
+
+    def append(self, fractions, enabled=True):
+        """
+        Add combinations at the end of the store. IDs of the previous
+        combinations are not modified: if the new combinations need IDs
+        with more digits, the wider format only applies to them.
+
+        :param fractions: 2D array of fractions (one row per combination)
+        :param enabled: if True, the new combinations will be written in linp files
+
+        :return: row numbers of the new combinations
+        """
+        if self._ids is not None:
+            raise ValueError("Combinations cannot be added to a store built with explicit IDs")
+        rows = np.arange(len(self), len(self) + len(fractions))
+        digits = len(str(len(self) + len(rows)))
+        if len(rows) and digits > self._row_digits(len(self) - 1):
+            self.id_widenings.append((len(self), digits))
+        self.fractions = np.vstack((self.fractions, np.asarray(fractions, dtype=self.fractions.dtype).reshape(-1, len(self.species))))
+        self.enabled = np.concatenate((self.enabled, np.full(len(rows), enabled, dtype=bool)))
+        return rows
+
+    def set_enabled(self, rows, enabled=True):
+        """
+        Enable or disable combinations. The change can be undone with undo().
+
+        :param rows: row numbers of the combinations
+        :param enabled: True to enable the combinations, False to disable them
+
+        :return: row numbers whose state has changed
+        """
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        if np.any((rows < 0) | (rows >= len(self))):
+            raise IndexError(f"Invalid row numbers: {rows[(rows < 0) | (rows >= len(self))].tolist()}")
+
+        changed_rows = np.unique(rows[self.enabled[rows] != enabled])
+        if len(changed_rows):
+            self.history.append((changed_rows, self.enabled[changed_rows].copy()))
+            del self.history[:-self.HISTORY_SIZE]
+            self.enabled[changed_rows] = enabled
+        return changed_rows
+
+    def set_enabled_where(self, predicate, enabled=True):
+        """
+        Enable or disable all combinations for which a predicate is True, in a single change.
+
+        :param predicate: function taking the store as argument and returning a boolean 
+                          vector with one value per combination (e.g. 
+                          lambda store: store.total_prices() > 100)
+        :param enabled: True to enable the combinations, False to disable them
+
+        :return: row numbers whose state has changed
+        """
+        mask = np.asarray(predicate(self), dtype=bool)
+        if mask.shape != (len(self),):
+            raise ValueError(f"The predicate must return one boolean per combination ({len(self)} combinations)")
+        return self.set_enabled(np.flatnonzero(mask), enabled)
+
+    def undo(self):
+        """
+        Undo the last change of the selection.
+
+        :return: row numbers whose state has been restored (empty if there is nothing to undo)
+        """
+        if not self.history:
+            return np.empty(0, dtype=np.int64)
+        rows, previous_states = self.history.pop()
+        self.enabled[rows] = previous_states
+        return rows
+
+    def get_id(self, row):
+        """
+        Return the ID of a combination.
+
+        :param row: row number of the combination in the store
+        """
+        if self._ids is not None:
+            return self._ids[row]
+        return f"ID_{row + 1:0{self._row_digits(row)}d}"
+
+    def _row_digits(self, row):
+        """
+        Number of digits of the ID of a row (see id_widenings)
+        """
+        digits = self.id_digits
+        for first_row, widened_digits in self.id_widenings:
+            if row >= first_row:
+                digits = widened_digits
+        return digits
+
+    def get_row(self, combination_id):
+        """
+        Return the row number of a combination from its ID.
+
+        :param combination_id: ID of the combination
+        """
+        if self._ids is not None:
+            try:
+                return self._ids.index(combination_id)
+            except ValueError:
+                raise KeyError(combination_id)
+
+        prefix, _, number = combination_id.partition("_")
+        if prefix != "ID" or not number.isdigit() or not 1 <= int(number) <= len(self) \
+                or combination_id != self.get_id(int(number) - 1):
+            raise KeyError(combination_id)
+        return int(number) - 1
+
+    @property
+    def ids(self):
+        """
+        IDs of all combinations
+        """
+        return [self.get_id(row) for row in range(len(self))]
+
+    @property
+    def enabled_rows(self):
+        """
+        Row numbers of the combinations to write in linp files
+        """
+        return np.flatnonzero(self.enabled)
+
+    @property
+    def disabled_rows(self):
+        """
+        Row numbers of the removed combinations
+        """
+        return np.flatnonzero(~self.enabled)
+
+    @property
+    def labeled(self):
+        """
+        Boolean vector, True for the isotopomers containing at least one labelled atom
+        """
+        return np.array(["1" in pattern for pattern in self.patterns], dtype=bool)
+
+    def row_prices(self, rows=None):
+        """
+        Price of each isotopomer multiplied by its fraction, for the given combinations.
+
+        :param rows: row numbers of the combinations (all combinations if None)
+
+        :return: 2D float array with one row per combination and one column per isotopomer
+        """
+        fractions = self.fractions if rows is None else self.fractions[rows]
+        return fractions * self.prices
+
+    def total_prices(self, rows=None):
+        """
+        Total price of the given combinations. Unknown prices are ignored, 
+        as when summing the "Price" column of a linp dataframe.
+
+        :param rows: row numbers of the combinations (all combinations if None)
+
+        :return: float vector with one price per combination
+        """
+        return np.nansum(self.row_prices(rows), axis=1)
+
+    def nb_labeled_inputs(self, rows=None):
+        """
+        Number of labelled isotopomers with a fraction different from 0 in the given combinations.
+
+        :param rows: row numbers of the combinations (all combinations if None)
+
+        :return: int vector with one number per combination
+        """
+        fractions = self.fractions if rows is None else self.fractions[rows]
+        return np.count_nonzero(fractions[:, self.labeled], axis=1)
+
+    def canonical_rows(self, rows=None, decimals=12):
+        """
+        Find the combinations whose linp files have the same content. Rows with 
+        a fraction of 0 are not written in linp files, and each column corresponds 
+        to a single isotopomer, so two combinations give the same linp file when 
+        their fractions are equal. Fractions are rounded to ignore floating point noise.
+
+        :param rows: row numbers of the combinations (enabled combinations if None)
+        :param decimals: number of decimals used to compare the fractions
+
+        :return: int vector giving, for each combination, the row number of the first
+                 combination (in row order) with the same linp content
+        """
+        rows = self.enabled_rows if rows is None else np.asarray(rows)
+        if not len(rows):
+            return rows
+        # Adding 0.0 turns -0.0 into 0.0 so that both are considered equal
+        content = np.round(self.fractions[rows].astype(np.float64), decimals) + 0.0
+        _, first_rows, inverse = np.unique(content, axis=0, return_index=True, return_inverse=True)
+        return rows[first_rows[inverse.reshape(-1)]]
+
+    def to_linp_dict(self, row):
+        """
+        Return the content of the linp file of a combination in dictionary format.
+        Isotopomers with a fraction of 0 are not included.
+
+        :param row: row number of the combination in the store
+
+        :return: dictionary with "Id", "Comment", "Specie", "Isotopomer", "Value" and "Price" lists
+        """
+        fractions = self.fractions[row]
+        columns = np.flatnonzero(fractions)
+        return {"Id": [None] * len(columns),
+                "Comment": [None] * len(columns),
+                "Specie": [self.species[column] for column in columns],
+                "Isotopomer": [self.patterns[column] for column in columns],
+                "Value": fractions[columns].astype(float).tolist(),
+                # Unknown prices are given as np.nan
+                "Price": [np.nan if np.isnan(price) else price 
+                          for price in (self.prices[columns] * fractions[columns]).tolist()]}
+
+    def format_linp(self, row, line_terminator=os.linesep):
+        """
+        Return the content of the linp file of a combination as a string. The 
+        content is the same as the TSV written by pandas from to_linp_dict 
+        (DataFrame.to_csv with sep="\\t" and index=False): None and NaN are 
+        written as empty fields and floats with their shortest representation.
+
+        :param row: row number of the combination in the store
+        :param line_terminator: end of line characters (os.linesep, as pandas)
+        """
+        fractions = self.fractions[row]
+        columns = np.flatnonzero(fractions)
+        values = fractions[columns].astype(float).tolist()
+        prices = (self.prices[columns] * fractions[columns]).tolist()
+        lines = ["\t".join(LINP_COLUMNS)]
+        lines += [f"\t\t{self.species[column]}\t{self.patterns[column]}\t{value!r}\t{'' if np.isnan(price) else repr(price)}"
+                  for column, value, price in zip(columns.tolist(), values, prices)]
+        return line_terminator.join(lines) + line_terminator
+
+    def write_linp_files(self, rows, folder, max_workers=None, previous_hashes: dict = None):
+        """
+        Write the linp files of combinations ("{combination ID}.linp") in a folder. 
+        Files are formatted directly from the fractions matrix and written by 
+        a pool of threads, each thread writing a contiguous chunk of the rows.
+        Each file is identified by a hash of its content: files whose content 
+        has the same hash as in a previous generation are not written again.
+
+        :param rows: row numbers of the combinations
+        :param folder: folder in which the files are written
+        :param max_workers: maximal number of threads (see ThreadPoolExecutor)
+        :param previous_hashes: hashes of the files of a previous generation 
+                                (key : file name, value : hash of the content)
+
+        :return: dictionary containing as key the name of each file and as value the hash of its content
+        """
+        folder = Path(folder)
+        rows = np.asarray(rows, dtype=np.int64).tolist()
+        previous_hashes = previous_hashes or {}
+
+        def write_chunk(chunk):
+            hashes = {}
+            for row in chunk:
+                file_name = f"{self.get_id(row)}.linp"
+                content = self.format_linp(row)
+                hashes[file_name] = hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+                if previous_hashes.get(file_name) == hashes[file_name] and (folder / file_name).is_file():
+                    continue
+                # newline="" : line terminators are written as given
+                with open(folder / file_name, "w", newline="", encoding="utf-8") as linp_file:
+                    linp_file.write(content)
+            return hashes
+
+        # Same default number of threads as ThreadPoolExecutor
+        max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        # Several chunks per thread to balance the load
+        chunk_size = max(1, -(-len(rows) // (max_workers * 4)))
+        hashes = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Iterating over the results propagates the exceptions raised in the threads
+            for chunk_hashes in executor.map(write_chunk, [rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size)]):
+                hashes.update(chunk_hashes)
+        return hashes
+
+
+class LinpDataframes(Mapping):
+    """
+    Read-only view of a CombinationStore as a dictionary of linp dataframes
+    (key : combination ID, value : linp dataframe in dictionary format).
+    Rows are built on access, so that the view holds no data of its own.
+    """
+
+    def __init__(self, store: CombinationStore, enabled=True):
+        """
+        :param store: CombinationStore object
+        :param enabled: if True, the view contains the enabled combinations,
+                        otherwise the removed ones
+        """
+        self.store = store
+        self.enabled = enabled
+
+    @property
+    def rows(self):
+        """
+        Row numbers of the combinations of the view
+        """
+        return self.store.enabled_rows if self.enabled else self.store.disabled_rows
+
+    def __getitem__(self, combination_id):
+        row = self.store.get_row(combination_id)
+        if self.store.enabled[row] != self.enabled:
+            raise KeyError(combination_id)
+        return self.store.to_linp_dict(row)
+
+    def __iter__(self):
+        return (self.store.get_id(row) for row in self.rows)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.store.enabled == self.enabled))
+
+    def __repr__(self) -> str:
+        return f"LinpDataframes({list(self)})"
@@ -0,0 +1,159 @@
+import logging
+import numpy as np
+
+logger = logging.getLogger(f"IsoDesign.{__name__}")
+
+# Tolerance used to compare fractions (fractions are computed from integer numerators)
+TOLERANCE = 1e-9
+
+
+class Constraints:
+    """
+    Constraints on the combinations of labelled substrates, applied while the
+    combinations are generated so that infeasible combinations are never stored.
+
+    Constraints on a single substrate (minimal fraction of an isotopomer, range of
+    13C enrichment) are applied to the combinations of its isotopomers group. Constraints
+    on whole combinations (total price, number of labelled inputs) are additive over
+    the groups: a combination of a group is discarded as soon as it cannot respect
+    them whatever the combinations of the other groups, the remaining combinations
+    being checked block by block.
+    """
+
+    def __init__(self, max_price=None, max_labeled_inputs=None, min_fractions: dict = None, enrichment_ranges: dict = None):
+        """
+        :param max_price: maximal total price of a combination (isotopomers without price are free)
+        :param max_labeled_inputs: maximal number of labelled isotopomers in a combination
+        :param min_fractions: minimal fraction of isotopomers.
+                              Key : (substrate name, labelling), value : minimal fraction
+        :param enrichment_ranges: range of the 13C enrichment (mean fraction of labelled atoms) of substrates.
+                                  Key : substrate name, value : (minimal enrichment, maximal enrichment)
+        """
+        self.max_price = max_price
+        self.max_labeled_inputs = max_labeled_inputs
+        self.min_fractions = dict(min_fractions or {})
+        self.enrichment_ranges = dict(enrichment_ranges or {})
+
+        for (substrate, labelling), min_fraction in self.min_fractions.items():
+            if not 0 <= min_fraction <= 1:
+                raise ValueError(f"Minimal fraction of {labelling} ({substrate}) should be between 0 and 1")
+        for substrate, (min_enrichment, max_enrichment) in self.enrichment_ranges.items():
+            if not 0 <= min_enrichment <= max_enrichment <= 1:
+                raise ValueError(f"Enrichment range of {substrate} should be included in [0, 1]")
+
+    def __repr__(self) -> str:
+        constraints = [f"total price <= {self.max_price}" if self.max_price is not None else None,
+                       f"labeled inputs <= {self.max_labeled_inputs}" if self.max_labeled_inputs is not None else None]
+        constraints += [f"{labelling} ({substrate}) >= {min_fraction}" for (substrate, labelling), min_fraction in self.min_fractions.items()]
+        constraints += [f"{min_enrichment} <= {substrate} enrichment <= {max_enrichment}"
+                        for substrate, (min_enrichment, max_enrichment) in self.enrichment_ranges.items()]
+        return ", ".join(constraint for constraint in constraints if constraint is not None)
+
+    @property
+    def on_combinations(self):
+        """
+        True if some constraints apply to whole combinations
+        (they can only be checked once the isotopomers groups are combined)
+        """
+        return self.max_price is not None or self.max_labeled_inputs is not None
+
+    @staticmethod
+    def _prices(isotopomers):
+        return np.array([isotopomer.price if isotopomer.price is not None else 0 for isotopomer in isotopomers], dtype=np.float64)
+
+    @staticmethod
+    def _labeled(isotopomers):
+        return np.array(["1" in isotopomer.labelling for isotopomer in isotopomers], dtype=bool)
+
+    def check_isotopomers(self, isotopomer_group: dict):
+        """
+        Check that the constrained isotopomers and substrates exist.
+
+        :param isotopomer_group: dictionary containing as key substrate name of the isotopomer group
+                                 and as values a list of isotopomer
+        """
+        for substrate, labelling in self.min_fractions:
+            if labelling not in [isotopomer.labelling for isotopomer in isotopomer_group.get(substrate, [])]:
+                raise ValueError(f"Isotopomer {labelling} of {substrate} is constrained but has not been added")
+        for substrate in self.enrichment_ranges:
+            if substrate not in isotopomer_group:
+                raise ValueError(f"{substrate} is constrained but has no isotopomers")
+
+    def group_mask(self, substrate, isotopomers, fractions):
+        """
+        Apply the constraints on a single substrate to the combinations of its isotopomers group.
+
+        :param substrate: substrate name of the isotopomers group
+        :param isotopomers: list of isotopomers of the group
+        :param fractions: 2D array of fractions (one row per combination and one column per isotopomer)
+
+        :return: boolean vector, True for the combinations respecting the constraints
+        """
+        mask = np.ones(len(fractions), dtype=bool)
+        for column, isotopomer in enumerate(isotopomers):
+            min_fraction = self.min_fractions.get((substrate, isotopomer.labelling))
+            if min_fraction is not None:
+                mask &= fractions[:, column] >= min_fraction - TOLERANCE
+
+        if substrate in self.enrichment_ranges:
+            min_enrichment, max_enrichment = self.enrichment_ranges[substrate]
+            enrichment = fractions @ np.array([isotopomer.labelling.count("1") / len(isotopomer.labelling) for isotopomer in isotopomers])
+            mask &= (enrichment >= min_enrichment - TOLERANCE) & (enrichment <= max_enrichment + TOLERANCE)
+        return mask
+
+    def prune_groups(self, isotopomer_group: dict, groups_fractions: dict):
+        """
+        Return the combinations of each isotopomers group that can be part of a
+        feasible combination: they respect the constraints on their substrate, and
+        their contribution to the total price and to the number of labelled inputs
+        leaves room for the smallest contribution of the other groups.
+
+        :param isotopomer_group: dictionary containing as key substrate name of the isotopomer group
+                                 and as values a list of isotopomer
+        :param groups_fractions: combinations of each isotopomers group (2D arrays of fractions)
+
+        :return: dictionary containing as key the substrate name and as value a boolean vector,
+                 True for the combinations to keep
+        """
+        masks = {substrate: self.group_mask(substrate, isotopomer_group[substrate], fractions)
+                 for substrate, fractions in groups_fractions.items()}
+
+        contributions = []
+        if self.max_price is not None:
+            contributions.append(({substrate: fractions @ self._prices(isotopomer_group[substrate])
+                                   for substrate, fractions in groups_fractions.items()}, self.max_price))
+        if self.max_labeled_inputs is not None:
+            contributions.append(({substrate: np.count_nonzero(fractions[:, self._labeled(isotopomer_group[substrate])], axis=1)
+                                   for substrate, fractions in groups_fractions.items()}, self.max_labeled_inputs))
+
+        for group_contributions, maximum in contributions:
+            # Smallest contribution of each group among its remaining combinations
+            minimums = {substrate: values[masks[substrate]].astype(np.float64).min(initial=np.inf) for substrate, values in group_contributions.items()}
+            for substrate, values in group_contributions.items():
+                others = sum(minimum for other, minimum in minimums.items() if other != substrate)
+                masks[substrate] &= values + others <= maximum + TOLERANCE
+        return masks
+
+    def mask(self, isotopomer_group: dict, fractions):
+        """
+        Apply all constraints to whole combinations.
+
+        :param isotopomer_group: dictionary containing as key substrate name of the isotopomer group
+                                 and as values a list of isotopomer
+        :param fractions: 2D array of fractions (one row per combination and one column per isotopomer,
+                          in the order of the groups)
+
+        :return: boolean vector, True for the combinations respecting the constraints
+        """
+        mask = np.ones(len(fractions), dtype=bool)
+        start = 0
+        for substrate, isotopomers in isotopomer_group.items():
+            mask &= self.group_mask(substrate, isotopomers, fractions[:, start:start + len(isotopomers)])
+            start += len(isotopomers)
+
+        isotopomers = [isotopomer for group in isotopomer_group.values() for isotopomer in group]
+        if self.max_price is not None:
+            mask &= fractions @ self._prices(isotopomers) <= self.max_price + TOLERANCE
+        if self.max_labeled_inputs is not None:
+            mask &= np.count_nonzero(fractions[:, self._labeled(isotopomers)], axis=1) <= self.max_labeled_inputs
+        return mask
@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(f"IsoDesign.{__name__}")
+
+# pyarrow is optional: the summary is only exported in tsv format without it
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Formats in which the summary can be exported (file extension of each format)
+SUMMARY_FORMATS = {"parquet": ".parquet", "feather": ".feather", "tsv": ".tsv"}
+# Background color of the rows with missing values in the Excel summary
+MISSING_VALUES_COLOR = "#fffbcc"
+
+# Excel files are written one after the other in a background thread
+_excel_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="IsoDesign-excel")
+
+
+def export_summary(dataframe: pd.DataFrame, path_stem, formats=tuple(SUMMARY_FORMATS)):
+    """
+    Export the summary dataframe in columnar (Parquet, Feather) and/or text (tsv) formats.
+    Columnar formats need pyarrow: they are skipped if it is not installed.
+
+    :param dataframe: summary dataframe
+    :param path_stem: path of the exported files without extension
+    :param formats: formats of the exported files (see SUMMARY_FORMATS)
+    :return: list of paths of the exported files
+    """
+    for summary_format in formats:
+        if summary_format not in SUMMARY_FORMATS:
+            raise ValueError(f"Invalid summary format '{summary_format}'. Valid formats: {', '.join(SUMMARY_FORMATS)}.")
+
+    paths = []
+    for summary_format in formats:
+        path = Path(f"{path_stem}{SUMMARY_FORMATS[summary_format]}")
+        if summary_format == "tsv":
+            dataframe.to_csv(path, sep="\t", index=False)
+        elif pyarrow is None:
+            logger.warning(f"pyarrow is not installed, the summary is not exported in {summary_format} format.")
+            continue
+        elif summary_format == "parquet":
+            dataframe.to_parquet(path, index=False)
+        else:
+            # Feather files need a default index
+            dataframe.reset_index(drop=True).to_feather(path)
+        paths.append(path)
+    logger.debug(f"Summary exported in {[str(path) for path in paths]}")
+    return paths
+
+
+def missing_values_styles(dataframe: pd.DataFrame):
+    """
+    Return the styles of the cells of the summary: rows with at least one
+    missing value are highlighted (a single mask computed for the whole dataframe).
+
+    :param dataframe: summary dataframe
+    :return: dataframe of the CSS styles of the cells
+    """
+    missing_rows = dataframe.isna().to_numpy().any(axis=1)
+    styles = np.where(missing_rows[:, np.newaxis], f"background-color: {MISSING_VALUES_COLOR}", "")
+    return pd.DataFrame(np.broadcast_to(styles, dataframe.shape), index=dataframe.index, columns=dataframe.columns)
+
+
+def write_excel_summary(dataframe: pd.DataFrame, path):
+    """
+    Write the summary in an Excel file with the rows with missing values highlighted.
+    The file is replaced at once, so that it is never read incomplete.
+
+    :param dataframe: summary dataframe
+    :param path: path of the Excel file
+    :return: path of the Excel file
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f"~{path.name}")
+    dataframe.style.apply(missing_values_styles, axis=None).to_excel(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    logger.debug(f"Excel summary written in '{path}'")
+    return path
+
+
+def write_excel_summary_in_background(dataframe: pd.DataFrame, path):
+    """
+    Write the Excel summary (see write_excel_summary) in a background thread.
+    Errors of the export are logged as soon as it is finished.
+
+    :return: Future object of the export (its result is the path of the Excel file)
+    """
+    future = _excel_executor.submit(write_excel_summary, dataframe, path)
+    future.add_done_callback(_log_excel_error)
+    return future
+
+
+def _log_excel_error(future):
+    """
+    Log the error of a background Excel export (the Future may never be checked)
+    """
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"The Excel summary could not be written: {future.exception()}")
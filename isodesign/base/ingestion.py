@@ -0,0 +1,134 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import io
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(f"IsoDesign.{__name__}")
+
+# Columns of the tvar.sim files used in the summary
+TVAR_SIM_COLUMNS = ["Name", "Kind", "Value", "SD", "Struct_identif"]
+# Types of the numeric columns when the rows of several files are parsed at once
+TVAR_SIM_DTYPES = {"Value": np.float64, "SD": np.float64}
+
+# namedtuple containing the results of a tvar.sim file: ID of the linp file, flux names,
+# flux kinds, flux values, SDs and number of structurally identified fluxes
+tvar_sim_results = namedtuple("tvar_sim_results", ["linp_id", "names", "kinds", "values", "sds", "nb_identified"])
+
+
+def _parse_tvar_sim(text, dtype=None):
+    """
+    Parse the content of one or several tvar.sim files (with a single header line)
+
+    :param text: content of the files
+    :param dtype: types of the columns (None to infer them)
+    """
+    return pd.read_csv(io.StringIO(text), sep="\t", usecols=TVAR_SIM_COLUMNS, dtype=dtype)
+
+
+def _split_results(linp_ids, data, nb_rows):
+    """
+    Split the parsed rows of consecutive tvar.sim files.
+
+    :param linp_ids: IDs of the linp files of the tvar.sim files
+    :param data: dataframe of the rows of all files
+    :param nb_rows: number of rows of each file
+    :return: list of tvar_sim_results namedtuples
+    """
+    columns = {column: data[column].to_numpy() for column in TVAR_SIM_COLUMNS}
+    identified = columns["Struct_identif"] == "yes"
+    starts = np.concatenate(([0], np.cumsum(nb_rows)))
+    return [tvar_sim_results(linp_id, *(columns[column][start:end] for column in ["Name", "Kind", "Value", "SD"]),
+                             int(np.count_nonzero(identified[start:end])))
+            for linp_id, start, end in zip(linp_ids, starts[:-1], starts[1:])]
+
+
+def _file_results(path, text):
+    """
+    Parse the content of a single tvar.sim file
+    """
+    data = _parse_tvar_sim(text)
+    return _split_results([Path(path).name.split(".")[0]], data, [len(data)])[0]
+
+
+def read_tvar_sim(path):
+    """
+    Read all the columns of a tvar.sim file used in the summary at once.
+
+    :param path: path of the tvar.sim file
+    :return: tvar_sim_results namedtuple
+    """
+    return _file_results(path, Path(path).read_text(encoding="utf-8"))
+
+
+def read_tvar_sim_files(paths, max_workers=None):
+    """
+    Read tvar.sim files: the files are read in parallel, then the rows of all files
+    with the same header are parsed at once, so that each file is parsed only once
+    and the values are parsed exactly as if the files were parsed separately.
+
+    :param paths: paths of the tvar.sim files
+    :param max_workers: number of threads reading the files (None for the default of ThreadPoolExecutor)
+    :return: list of tvar_sim_results namedtuples, in the order of the paths
+    """
+    paths = [Path(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        texts = list(executor.map(lambda path: path.read_text(encoding="utf-8"), paths))
+    if not texts:
+        return []
+
+    header = texts[0].partition("\n")[0]
+    # Files whose rows can be parsed with the rows of the first file (same header and no empty lines)
+    bodies, nb_rows, grouped = [], [], []
+    for index, text in enumerate(texts):
+        file_header, _, body = text.partition("\n")
+        body = body.rstrip("\r\n")
+        if file_header == header and "\n\n" not in body and "\n\r\n" not in body:
+            bodies.append(body)
+            nb_rows.append(body.count("\n") + 1 if body else 0)
+            grouped.append(index)
+
+    results = [None] * len(paths)
+    # The numeric columns are parsed as floats, so that a malformed value in a file 
+    # does not change the type of the column for the other files
+    try:
+        data = _parse_tvar_sim("\n".join([header] + [body for body in bodies if body]), TVAR_SIM_DTYPES)
+    except ValueError as error:
+        logger.debug(f"tvar.sim files are parsed separately: {error}")
+        data = None
+    if data is not None and len(data) == sum(nb_rows):
+        for index, result in zip(grouped, _split_results([paths[index].name.split(".")[0] for index in grouped], data, nb_rows)):
+            results[index] = result
+    # The other files are parsed separately
+    for index, result in enumerate(results):
+        if result is None:
+            results[index] = _file_results(paths[index], texts[index])
+    return results
+
+
+def sd_matrix(results):
+    """
+    Assemble the SDs of tvar.sim files in a matrix with one row per flux and one
+    column per tvar.sim file. Only the fluxes present in all files are kept.
+
+    :param results: list of tvar_sim_results namedtuples (see read_tvar_sim_files)
+    :return: tuple of the (Name, Kind) index of the rows and of the SD matrix
+    """
+    if not results:
+        return pd.MultiIndex.from_arrays([[], []], names=["Name", "Kind"]), np.empty((0, 0))
+
+    first = results[0]
+    if all(len(result.names) == len(first.names) and np.array_equal(result.names, first.names)
+           and np.array_equal(result.kinds, first.kinds) for result in results):
+        # Same fluxes in all files (files of the same model): SDs are stacked directly
+        index = pd.MultiIndex.from_arrays([first.names, first.kinds], names=["Name", "Kind"])
+        return index, np.column_stack([result.sds for result in results])
+
+    # Files with different fluxes: inner join on the fluxes
+    logger.debug("tvar.sim files do not contain the same fluxes, only the common fluxes are kept.")
+    dataframe = pd.concat([pd.Series(result.sds, index=pd.MultiIndex.from_arrays([result.names, result.kinds], names=["Name", "Kind"]))
+                           for result in results], axis=1, join="inner")
+    return dataframe.index, dataframe.to_numpy()
@@ -1,3 +1,4 @@
+from collections.abc import MutableMapping
 from decimal import Decimal
 import numpy as np
 
@@ -44,6 +45,28 @@ class Isotopomer:
         return np.array([round(Decimal(float(fraction)), 1) / Decimal(1) for fraction in
                          np.arange(self.lower_bound, self.upper_bound + self.step, self.step)])
 
+    def generate_numerators(self, denominator):
+        """
+        Generate the possible fractions between lower_bound and upper_bound 
+        as integer numerators over a given denominator. The denominator must 
+        be a multiple of the number of intervals so that every fraction is 
+        represented exactly.
+
+        :param denominator: common denominator of the fractions
+
+        :return: int64 numpy array containing the sorted numerators
+        """
+        if denominator % self.intervals_nb:
+            raise ValueError(f"Denominator {denominator} is not a multiple of the number of intervals ({self.intervals_nb})")
+        
+        # Same as generate_fraction: a single fraction is possible when both bounds are equal
+        if self.step == 0:
+            return np.array([self.upper_bound * denominator], dtype=np.int64)
+
+        # Each interval corresponds to (upper_bound - lower_bound) * denominator / intervals_nb
+        interval = (self.upper_bound - self.lower_bound) * (denominator // self.intervals_nb)
+        return self.lower_bound * denominator + interval * np.arange(self.intervals_nb + 1, dtype=np.int64)
+
 
     def __repr__(self) -> str:
         return f"\nName = {self.name},\
@@ -106,3 +129,88 @@ class Isotopomer:
     @property
     def step(self): 
         return (self.upper_bound - self.lower_bound) / self.intervals_nb
+
+
+class IsotopomerRegistry(MutableMapping):
+    """
+    Registry of the isotopomers of each substrate, indexed by substrate name 
+    and labelling. It behaves as a dictionary containing as key the substrate 
+    name and as value the list of its isotopomers (in insertion order), while 
+    insertion, removal and lookup of an isotopomer are done in constant time. 
+    """
+
+    def __init__(self, isotopomers: dict = None):
+        """
+        :param isotopomers: dictionary containing as key substrate name
+                            and as values a list of isotopomers
+        """
+        # key : substrate name, value : dictionary containing as key the labelling 
+        # and as value the isotopomer (dictionaries preserve insertion order)
+        self._groups = {}
+        if isotopomers:
+            self.update(isotopomers)
+
+    def __getitem__(self, substrate):
+        return list(self._groups[substrate].values())
+    
+    def __setitem__(self, substrate, isotopomers):
+        group = {}
+        for isotopomer in isotopomers:
+            if isotopomer.labelling in group:
+                raise ValueError(f"Isotopomer {isotopomer.labelling} already exists for {substrate}")
+            group[isotopomer.labelling] = isotopomer
+        self._groups[substrate] = group
+
+    def __delitem__(self, substrate):
+        del self._groups[substrate]
+
+    def __iter__(self):
+        return iter(self._groups)
+
+    def __len__(self):
+        return len(self._groups)
+
+    def __repr__(self) -> str:
+        return f"IsotopomerRegistry({dict(self.items())})"
+
+    def add(self, substrate, isotopomer):
+        """
+        Add an isotopomer to a substrate. 
+
+        :param substrate: substrate name
+        :param isotopomer: Isotopomer object
+        """
+        group = self._groups.setdefault(substrate, {})
+        if isotopomer.labelling in group:
+            raise ValueError(f"Isotopomer {isotopomer.labelling} already exists for {substrate}")
+        group[isotopomer.labelling] = isotopomer
+
+    def remove(self, substrate, labelling):
+        """
+        Remove an isotopomer from a substrate. Nothing is done 
+        if the isotopomer does not exist.
+
+        :param substrate: substrate name
+        :param labelling: labelling of the isotopomer to remove
+        """
+        self._groups.get(substrate, {}).pop(labelling, None)
+
+    def get_isotopomer(self, substrate, labelling):
+        """
+        Return the isotopomer of a substrate with the given labelling (None if it does not exist).
+
+        :param substrate: substrate name
+        :param labelling: labelling of the isotopomer
+        """
+        return self._groups.get(substrate, {}).get(labelling)
+
+    def get_price(self, substrate, labelling):
+        """
+        Return the price of the isotopomer of a substrate with the given labelling 
+        (None if the isotopomer does not exist or has no price).
+
+        :param substrate: substrate name
+        :param labelling: labelling of the isotopomer
+        """
+        isotopomer = self.get_isotopomer(substrate, labelling)
+        return isotopomer.price if isotopomer is not None else None
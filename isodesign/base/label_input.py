@@ -1,25 +1,90 @@
-from itertools import product
+from math import lcm
 import numpy as np
 import logging
 
-from decimal import Decimal
-
 logger = logging.getLogger(f"IsoDesign.{__name__}")
 
+
+def _enumerate_simplex(numerators: list, denominator: int):
+    """
+    Enumerate, in lexicographic order, all rows that can be built by taking 
+    one value from each vector of numerators and whose sum does not exceed 
+    the common denominator (i.e. whose fractions sum to 1 or less).
+
+    The simplex is built column by column: each partial row is only extended 
+    with the values that keep it feasible, so the full cartesian product is 
+    never materialized.
+
+    :param numerators: list of sorted int64 vectors, one per column 
+    :param denominator: common denominator of all numerators
+
+    :return: int64 array of shape (number of feasible rows, number of columns)
+    """
+    rows = np.zeros((1, 0), dtype=np.int64)
+    partial_sums = np.zeros(1, dtype=np.int64)
+
+    for values in numerators:
+        # Number of values of the current column that keep each partial row feasible
+        # (values are sorted, so the feasible values are always the first ones)
+        counts = np.searchsorted(values, denominator - partial_sums, side="right")
+        # Each partial row is repeated once per feasible value, 
+        # which preserves the lexicographic order of the rows
+        parents = np.repeat(np.arange(len(rows)), counts)
+        # Position of the value within each group of repeated rows
+        offsets = np.arange(len(parents)) - np.repeat(np.cumsum(counts) - counts, counts)
+        rows = np.column_stack((rows[parents], values[offsets]))
+        partial_sums = partial_sums[parents] + values[offsets]
+
+    return rows
+
+
+def _count_simplex(numerators: list, denominator: int):
+    """
+    Count the rows that _enumerate_simplex would return without enumerating them. 
+    The number of ways to reach each partial sum is propagated column by column 
+    (product of the generating polynomials of the columns, truncated to the denominator).
+
+    :param numerators: list of int64 vectors, one per column 
+    :param denominator: common denominator of all numerators
+
+    :return: number of rows whose sum does not exceed the denominator
+    """
+    # ways[s] : number of partial rows whose sum is equal to s
+    ways = np.zeros(denominator + 1, dtype=np.int64)
+    ways[0] = 1
+
+    for values in numerators:
+        polynomial = np.bincount(values[values <= denominator], minlength=denominator + 1)
+        ways = np.convolve(ways, polynomial)[:denominator + 1]
+
+    return int(ways.sum())
+
+
 class LabelInput:
-    def __init__(self, isotopomer_group: dict):
+    def __init__(self, isotopomer_group: dict, constraints=None):
         """
         Class for the generation of all possible combinations of labelled substrates
 
         :param isotopomer_group: dictionary containing as key substrate name of the isotopomer group
                                 and as values a list of isotopomer 
+        :param constraints: Constraints object. Combinations that do not respect 
+                            the constraints are not generated.
         """
 
         self.isotopomer_group = isotopomer_group
+        self.constraints = constraints
+        if constraints is not None:
+            constraints.check_isotopomers(isotopomer_group)
 
         # Container for all label input combination proportions
         # keys : substrate name of the isotopomers group, Values : label input combination proportions
         self.isotopomer_combinations = {}
+        # Integer numerators of the combination proportions (over the denominator of each group)
+        # keys : substrate name of the isotopomers group, Values : int64 array of numerators
+        self.isotopomer_numerators = {}
+        # Common denominator of the fractions of each isotopomers group
+        # keys : substrate name of the isotopomers group, Values : denominator
+        self.denominators = {}
         # Isotopomer names and labelling patterns.
         self.names = []
         self.labelling_patterns = []
@@ -27,67 +92,184 @@ class LabelInput:
     def __repr__(self):
         return "\n".join(f"{substrate_name}: {isotopomers}" for substrate_name, isotopomers in self.isotopomer_group.items())
 
-    def generate_labelling_combinations(self):
+    def generate_labelling_combinations(self, lazy=False):
         """
-        Generate all possible combinations of label input proportions for all isotopomers group
+        Generate all possible combinations of label input proportions for all isotopomers group.
+
+        Fractions are handled as integer numerators over a common denominator, 
+        so that the sum of the fractions of each combination is exactly 1.
 
+        :param lazy: if True, the combinations of all isotopomers groups ("All_combinations") 
+                     are not materialized. They can then be streamed by blocks with 
+                     iter_combinations().
         """
         for isotopomer_name, isotopomers in self.isotopomer_group.items():
             logger.debug(f"Running combinatory function on {isotopomer_name} group")
-            # For all isotopomers present, all possible fractions are generated except for the first 
-            # First isotopomer's fraction will be deduced from the other ones
-            if len(isotopomers) > 1:
-                fractions = [isotopomer.generate_fraction() for isotopomer in
-                             isotopomers[1:]]
-            else:
-                fractions = [isotopomer.generate_fraction() for isotopomer in
-                             isotopomers]
-
-            logger.debug(f"Generated fractions:\n {fractions}")
-            # fractions : list containing vectors of fractions of each isotopomer 
-            # np.meshgrid is used to return matrices corresponding to all possible combinations of vectors present in the list of fractions
-            # -1 parameter in reshape permit to adjusts the size of the first dimension (rows) according to the total number of elements in the array
-            all_combinations = np.array(np.meshgrid(*fractions)).T.reshape(-1, len(fractions))
-
-            # filter with sum <= 1 as condition 
-            filtered_combinations = np.array(
-                [combination for combination in all_combinations if
-                 combination.sum() <= Decimal(1)])
-            
-            # Ensure sum of all fractions is equal to 1
-            # Permit to find the fractions of the last isotopomer
-            if len(isotopomers) > 1:
-                deduced_fraction = 1 - filtered_combinations.sum(axis=1)
-                logger.debug(f'Deduced fraction {deduced_fraction}')
-                
-                self.isotopomer_combinations[
-                    isotopomer_name] = np.column_stack(
-                    (deduced_fraction.reshape(-1, 1), filtered_combinations))
-            else:
-                self.isotopomer_combinations[isotopomer_name] = filtered_combinations
+            filtered_numerators, denominator = self._enumerate_group(isotopomers)
+
+            self.isotopomer_numerators[isotopomer_name] = filtered_numerators
+            self.denominators[isotopomer_name] = denominator
+            self.isotopomer_combinations[isotopomer_name] = filtered_numerators / denominator
 
             self.names += [isotopomer.name for isotopomer in isotopomers]
             self.labelling_patterns += [isotopomer.labelling for isotopomer in isotopomers]
 
-        # Addition of a key containing all isotopomers group combination if there is multiple isotopomers group 
-        self.isotopomer_combinations["All_combinations"] = [
-            np.concatenate(pair) for pair in product(
-                *self.isotopomer_combinations.values())
-        ]
-    
         self._check_labelling_combinations()
 
+        # Combinations of each group that cannot respect the constraints are discarded 
+        # before the groups are combined
+        if self.constraints is not None:
+            masks = self.constraints.prune_groups(self.isotopomer_group, self.isotopomer_combinations)
+            for isotopomer_name, mask in masks.items():
+                logger.debug(f"{np.count_nonzero(~mask)} combinations of {isotopomer_name} group do not respect the constraints")
+                self.isotopomer_numerators[isotopomer_name] = self.isotopomer_numerators[isotopomer_name][mask]
+                self.isotopomer_combinations[isotopomer_name] = self.isotopomer_combinations[isotopomer_name][mask]
+
+        # Addition of a key containing all isotopomers group combination if there is multiple isotopomers group 
+        if not lazy:
+            self.isotopomer_combinations["All_combinations"] = [
+                combination for block in self.iter_combinations() for combination in block
+            ]
+
+    @classmethod
+    def _enumerate_group(cls, isotopomers):
+        """
+        Enumerate the numerators of all combinations of an isotopomers group.
+
+        :param isotopomers: list of isotopomers of the group
+
+        :return: tuple containing the 2D int64 array of numerators (one row per combination, 
+                 one column per isotopomer) and the denominator of the group
+        """
+        numerators, denominator = cls._generate_group_numerators(isotopomers)
+        logger.debug(f"Generated numerators (denominator = {denominator}):\n {numerators}")
+
+        # Columns are enumerated in the order of the rows previously given by 
+        # np.meshgrid(*fractions).T.reshape(-1, len(fractions)) : the last isotopomer 
+        # varies the slowest, then the previous ones, the first two varying the fastest
+        order = list(range(len(numerators) - 1, 1, -1)) + [0, 1] if len(numerators) > 1 else [0]
+        filtered_numerators = _enumerate_simplex([numerators[column] for column in order], denominator)[:, np.argsort(order)]
+
+        # Ensure sum of all fractions is equal to 1
+        # Permit to find the fractions of the last isotopomer
+        if len(isotopomers) > 1:
+            deduced_numerator = denominator - filtered_numerators.sum(axis=1)
+            filtered_numerators = np.column_stack((deduced_numerator, filtered_numerators))
+        return filtered_numerators, denominator
+
+    @staticmethod
+    def _generate_group_numerators(isotopomers):
+        """
+        Generate the possible numerators of the isotopomers whose fractions vary 
+        in a group, over the common denominator of the group.
+
+        :param isotopomers: list of isotopomers of the group
+
+        :return: tuple containing the list of numerators vectors and the denominator
+        """
+        # For all isotopomers present, all possible fractions are generated except for the first 
+        # First isotopomer's fraction will be deduced from the other ones
+        varying_isotopomers = isotopomers[1:] if len(isotopomers) > 1 else isotopomers
+
+        denominator = lcm(*[isotopomer.intervals_nb for isotopomer in varying_isotopomers])
+        return [isotopomer.generate_numerators(denominator) for isotopomer in varying_isotopomers], denominator
+
+    def count_labelling_combinations(self):
+        """
+        Compute the exact number of combinations of each isotopomers group from 
+        the bounds and the number of intervals of the isotopomers, without 
+        generating the combinations.
+
+        If constraints are given, the combinations of each group are enumerated 
+        to discard the ones that cannot respect the constraints.
+
+        :return: dictionary containing as key the substrate name of the isotopomers group 
+                 and as value its number of combinations
+        """
+        if self.constraints is None:
+            return {isotopomer_name: _count_simplex(*self._generate_group_numerators(isotopomers))
+                    for isotopomer_name, isotopomers in self.isotopomer_group.items()}
+        
+        groups_fractions = {}
+        for isotopomer_name, isotopomers in self.isotopomer_group.items():
+            numerators, denominator = self._enumerate_group(isotopomers)
+            groups_fractions[isotopomer_name] = numerators / denominator
+        return {isotopomer_name: int(np.count_nonzero(mask)) 
+                for isotopomer_name, mask in self.constraints.prune_groups(self.isotopomer_group, groups_fractions).items()}
+
+    @property
+    def combinations_filtered(self):
+        """
+        True if the blocks of iter_combinations are filtered by constraints on whole 
+        combinations. count_combinations is then an upper bound of the number of combinations.
+        """
+        return self.constraints is not None and self.constraints.on_combinations
+
+    @property
+    def groups_combinations(self):
+        """
+        Combinations of each isotopomers group (without the "All_combinations" key)
+        """
+        return {name: combinations for name, combinations in self.isotopomer_combinations.items() 
+                if name != "All_combinations"}
+
+    def count_combinations(self):
+        """
+        Return the total number of combinations of all isotopomers groups 
+        without enumerating them. If the combinations have not been 
+        generated yet, they are counted from the isotopomers.
+        """
+        if not self.groups_combinations:
+            return int(np.prod(list(self.count_labelling_combinations().values()), dtype=object))
+        return int(np.prod([len(combinations) for combinations in self.groups_combinations.values()], dtype=object))
+
+    def get_combinations(self, start, stop):
+        """
+        Return a block of combinations of all isotopomers groups. Combinations 
+        are indexed in the order given by itertools.product over the groups, 
+        so that the block is the same as the rows [start:stop] of "All_combinations".
+
+        :param start: index of the first combination of the block
+        :param stop: index following the last combination of the block
+
+        :return: 2D float array with one row per combination and one column per isotopomer
+        """
+        groups = list(self.groups_combinations.values())
+        indices = np.arange(start, min(stop, self.count_combinations()), dtype=np.int64)
+        
+        # Decompose the indices in a mixed radix base (one digit per group, last group varying the fastest)
+        columns = []
+        for combinations in reversed(groups):
+            columns.insert(0, combinations[indices % len(combinations)])
+            indices = indices // len(combinations)
+
+        return np.hstack(columns) if columns else np.empty((0, 0))
+
+    def iter_combinations(self, chunk_size=10000):
+        """
+        Iterate over the combinations of all isotopomers groups by blocks 
+        of at most chunk_size combinations.
+        Combinations that do not respect the constraints on whole combinations 
+        (total price, number of labelled inputs) are removed from each block as 
+        soon as it is produced. These constraints cannot prune the groups (unlike 
+        the constraints on each group, see count_labelling_combinations): the whole 
+        product of the groups is still enumerated, one block at a time.
+
+        :param chunk_size: maximal number of combinations in each block
+
+        :return: generator of 2D float arrays (see get_combinations)
+        """
+        total = self.count_combinations()
+        for start in range(0, total, chunk_size):
+            block = self.get_combinations(start, start + chunk_size)
+            if self.combinations_filtered:
+                block = block[self.constraints.mask(self.isotopomer_group, block)]
+            yield block
+
     def _check_labelling_combinations(self):
         """
         Check if the sum of all fractions is equal to 1 for all isotopomers group
         """
-        for isotopomer_name, isotopomer_combinations in self.isotopomer_combinations.items():
-            if isotopomer_name == "All_combinations":
-                continue
-            if any(np.sum(combination) != 1 for combination in isotopomer_combinations):
+        for isotopomer_name, isotopomer_numerators in self.isotopomer_numerators.items():
+            if np.any(isotopomer_numerators.sum(axis=1) != self.denominators[isotopomer_name]):
                 raise ValueError(f"Sum of all fractions is not equal to 1 for {isotopomer_name} group")
-                # logger.error(f"Sum of all fractions is not equal to 1 for {isotopomer_name} group")
-                    
-
-
-    
\ No newline at end of file
@@ -1,4 +1,5 @@
 
+import json
 import logging
 import os
 import shutil
@@ -7,15 +8,26 @@ import pickle
 from collections import namedtuple
 from pathlib import Path
 import numpy as np
-import subprocess
 import isodesign
 
 import pandas as pd
 from influx_si import C13_ftbl, txt2ftbl
 
-from isodesign.base.isotopomer import Isotopomer
+from isodesign.base.isotopomer import Isotopomer, IsotopomerRegistry
 from isodesign.base.label_input import LabelInput
+from isodesign.base.sampling import LabelInputSampler
+from isodesign.base.combination_store import CombinationStore, LinpDataframes
 from isodesign.base.score import ScoreHandler
+from isodesign.base.symmetry import find_symmetries, equivalent_labellings
+from isodesign.base.refinement import GridRefinement, MINIMIZED_CRITERIA
+from isodesign.base.constraints import Constraints
+from isodesign.base.staging import stage_files, STAGING_MODES
+from isodesign.base.simulation import ShardedSimulation, SimulationRunner
+from isodesign.base.result_cache import ResultCache
+from isodesign.base.progress import SimulationProgress
+from isodesign.base.results_store import ResultsStore, ResultsView
+from isodesign.base.summary import SummaryBuilder
+from isodesign.base.export import export_summary, write_excel_summary, write_excel_summary_in_background
 
 logger = logging.getLogger(f"IsoDesign.{__name__}")  
 
@@ -24,6 +36,9 @@ logger = logging.getLogger(f"IsoDesign.{__name__}")
 file_info = namedtuple("file_info", ['path', 'data']) 
 # namedtuple containing the number of labeled inputs and the total price for each linp file
 linp_info = namedtuple("linp_info", ["nb_labeled_inputs", "total_price"])
+# namedtuple containing the estimated cost of a design before the generation of its combinations
+design_cost = namedtuple("design_cost", ["combinations_per_substrate", "nb_combinations", 
+                                         "memory_size", "linp_files_size", "simulation_time"])
 
 class Process:
     """
@@ -36,6 +51,24 @@ class Process:
 
     """
     FILES_EXTENSION = [".netw", ".tvar", ".mflux", ".miso", ".cnstr", ".mmet", ".opt"]
+    # Maximal number of combinations handled at once when streaming the combinations
+    COMBINATIONS_CHUNK_SIZE = 10000
+    # Estimated simulation time (in seconds) above which a design is considered too long
+    MAX_SIMULATION_TIME = 24 * 3600
+    # Number of threads writing the linp files (None for the default of ThreadPoolExecutor)
+    LINP_WRITER_WORKERS = None
+    # Number of threads reading the tvar.sim files (None for the default of ThreadPoolExecutor)
+    TVAR_SIM_READER_WORKERS = None
+    # Formats in which the summary is exported after each simulation (see export.SUMMARY_FORMATS)
+    SUMMARY_EXPORT_FORMATS = ("parquet", "feather", "tsv")
+    # Buffer size (in bytes) of the files written with many lines 
+    WRITE_BUFFER_SIZE = 1 << 20
+    # File of the temp folder containing the hash of the content of each linp file
+    LINP_MANIFEST = "linp_manifest.json"
+    # File of the temp folder containing the progress of the running simulation (see SimulationProgress)
+    PROGRESS_FILE = "simulation_progress.json"
+    # Ways of staging the model files in the folders used by influx_si (see staging.py)
+    STAGING_MODES = STAGING_MODES
 
     def __init__(self):
         # Version of the isodesign package
@@ -62,28 +95,40 @@ class Process:
         self.tvar_sim_paths = []
         # Elements analyzed (substrates, metabolites, etc.) in the network using the analyse_model method
         self.netan = {}
-        # summary dataframe generated after simulation with influx_si
-        self.summary_dataframe = None
-        # filtered dataframe after filter use
-        self.filtered_dataframe = None
-        # Dictionary containing isotopomers
+        # Symmetries of the input substrates found from the network analysis
+        # Key : substrate name, value : list of permutations of equivalent atom positions 
+        self.symmetries = {}
+        # ResultsStore object containing the results of the simulation with influx_si 
+        # (see the summary_dataframe property)
+        self.results : ResultsStore = None
+        # ResultsView object selecting the fluxes kept by the filters (see the filtered_dataframe property)
+        self.filtered_results : ResultsView = None
+        # SummaryBuilder object ingesting the results during a simulation (None if no simulation is running)
+        self.summary_builder : SummaryBuilder = None
+        # Registry containing isotopomers (see the isotopomers property)
         # key : substrate name, value : list of isotopomers
         self.isotopomers = {}
+        # Constraints object applied during the generation of the combinations (None if no constraints)
+        self.constraints : Constraints = None
         # # Get the tvar.def file generated during the model analysis
         # self.tvar_def_file = None
         # Dictionary to store the number of labeled inputs and the total isotopomer prices of each linp file 
         # Key : linp file name, value : namedtuple containing the number of labeled inputs and the total price
         self.linp_infos = {}
+        # Dictionary associating each combination to the combination simulated in its place
+        # (combinations giving the same linp file are simulated only once)
+        # Key : combination ID, value : ID of the simulated linp file
+        self.linp_equivalences = {}
         # Dictionary containing the number of structurally identified fluxes (obtained from the ‘tvar.sim’ files) 
         # Key : file name, value : number of structurally identified fluxes
         self.structures_identified = {}
-        # List storing linp file data in the form of dictionaries
-        # each dictionary representing a combination of labelled substrates.
-        self.linp_dataframes = {}
+        # CombinationStore object containing the fractions of all combinations of labelled substrates 
+        # that can be written in linp files (see the linp_dataframes and linp_to_remove views)
+        self.combinations : CombinationStore = None
         # List of command line arguments to pass to influx_si
         self.command_list = None
-        # List of linp dataframes to remove
-        self.linp_to_remove = {}
+        # ResultCache object containing the results of previous simulations (None if results are not cached)
+        self.result_cache : ResultCache = None
 
         # Stores the scores generated after application of the scoring criteria 
         self.scores : pd.DataFrame = None
@@ -94,6 +139,138 @@ class Process:
         self.selected_criteria : list = []
         self.criteria_parameters : dict = None
         self.applied_operations = None
+        # Simulation times per combination measured on previous runs 
+        # Key : influx_si mode (influx_s or influx_i), value : list of times in seconds
+        self.simulation_timings = {}
+        # GridRefinement object used in adaptive design mode (None for a full grid design)
+        self.refinement : GridRefinement = None
+        # Rounds of the adaptive design. List of dictionaries containing the round number, 
+        # its resolution, the IDs of the simulated combinations, their scores and the best IDs
+        self.refinement_rounds = []
+
+    def __setstate__(self, state):
+        """
+        Restore a Process object from a pickle file. Attributes added in more 
+        recent versions of IsoDesign are initialized with their default value 
+        so that previous session files can still be loaded.
+        """
+        self.__init__()
+        # Linp dataframes were stored as dictionaries in previous versions
+        legacy_linp_dataframes = state.pop("linp_dataframes", None)
+        legacy_linp_to_remove = state.pop("linp_to_remove", None)
+        # Isotopomers were stored in a dictionary of lists in previous versions
+        legacy_isotopomers = state.pop("isotopomers", None)
+        # Summary and filtered dataframes were stored directly in previous versions
+        legacy_summary_dataframe = state.pop("summary_dataframe", None)
+        legacy_filtered_dataframe = state.pop("filtered_dataframe", None)
+        self.__dict__.update(state)
+
+        if legacy_summary_dataframe is not None:
+            self.summary_dataframe = legacy_summary_dataframe
+            self.filtered_dataframe = legacy_filtered_dataframe
+        # Results whose folder has been deleted or moved since the session was saved 
+        # cannot be analyzed: the summary has to be generated again
+        if self.results is not None and not self.results.is_available():
+            logger.warning("The results of the session cannot be read anymore. Please generate the summary again.")
+            self.results = None
+            self.filtered_results = None
+
+        if legacy_isotopomers is not None:
+            self.isotopomers = legacy_isotopomers
+        # Symmetries were not searched in previous versions
+        if self.netan and "symmetries" not in state:
+            self.symmetries = {substrate: find_symmetries(self.netan, substrate) for substrate in self.netan["input"]}
+
+        if legacy_linp_dataframes or legacy_linp_to_remove:
+            removed = {key: value for removed_dataframes in (legacy_linp_to_remove or {}).values() 
+                       for key, value in removed_dataframes.items()}
+            self.linp_dataframes = dict(sorted({**(legacy_linp_dataframes or {}), **removed}.items()))
+            for key in removed:
+                self.combinations.enabled[self.combinations.get_row(key)] = False
+
+    @property
+    def summary_dataframe(self):
+        """
+        Summary dataframe generated after simulation with influx_si (None before the summary generation), 
+        built from the results store (see generate_summary). 
+        """
+        return self.results.dataframe if self.results is not None else None
+    
+    @summary_dataframe.setter
+    def summary_dataframe(self, dataframe):
+        self.results = ResultsStore.from_dataframe(dataframe) if dataframe is not None else None
+        self.filtered_results = None
+
+    @property
+    def filtered_dataframe(self):
+        """
+        Summary dataframe filtered with data_filter (None if no filter has been used)
+        """
+        return self.filtered_results.dataframe if self.filtered_results is not None else None
+    
+    @filtered_dataframe.setter
+    def filtered_dataframe(self, dataframe):
+        self.filtered_results = (self.results.view(self.results.fluxes.index.get_indexer(dataframe.index)) 
+                                 if dataframe is not None else None)
+
+    @property
+    def isotopomers(self):
+        """
+        Isotopomers of each substrate. 
+        Key : substrate name, value : list of isotopomers. 
+        Isotopomers are indexed by substrate name and labelling, 
+        so that they can be added, removed and found in constant time.
+        """
+        return self._isotopomers
+
+    @isotopomers.setter
+    def isotopomers(self, isotopomers: dict):
+        self._isotopomers = isotopomers if isinstance(isotopomers, IsotopomerRegistry) else IsotopomerRegistry(isotopomers)
+
+    @property
+    def linp_dataframes(self):
+        """
+        Linp dataframes of the combinations to write in linp files, in dictionary format.
+        Key : combination ID, value : dictionary containing the "Id", "Comment", "Specie", 
+        "Isotopomer", "Value" and "Price" columns of the linp file. 
+        This is a read-only view of the combinations store.
+        """
+        if self.combinations is None:
+            return {}
+        return LinpDataframes(self.combinations)
+    
+    @linp_dataframes.setter
+    def linp_dataframes(self, linp_dataframes: dict):
+        self.combinations = CombinationStore.from_linp_dataframes(linp_dataframes) if linp_dataframes else None
+
+    @property
+    def linp_to_remove(self):
+        """
+        Linp dataframes of the removed combinations. 
+        Key : row of the combination in the combinations store, value : dictionary 
+        containing the combination ID as key and its linp dataframe as value.
+        """
+        if self.combinations is None:
+            return {}
+        return {row: {self.combinations.get_id(row): self.combinations.to_linp_dict(row)} 
+                for row in self.combinations.disabled_rows}
+
+    def get_combinations(self, start=0, stop=None, enabled=True):
+        """
+        Return a page of the combinations as a dataframe with one row per combination 
+        (ID, species, isotopomers, fractions and prices of its linp file). Only the 
+        combinations of the page are built, so that large designs can be displayed.
+
+        :param start: position of the first combination of the page (among the enabled or removed combinations)
+        :param stop: position after the last combination of the page (None for the last combination)
+        :param enabled: if True, the page contains the enabled combinations, otherwise the removed ones
+        """
+        columns = ["ID", "Specie", "Isotopomer", "Value", "Price"]
+        if self.combinations is None:
+            return pd.DataFrame(columns=columns)
+        rows = (self.combinations.enabled_rows if enabled else self.combinations.disabled_rows)[start:stop]
+        return pd.DataFrame([{"ID": self.combinations.get_id(row), **self.combinations.to_linp_dict(row)} for row in rows], 
+                            columns=columns)
 
     def get_path_input_netw(self, netw_directory_path):
         """
@@ -138,8 +315,7 @@ class Process:
         # Reset the dictionary to store imported files
         self.mtf_files = {}
     
-        for file in self.model_directory_path.iterdir():
-            if file.stem == self.model_name and file.suffix in self.FILES_EXTENSION:
+        for file in self.get_model_files():
                 # Read the file and store its content in a namedtuple
                 data = pd.read_csv(str(file),
                                     sep="\t",
@@ -152,6 +328,13 @@ class Process:
 
         logger.debug(f"Imported files = {self.mtf_files}\n")
 
+    def get_model_files(self):
+        """
+        Return the paths of the MTF files of the model (files of the model 
+        directory named after the model and with an extension in FILES_EXTENSION).
+        """
+        return [file for file in self.model_directory_path.iterdir()
+                if file.is_file() and file.stem == self.model_name and file.suffix in self.FILES_EXTENSION]
    
 
     def analyse_model(self):
@@ -167,10 +350,8 @@ class Process:
         with tempfile.TemporaryDirectory() as tmpdir:
             tmpdir_path = Path(tmpdir)
 
-            # Copy all files from model_directory_path to the temporary directory
-            files_to_copy = [f for f in self.model_directory_path.iterdir() if f.is_file()]
-            for file in files_to_copy:
-                shutil.copy(file, tmpdir_path)
+            # Link (or copy if links are not possible) the MTF files of the model to the temporary directory
+            stage_files(self.get_model_files(), tmpdir_path, self.STAGING_MODES)
 
             # will contain the paths to the ftbl files generated by the txt2ftbl module
             li_ftbl = []  
@@ -193,22 +374,24 @@ class Process:
             # such as substrates, metabolites...
             C13_ftbl.ftbl_netan(model, self.netan, emu, fullsys, case_i)
         logger.debug(f"self.netan dictionary keys : {self.netan.keys()}\n")
+
+        # Labellings of symmetric inputs that give the same results 
+        self.symmetries = {substrate: find_symmetries(self.netan, substrate) for substrate in self.netan["input"]}
         logger.info("Network analysis finished successfully.\n")
 
     
     def copy_files(self):
         """
-        Copy the imported files in the linp folder. 
+        Link (or copy if links are not possible) the imported files in the linp folder. 
         All the files that will be passed to influx_si have to be in the
         same folder.
         """
 
-        logger.debug(f"Copy of the imported files to '{self.tmp_folder_path}'.\n")
+        logger.debug(f"Staging of the imported files in '{self.tmp_folder_path}'.\n")
 
-        for file in self.mtf_files.values():
-            # File paths are contained as first elements in the namedtuple
-            # logger.debug(f"File path: {file.path}")
-            shutil.copy(file.path, self.tmp_folder_path)
+        # File paths are contained as first elements in the namedtuple
+        # Files already staged are skipped
+        stage_files([file.path for file in self.mtf_files.values()], self.tmp_folder_path, self.STAGING_MODES)
 
     def save_process_to_file(self):
         """
@@ -259,13 +442,14 @@ class Process:
         # by using clen (carbon length) from the netan (network analysis) dictionary
         if len(labelling) != self.netan["Clen"][substrate_name]:
             raise ValueError(f"Number of atoms for {substrate_name} should be equal to {self.netan['Clen'][substrate_name]}")
-        # Check if the labelling already exists for the substrate 
-        # each substrate must have unique isotopomers 
-        if labelling in [isotopomer.labelling for isotopomer in self.isotopomers[substrate_name]]:
-            # logger.error(f"Isotopomer {labelling} already exists for {substrate_name}")
-            raise ValueError(f"Isotopomer {labelling} already exists for {substrate_name}")
-            
-        self.isotopomers[substrate_name].append(isotopomer)
+        # Labellings of a symmetric substrate related by a symmetry give the same results
+        for equivalent_labelling in self.get_equivalent_labellings(substrate_name, labelling) - {labelling}:
+            if self.isotopomers.get_isotopomer(substrate_name, equivalent_labelling) is not None:
+                raise ValueError(f"Isotopomer {labelling} is equivalent to isotopomer {equivalent_labelling} "
+                                 f"for {substrate_name} (symmetric molecule)")
+        # Each substrate must have unique isotopomers, the registry raises 
+        # a ValueError if the labelling already exists for the substrate 
+        self.isotopomers.add(substrate_name, isotopomer)
             
     
 
@@ -278,15 +462,54 @@ class Process:
         :param labelling: labelling for isotopomer to remove
 
         """
-    
-        for isotopomer in self.isotopomers[f"{substrate}"]:
-            if isotopomer.labelling == labelling and isotopomer.name == substrate:
-                self.isotopomers[f"{substrate}"].remove(isotopomer)
+        self.isotopomers.remove(substrate, labelling)
 
-    def generate_combinations(self):
+    def get_equivalent_labellings(self, substrate, labelling):
         """
-        Generate all possible combinations of labelled substrates 
-        using the LabelInput class.
+        Return the labellings of a substrate equivalent to the given labelling 
+        through the symmetries of the substrate (including the labelling itself).
+
+        :param substrate: substrate name
+        :param labelling: labelling of the isotopomer
+        """
+        return equivalent_labellings(labelling, self.symmetries.get(substrate, []))
+
+    def find_equivalent_isotopomers(self):
+        """
+        Find the configured isotopomers equivalent to a previously configured 
+        isotopomer of the same substrate (symmetric molecules).
+
+        :return: dictionary containing as key the substrate name and as value a 
+                 dictionary associating each redundant labelling to the labelling it is equivalent to
+        """
+        equivalent_isotopomers = {}
+        for substrate, isotopomers in self.isotopomers.items():
+            kept = {}
+            for isotopomer in isotopomers:
+                # Canonical labelling shared by all equivalent labellings
+                canonical_labelling = min(self.get_equivalent_labellings(substrate, isotopomer.labelling))
+                if canonical_labelling in kept:
+                    equivalent_isotopomers.setdefault(substrate, {})[isotopomer.labelling] = kept[canonical_labelling]
+                else:
+                    kept[canonical_labelling] = isotopomer.labelling
+        return equivalent_isotopomers
+
+    def get_distinct_isotopomers(self):
+        """
+        Return the isotopomers of each substrate without the isotopomers 
+        equivalent to a previous isotopomer (see find_equivalent_isotopomers).
+
+        :return: dictionary containing as key the substrate name and as value the list of isotopomers
+        """
+        equivalent_isotopomers = self.find_equivalent_isotopomers()
+        return {substrate: [isotopomer for isotopomer in isotopomers 
+                            if isotopomer.labelling not in equivalent_isotopomers.get(substrate, {})] 
+                for substrate, isotopomers in self.isotopomers.items()}
+
+    def _check_isotopomers(self):
+        """
+        Check that isotopomers have been added for each substrate and 
+        warn about the isotopomers that will not be used. 
         """
         # Check if "self.isotopomers" is not empty
         if not self.isotopomers:
@@ -296,17 +519,142 @@ class Process:
             if not isotopomers:
                 raise ValueError(f"No isotopomers for {substrates}. Please add at least one isotopomer.")
         
+        # Isotopomers equivalent to a previous isotopomer of a symmetric substrate 
+        # would only add combinations giving the same results, they are not used
+        for substrate, labellings in self.find_equivalent_isotopomers().items():
+            for labelling, equivalent_labelling in labellings.items():
+                logger.warning(f"Isotopomer {labelling} of {substrate} is equivalent to isotopomer {equivalent_labelling} "
+                               "(symmetric molecule) and will not be used.")
+
+    def generate_combinations(self):
+        """
+        Generate all possible combinations of labelled substrates 
+        using the LabelInput class.
+        """
+        self._check_isotopomers()
+        
         # Initialize the LabelInput object with the isotopomers dictionary
-        self.label_input = LabelInput(self.isotopomers)
+        self.label_input = LabelInput(self.get_distinct_isotopomers(), self.constraints)
         logger.info(f"Label Input - {self.label_input}")
 
-        self.label_input.generate_labelling_combinations()
+        # Combinations of all isotopomers groups are not materialized, 
+        # they are streamed by blocks when configuring the linp files 
+        self.label_input.generate_labelling_combinations(lazy=True)
         
         logger.debug(
             f"Isotopomers combinations:"
             f"{self.label_input.isotopomer_combinations}\n"
         )
+        if self.label_input.combinations_filtered:
+            logger.info(f"At most {self.label_input.count_combinations()} combinations of isotopomers will be configured "
+                        f"(constraints : {self.constraints}).")
+        else:
+            logger.info(f"{self.label_input.count_combinations()} combinations of isotopomers will be configured.")
+
+    def set_constraints(self, max_price=None, max_labeled_inputs=None, min_fractions: dict = None, enrichment_ranges: dict = None):
+        """
+        Set the constraints applied during the generation of the combinations 
+        (see the Constraints class). Combinations that do not respect them are 
+        never generated. Without any argument, the constraints are removed.
+
+        :param max_price: maximal total price of a combination
+        :param max_labeled_inputs: maximal number of labelled isotopomers in a combination
+        :param min_fractions: minimal fraction of isotopomers. 
+                              Key : (substrate name, labelling), value : minimal fraction
+        :param enrichment_ranges: range of the 13C enrichment of substrates.
+                                  Key : substrate name, value : (minimal enrichment, maximal enrichment)
+        """
+        if max_price is None and max_labeled_inputs is None and not min_fractions and not enrichment_ranges:
+            self.constraints = None
+            return
+        self.constraints = Constraints(max_price, max_labeled_inputs, min_fractions, enrichment_ranges)
+        logger.info(f"Constraints : {self.constraints}")
        
+    def sample_combinations(self, nb_points, method="sobol", seed=None, extend=False):
+        """
+        Draw combinations of labelled substrates uniformly over the simplex 
+        of each substrate using the LabelInputSampler class, instead of 
+        generating the full grid. Designs with many isotopomers can then 
+        be explored with a chosen number of simulations. 
+
+        :param nb_points: number of combinations to draw
+        :param method: sampling method ("sobol", "halton" or "latin hypercube")
+        :param seed: seed of the sequence (see LabelInputSampler)
+        :param extend: if True, nb_points combinations are added to the current sample. 
+                       If the linp files have already been configured, the new combinations 
+                       are added to the combinations store, the previous IDs being kept.
+        """
+        if extend:
+            if not isinstance(self.label_input, LabelInputSampler):
+                raise ValueError("No sample to extend. Please draw combinations first.")
+            new_samples = self.label_input.add_points(nb_points)
+            if self.combinations is not None:
+                self.combinations.append(new_samples)
+            return
+
+        self._check_isotopomers()
+        self.label_input = LabelInputSampler(self.get_distinct_isotopomers(), nb_points, method, seed, self.constraints)
+        logger.info(f"Label Input - {self.label_input}")
+        self.label_input.generate_labelling_combinations(lazy=True)
+        logger.info(f"{self.label_input.count_combinations()} combinations of isotopomers will be configured.")
+       
+    def estimate_design_cost(self, influx_mode=None):
+        """
+        Estimate the cost of the design defined by the isotopomers before 
+        generating its combinations. The number of combinations is computed 
+        exactly from the bounds and the number of intervals of the isotopomers.
+        Combinations of each substrate that cannot respect the constraints are 
+        not counted, the number of combinations being an upper bound when constraints 
+        apply to whole combinations (price, number of labelled inputs).
+        The memory size corresponds to the fractions of all combinations, the 
+        linp files size is an upper bound (rows with a fraction of 0 are not written)
+        and the simulation time is extrapolated from the median time per 
+        combination measured on previous runs (None if no run has been timed yet).
+
+        :param influx_mode: influx_si mode ("influx_s" or "influx_i") whose timings are used. 
+                            If None, timings of all modes are used.
+
+        :return: design_cost namedtuple
+        """
+        if not self.isotopomers:
+            raise ValueError("No isotopomers have been added. Please add at least one isotopomer.")
+        
+        distinct_isotopomers = self.get_distinct_isotopomers()
+        combinations_per_substrate = LabelInput(distinct_isotopomers, self.constraints).count_labelling_combinations()
+        nb_combinations = int(np.prod(list(combinations_per_substrate.values()), dtype=object))
+        isotopomers = [isotopomer for isotopomers in distinct_isotopomers.values() for isotopomer in isotopomers]
+
+        # One float64 fraction per isotopomer and per combination
+        memory_size = nb_combinations * len(isotopomers) * np.dtype(np.float64).itemsize
+        
+        # Header and rows of a linp file (fraction and price written with up to 20 characters each)
+        linp_file_size = len("Id\tComment\tSpecie\tIsotopomer\tValue\tPrice\n") + sum(
+            len(f"\t\t{isotopomer.name}\t{isotopomer.labelling}\t\t\n") + 2 * 20 for isotopomer in isotopomers)
+        linp_files_size = nb_combinations * linp_file_size
+
+        timings = [timing for mode, mode_timings in self.simulation_timings.items() 
+                   if influx_mode is None or mode == influx_mode for timing in mode_timings]
+        simulation_time = float(np.median(timings)) * nb_combinations if timings else None
+
+        return design_cost(combinations_per_substrate, nb_combinations, memory_size, linp_files_size, simulation_time)
+
+    def record_simulation_time(self, elapsed_time, nb_combinations=None):
+        """
+        Store the simulation time per combination of the last run. 
+        These timings are used to estimate the simulation time of future designs.
+
+        :param elapsed_time: duration of the last run in seconds
+        :param nb_combinations: number of combinations simulated during the last run 
+                                (None for all the combinations of the vmtf file)
+        """
+        if nb_combinations is None:
+            nb_combinations = len(self.vmtf_element_dict.get("linp") or [])
+        if not nb_combinations or not self.command_list:
+            return
+        
+        self.simulation_timings.setdefault(self.command_list[0], []).append(elapsed_time / nb_combinations)
+        logger.info(f"Simulation time per combination: {elapsed_time / nb_combinations:.2f} s")
+
     def create_tmp_folder(self):
         """ 
         Create a temp folder to store all the files generated by IsoDesign.
@@ -327,10 +675,11 @@ class Process:
         
     def clear_previous_results(self):
         """
-        Clear the "_res" folder containing the results of the previous run.
+        Clear the "_res" folder containing the results of the previous run
+        (and the folders of the shards of a previous sharded run).
         """
         for folder in self.tmp_folder_path.iterdir():
-            if folder.is_dir() and folder.name.endswith("_res"):
+            if folder.is_dir() and (folder.name.endswith("_res") or folder.name == ShardedSimulation.SHARDS_FOLDER):
                 shutil.rmtree(folder)
     
     def clear_previous_linp(self):
@@ -340,6 +689,116 @@ class Process:
         for linp_files in self.tmp_folder_path.iterdir():
             if linp_files.is_file() and linp_files.name.endswith(".linp"):
                 os.remove(linp_files)
+        Path(self.tmp_folder_path, self.LINP_MANIFEST).unlink(missing_ok=True)
+
+    def get_simulated_linp(self):
+        """
+        Return the IDs of the linp files that already have complete results: 
+        a tvar.sim file containing the fluxes and no error in the "_res" folder.
+        """
+        simulated_linp = []
+        for linp_id in self.vmtf_element_dict.get("linp") or []:
+            res_folder = Path(self.tmp_folder_path, f"{linp_id}_res")
+            tvar_sim_path = res_folder / f"{linp_id}.tvar.sim"
+            if not tvar_sim_path.is_file() or any(err_file.stat().st_size > 0 for err_file in res_folder.glob("*.err")):
+                continue
+            with open(tvar_sim_path, encoding="utf-8") as f:
+                header, first_flux = f.readline(), f.readline()
+            if "SD" in header.rstrip("\n").split("\t") and first_flux.strip():
+                simulated_linp.append(linp_id)
+        return simulated_linp
+
+    def prepare_simulation(self, resume=False, param_list=None):
+        """
+        Generate the vmtf file of the combinations to simulate. If results are cached 
+        (see set_result_cache), the results of the combinations already simulated 
+        with the same model and the same influx_si options are taken from the cache.
+
+        :param resume: if False, the results of the previous run are cleared and all 
+                       combinations are simulated. If True, only the combinations without 
+                       complete results (e.g. after an interrupted run) are simulated, 
+                       the results of the others being kept.
+        :param param_list: list of command-line arguments that will be passed to influx_si 
+                           (None to not use the results cache)
+        :return: list of the IDs of the linp files to simulate
+        """
+        # Results ingested during a previous simulation are ingested again (see update_summary)
+        self.summary_builder = None
+        if not resume:
+            self.clear_previous_results()
+            linp_ids = list(self.vmtf_element_dict["linp"])
+        else:
+            simulated_linp = set(self.get_simulated_linp())
+            linp_ids = [linp_id for linp_id in self.vmtf_element_dict["linp"] if linp_id not in simulated_linp]
+            # Incomplete results are removed before the combinations are simulated again
+            for linp_id in linp_ids:
+                shutil.rmtree(Path(self.tmp_folder_path, f"{linp_id}_res"), ignore_errors=True)
+            logger.info(f"Resume: {len(simulated_linp)} combinations have already been simulated, "
+                        f"{len(linp_ids)} combinations remain to be simulated.")
+
+        if self.result_cache is not None and param_list and linp_ids:
+            cache_keys = self.get_result_cache_keys(linp_ids, param_list)
+            cached_linp = {linp_id for linp_id, key in cache_keys.items() 
+                           if self.result_cache.get(key, Path(self.tmp_folder_path, f"{linp_id}_res", f"{linp_id}.tvar.sim"))}
+            linp_ids = [linp_id for linp_id in linp_ids if linp_id not in cached_linp]
+            logger.info(f"{len(cached_linp)} combinations have been found in the results cache.")
+
+        self.generate_vmtf_file(linp_ids)
+        return linp_ids
+
+    def set_result_cache(self, enabled=True, folder=None, max_size=None):
+        """
+        Enable or disable the cache of the simulation results shared by all sessions (see ResultCache).
+
+        :param enabled: True to reuse the results of the combinations already simulated
+        :param folder: folder of the cache (None for the default folder)
+        :param max_size: maximal size of the cache in bytes (None for the default size)
+        """
+        self.result_cache = ResultCache(folder, max_size) if enabled else None
+
+    def get_result_cache_keys(self, linp_ids, param_list=None):
+        """
+        Return the keys of the results of linp files in the results cache.
+
+        :param linp_ids: IDs of the linp files
+        :param param_list: list of command-line arguments passed to influx_si 
+                           (None for the command of the last simulation)
+        :return: dictionary containing as key the linp file ID and as value its key in the cache
+        """
+        model_key = ResultCache.model_key([file.path for file in self.mtf_files.values()], 
+                                          param_list or self.command_list)
+        linp_hashes = self.read_linp_manifest()
+        return {linp_id: ResultCache.key(model_key, linp_hashes[f"{linp_id}.linp"]) 
+                for linp_id in linp_ids if f"{linp_id}.linp" in linp_hashes}
+
+    def cache_simulation_results(self, linp_ids):
+        """
+        Store the results of simulated linp files in the results cache 
+        (if results are cached, see set_result_cache).
+
+        :param linp_ids: IDs of the simulated linp files
+        """
+        if self.result_cache is None or not linp_ids:
+            return
+        simulated_linp = set(self.get_simulated_linp())
+        cache_keys = self.get_result_cache_keys([linp_id for linp_id in linp_ids if linp_id in simulated_linp])
+        for linp_id, key in cache_keys.items():
+            self.result_cache.put(key, Path(self.tmp_folder_path, f"{linp_id}_res", f"{linp_id}.tvar.sim"))
+        self.result_cache.evict()
+        logger.debug(f"{len(cache_keys)} results have been stored in the results cache.")
+
+    def read_linp_manifest(self):
+        """
+        Read the hashes of the linp files written by the previous generation.
+
+        :return: dictionary containing as key the linp file name and as value 
+                 the hash of its content (empty if there is no previous generation)
+        """
+        try:
+            with open(Path(self.tmp_folder_path, self.LINP_MANIFEST), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
                 
     def get_isotopomer_price(self, isotopomer_labelling, isotopomer_name):
         """ 
@@ -349,11 +808,7 @@ class Process:
         :param isotopomer_labelling: isotopomer labelling
         :param isotopomer_name: isotopomer name
         """
-
-        for isotopomers_list in self.isotopomers.values():
-            for isotopomer in isotopomers_list:
-                if isotopomer.labelling == isotopomer_labelling and isotopomer.name == isotopomer_name:
-                    return isotopomer.price
+        return self.isotopomers.get_price(isotopomer_name, isotopomer_labelling)
     
     def configure_linp_files(self):
         """
@@ -365,56 +820,40 @@ class Process:
         are then stored and used to create the final linp files.
 
         """
-        self.linp_dataframes = {}
-
-        # Calculate the number of digits based on the total number of files
-        total_files = len(self.label_input.isotopomer_combinations["All_combinations"])
-        num_digits = len(str(total_files))
+        total_files = self.label_input.count_combinations()
         
-        # Generate a dataframe for each pair of isotopomers 
-        for index, pair in enumerate(self.label_input.isotopomer_combinations["All_combinations"], start=1):
-            df = pd.DataFrame({'Id': None,
-                                'Comment': None,
-                                'Specie': self.label_input.names,
-                                'Isotopomer': self.label_input.labelling_patterns,
-                                'Value': pair.astype(float)})
-
-            # remove rows with value = 0
-            # df = df.loc[df["Value"] != 0]
-            
-            # add a column "Price" containing the price of each isotopomer multiplied by its fraction
-            # applies the 'get_isotopomer_price' method to each row (axis=1) in the dataframe 'df'
-            df["Price"] = df.apply(lambda x: self.get_isotopomer_price(x["Isotopomer"], x["Specie"]), axis=1) * df["Value"]
-            # logger.debug(f"Folder path : {self.tmp_folder_path}\n Dataframe {index:02d}:\n {df}")
-            
-            # Store the dataframe in the linp_dataframes dictionary
-            # key : ID_{index}, value : dataframe in dictionary format
-            self.linp_dataframes.update({f"ID_{index:0{num_digits}d}": df.to_dict(orient="list")})            
+        # Combinations are read by blocks to avoid holding all of them in memory at once 
+        # before being stored in a single fractions matrix, isotopomers being shared by all combinations
+        self.combinations = CombinationStore.from_blocks(
+            species=self.label_input.names,
+            patterns=self.label_input.labelling_patterns,
+            # price of each isotopomer, the price of each row is its price multiplied by its fraction
+            prices=[self.get_isotopomer_price(labelling, name) 
+                    for name, labelling in zip(self.label_input.names, self.label_input.labelling_patterns)],
+            blocks=self.label_input.iter_combinations(self.COMBINATIONS_CHUNK_SIZE),
+            # Blocks filtered by constraints have an unknown number of combinations, 
+            # at most the number of combinations before filtering
+            nb_combinations=None if self.label_input.combinations_filtered else total_files,
+            max_combinations=total_files)
+        
+        logger.debug(f"Combinations store : {self.combinations}")
             
 
     def remove_linp_configuration(self, index_to_remove:list):
         """
         Removes linp DataFrames from the linp_dataframes 
         list according to the indices specified in the 
-        list provided. 
+        list provided. The combinations are kept in the combinations 
+        store and can be reintegrated with reintegrate_linp_configuration.
 
-        :param index_to_remove: list of indices to remove 
-                                from linp_dataframes
+        :param index_to_remove: list of indices (positions in linp_dataframes) 
+                                to remove from linp_dataframes
         """   
-        to_remove = []
+        rows = self.combinations.enabled_rows[index_to_remove]
         
-        for index, (key, value) in enumerate(self.linp_dataframes.items()):
-            if index in index_to_remove:
-                # Store the linp DataFrames to remove in the linp_to_remove dictionary
-                # key : index, value : dictionary containing the id of the linp DataFrame as key and its content as value
-                # example : {0: {'ID_01': {'Id': None, 'Comment': None, 'Specie': ['Gluc', 'Gluc'], 'Isotopomer': ['111111', '100000'], 'Value': [0.5, 0.5], 'Price': [10.0, 10.0]}}
-                self.linp_to_remove[index] = {key: value}
-                to_remove.append(key)
-            
-        for id in to_remove:
-            logger.info(f"Combination(s) removed : {id}\n") 
-            logger.debug(f"{id} : {self.linp_dataframes[id]}\n")
-            del self.linp_dataframes[id]  
+        # All combinations are removed in a single change of the selection
+        rows = self.combinations.set_enabled(rows, False)
+        logger.info(f"Combination(s) removed : {[self.combinations.get_id(row) for row in rows]}\n") 
              
     
     def reintegrate_linp_configuration(self, index_to_reintegrate:list):
@@ -424,82 +863,162 @@ class Process:
         list provided. 
 
         :param index_to_reintegrate: list of indices to reintegrate 
-                                    into linp_dataframes.
-        """
-        # Get the keys of the linp DataFrames to reintegrate
-        for index in index_to_reintegrate:
-            for key, value in self.linp_to_remove[index].items():
-                items = list(self.linp_dataframes.items())
-                items.insert(index, (key, value))
-                self.linp_dataframes = dict(sorted(items))
-                logger.info(f"Combination reintegrated : {key}\n")
-                logger.debug(f"{key} : {value}\n")
-            del self.linp_to_remove[index]
+                                    into linp_dataframes (keys of linp_to_remove).
+        """
+        rows = np.asarray(index_to_reintegrate, dtype=np.int64)
+        # Only removed combinations can be reintegrated
+        for row in rows.tolist():
+            if self.combinations is None or not 0 <= row < len(self.combinations) or self.combinations.enabled[row]:
+                raise KeyError(row)
+        
+        rows = self.combinations.set_enabled(rows, True)
+        logger.info(f"Combination(s) reintegrated : {[self.combinations.get_id(row) for row in rows]}\n")
+
+    def set_linp_configuration_where(self, predicate, enabled=False):
+        """
+        Remove (or reintegrate) all combinations for which a predicate is True.
+
+        :param predicate: function taking the combinations store as argument and 
+                          returning a boolean vector with one value per combination
+                          (e.g. lambda combinations: combinations.nb_labeled_inputs() > 2)
+        :param enabled: False to remove the combinations, True to reintegrate them
+        """
+        rows = self.combinations.set_enabled_where(predicate, enabled)
+        logger.info(f"{len(rows)} combination(s) {'reintegrated' if enabled else 'removed'}.\n")
+
+    def undo_linp_configuration(self):
+        """
+        Undo the last removal or reintegration of combinations.
+
+        :return: True if a change has been undone
+        """
+        if self.combinations is None:
+            return False
+        rows = self.combinations.undo()
+        if len(rows):
+            logger.info(f"Last change undone for {len(rows)} combination(s).\n")
+        return bool(len(rows))
 
     def generate_linp_files(self):
         """
         Generates linp files (TSV format) in the temp folder (self.tmp_folder_path). 
-        Each file contains a combination of labelled substrates. 
+        Each file contains a combination of labelled substrates. Combinations 
+        giving the same linp file are written (and simulated) only once, under 
+        the ID of the first of them.
         
         A file is generated containing a mapping that associates each file 
-        number with its respective combinations. 
+        number with its respective combinations and with the ID of the 
+        simulated linp file. 
 
         """
 
+        rows = self.combinations.enabled_rows
+        # Store the number of labeled inputs and the total price of each linp file in the linp_infos dictionary
+        # Both are computed at once for all combinations from the fractions matrix. 
+        # It will be used in the rating criteria.
+        # key : index, value : namedtuple containing the number of labeled inputs and the total price
+        total_prices = self.combinations.total_prices(rows)
+        self.linp_infos = {self.combinations.get_id(row): linp_info(nb_labeled_inputs, total_price) 
+                           for row, nb_labeled_inputs, total_price in zip(rows, self.combinations.nb_labeled_inputs(rows).tolist(), total_prices)}
+        
+        # Each combination is associated to the first combination with the same linp content
+        canonical_rows = self.combinations.canonical_rows(rows)
+        self.linp_equivalences = {self.combinations.get_id(row): self.combinations.get_id(canonical_row) 
+                                  for row, canonical_row in zip(rows, canonical_rows)}
+        if np.any(canonical_rows != rows):
+            logger.info(f"{np.count_nonzero(canonical_rows != rows)} combinations have the same linp file as another combination "
+                        "and will not be simulated again.")
+
         # create mapping to associate file number with its respective combinations
-        with open(os.path.join(str(self.output_folder_path), f'{self.model_name}_IDs_combinations.tsv'), 'w', encoding="utf-8") as f:
+        with open(os.path.join(str(self.output_folder_path), f'{self.model_name}_IDs_combinations.tsv'), 'w', 
+                  encoding="utf-8", buffering=self.WRITE_BUFFER_SIZE) as f:
             # Write file column names
             f.write("ID\t" + 
-                    "\t".join([f"{specie}_{isotopomer}" for specie, isotopomer in zip(self.label_input.names, self.label_input.labelling_patterns)]) + 
-                    "\tPrice\n")
-            for index, dataframes in self.linp_dataframes.items():
-                # Dataframes are stored in dictionary format
-                df = pd.DataFrame.from_dict(dataframes)
-                # Write the content of the linp files in the tsv file
-                f.write(f"{index}\t" + 
-                        "\t".join(map(str, df["Value"])) +
-                        f"\t{df['Price'].sum()}\n")
-                # Remove rows with value = 0 (no values equal to 0 in ".linp" files)
-                df = df.loc[df["Value"] != 0]
-                df.to_csv(os.path.join(str(self.tmp_folder_path), f"{index}.linp"), sep="\t", index=False)
-                # Store the number of labeled inputs and the total price of each linp file in the linp_infos dictionary
-                # It will be used in the rating criteria.
-                # key : index, value : namedtuple containing the number of labeled inputs and the total price
-                self.linp_infos[f"{index}"] = linp_info(len([isotopomer for isotopomer in df["Isotopomer"] if "1" in isotopomer]), 
-                                                                df["Price"].sum())
+                    "\t".join([f"{specie}_{isotopomer}" for specie, isotopomer in zip(self.combinations.species, self.combinations.patterns)]) + 
+                    "\tPrice\tSimulated ID\n")
+            # Write the fractions of all isotopomers in the tsv file
+            # (fractions and prices are converted to floats once for all combinations)
+            f.writelines(f"{index}\t" + "\t".join(map(str, fractions)) + f"\t{total_price}\t{self.linp_equivalences[index]}\n"
+                         for index, fractions, total_price in zip(self.linp_equivalences, 
+                                                                  self.combinations.fractions[rows].astype(float).tolist(), 
+                                                                  total_prices.tolist()))
+
+        # Linp files of the simulated combinations (rows with value = 0 are not included, 
+        # no values equal to 0 in ".linp" files) are formatted from the fractions matrix.
+        # Only the files whose content has changed since the previous generation are written 
+        previous_hashes = self.read_linp_manifest()
+        hashes = self.combinations.write_linp_files(rows[canonical_rows == rows], self.tmp_folder_path, 
+                                                    self.LINP_WRITER_WORKERS, previous_hashes)
+        # Linp files that are not part of the design anymore are deleted
+        obsolete_files = [linp_file for linp_file in Path(self.tmp_folder_path).glob("*.linp") if linp_file.name not in hashes]
+        for linp_file in obsolete_files:
+            linp_file.unlink()
+        # Results of the linp files that have been deleted or whose content has changed are not valid anymore
+        for linp_file in [linp_file.name for linp_file in obsolete_files] + [name for name, file_hash in hashes.items() 
+                                                                             if previous_hashes.get(name) != file_hash]:
+            shutil.rmtree(Path(self.tmp_folder_path, f"{Path(linp_file).stem}_res"), ignore_errors=True)
+        with open(Path(self.tmp_folder_path, self.LINP_MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(hashes, f)
+        logger.debug(f"{sum(previous_hashes.get(name) != file_hash for name, file_hash in hashes.items())} linp files written, "
+                     f"{len(obsolete_files)} obsolete linp files deleted.")
              
-        self.vmtf_element_dict["linp"] = [f"{index}" for index in self.linp_dataframes.keys()]
+        self.vmtf_element_dict["linp"] = [f"{index}" for index in dict.fromkeys(self.linp_equivalences.values())]
 
         logger.info(f"{len(self.vmtf_element_dict['linp'])} linp files have been generated in {self.tmp_folder_path}.")
         
 
-    def generate_vmtf_file(self):
+    def generate_vmtf_file(self, linp_ids=None):
         """
         Generate a vmtf file (TSV format) that permit to combine variable
         and constant parts of a network model.
         This file contained columns using imported files extensions. Each row contains
         imported files names that will be used to produce a ftbl file used in the calculation. 
         Each row have ftbl column with unique and non empty name. 
+
+        :param linp_ids: IDs of the linp files to include in the vmtf file 
+                         (None for all the linp files, see prepare_simulation)
         """
+        vmtf_elements = dict(self.vmtf_element_dict)
+        if linp_ids is not None:
+            linp_ids = set(linp_ids)
+            vmtf_elements["linp"] = [linp_id for linp_id in vmtf_elements["linp"] if linp_id in linp_ids]
 
         # Value convert into Series 
         # Permit to create a dataframe from a dictionary where keys have different length of value   
-        df = pd.DataFrame.from_dict(self.vmtf_element_dict)
+        df = pd.DataFrame.from_dict(vmtf_elements)
         # Add a new column "ftbl" containing the values that are in the key "linp" of vmtf_element_dict
         # These values will be the names of the export folders of the results  
-        df["ftbl"] = self.vmtf_element_dict["linp"]
+        df["ftbl"] = vmtf_elements["linp"]
         logger.debug(f"Creation of the vmtf file containing these files :\n {df}")
-        df.to_csv(f"{self.tmp_folder_path}/{self.model_name}.vmtf", sep="\t", index=False)
+        content = df.to_csv(sep="\t", index=False)
+        vmtf_path = Path(f"{self.tmp_folder_path}/{self.model_name}.vmtf")
+        # The vmtf file is not written again if its content is unchanged
+        if vmtf_path.is_file():
+            with open(vmtf_path, newline="", encoding="utf-8") as f:
+                if f.read() == content:
+                    logger.debug("The vmtf file is unchanged.")
+                    return
+        with open(vmtf_path, "w", newline="", encoding="utf-8") as f:
+            f.write(content)
 
         # logger.info(f"Vmtf file has been generated in '{self.tmp_folder_path}.'\n")
 
 
-    def influx_simulation(self, param_list):
+    def influx_simulation(self, param_list, nb_shards=1, max_workers=None, cpu_affinity=False, stderr_callback=None):
         """
         Run the simulation using the specified influx_si mode (stationary or instationary).
+        The combinations can be split in several shards simulated by concurrent 
+        influx_si processes (see ShardedSimulation). The end of the simulation can be 
+        waited without polling and its error output is read while it runs (see SimulationRunner).
 
         :param param_list: List of command-line arguments to pass to influx_si.
-        :return: A Popen object representing the running subprocess.
+        :param nb_shards: number of shards in which the combinations are split
+        :param max_workers: maximal number of shards simulated at the same time 
+                            (None for the number of CPU cores)
+        :param cpu_affinity: if True, each running shard is bound to its own subset of the CPU cores 
+        :param stderr_callback: function called with each line of the error output of influx_si
+        :return: A SimulationRunner object representing the running subprocess 
+                 (or a ShardedSimulation object if there are several shards).
         """
         # Change directory to the folder containing all the file to use for influx_si
         os.chdir(self.tmp_folder_path)
@@ -507,12 +1026,60 @@ class Process:
         self.command_list = param_list
         logger.info(f"Command to run: {self.command_list}")
 
-        result = subprocess.Popen(self.command_list, 
-                                    stderr=subprocess.PIPE,
-                                    text=True)
-        return result
+        if nb_shards > 1:
+            return ShardedSimulation(self.command_list, Path(self.tmp_folder_path, f"{self.model_name}.vmtf"), 
+                                     [file.path for file in self.mtf_files.values()], 
+                                     nb_shards, max_workers, cpu_affinity, stderr_callback)
+
+        return SimulationRunner(self.command_list, self.tmp_folder_path, stderr_callback)
     
 
+    def track_simulation_progress(self, linp_ids, callback=None):
+        """
+        Start following the progress of a simulation (completed combinations, throughput, 
+        estimated remaining time and stragglers). The progress is written in the 
+        PROGRESS_FILE file of the temp folder.
+
+        :param linp_ids: IDs of the simulated linp files (see prepare_simulation)
+        :param callback: function called with the progress each time a combination is completed
+        :return: the started SimulationProgress object (to stop at the end of the simulation)
+        """
+        return SimulationProgress(self.tmp_folder_path, linp_ids, Path(self.tmp_folder_path, self.PROGRESS_FILE), 
+                                  callback=callback).start()
+
+    def update_summary(self, progress : SimulationProgress):
+        """
+        Ingest the results of the combinations completed since the last update 
+        during a simulation, so that the results can be analyzed before the end 
+        of the simulation and the summary is generated quickly at the end (see generate_summary).
+        The results and the number of structurally identified fluxes are updated 
+        with the combinations simulated so far.
+
+        :param progress: SimulationProgress object following the simulation (see track_simulation_progress)
+        :return: True if new results have been ingested
+        """
+        if self.summary_builder is None:
+            # Results already present in the temp folder (resumed simulation or cached results)
+            self.summary_builder = SummaryBuilder(self.TVAR_SIM_READER_WORKERS)
+            self.summary_builder.scan(self.tmp_folder_path)
+        elif not self.summary_builder.update(progress):
+            return False
+        
+        self.results = self.summary_builder.build(self.mtf_files['tvar'].data, self.linp_equivalences, self.linp_infos)
+        self.filtered_results = None
+        self.structures_identified = self.summary_builder.structures_identified(self.linp_equivalences)
+        return True
+
+    def discard_partial_summary(self):
+        """
+        Discard the results ingested during a simulation that failed or was 
+        interrupted (see update_summary), so that they are not shown as a 
+        preview of the current simulation.
+        """
+        self.summary_builder = None
+        self.summary_dataframe = None
+        self.structures_identified = {}
+
     def check_err_files(self):
         """ 
         Check if, at the end of calculations with influx_si, ".err" files are 
@@ -533,7 +1100,7 @@ class Process:
                         logger.error(f"Error file {err_files} : {err_file_content}")
                         raise Exception(f"Error file {err_files} : {err_file_content}")
           
-    def generate_summary(self):
+    def generate_summary(self, excel=False, background=True):
         """
         Read the tvar.sim files and generate a summary dataframe containing :
             - flux names, flux types,
@@ -541,57 +1108,45 @@ class Process:
             - the difference between the flux values in the input tvar file and the tvar.sim files,
             - flux SDs in each tvar.sim file
         
-        The summary dataframe is generated in an excel file in the results folder.
-        During the simulation, fluxes are added. These are highlighted in the summary dataframe.
-        
+        The summary dataframe is exported in the results folder (see SUMMARY_EXPORT_FORMATS).
+        It can also be written in an excel file, in which the fluxes added during the 
+        simulation (rows with missing values) are highlighted.
+
+        :param excel: if True, the summary is also written in an excel file
+        :param background: if True, the excel file is written in a background thread 
+        :return: Future object of the excel export if it is written in the background, None otherwise
         """
 
-        # use os.walk to generate the names of folders, subfolders and files in a given directory
-        self.tvar_sim_paths = [Path(f"{root}/{files}") 
-                              for (root, _ , files_names) in os.walk(self.tmp_folder_path) 
-                                for files in files_names if files.endswith('.tvar.sim')]
-        
+        # Each tvar.sim file is read once (in parallel) to get the SDs, the flux values 
+        # and the structural identifiability of the fluxes. Files already ingested during 
+        # the simulation (see update_summary) are not read again
+        builder = self.summary_builder if self.summary_builder is not None else SummaryBuilder(self.TVAR_SIM_READER_WORKERS)
+        builder.scan(self.tmp_folder_path)
+        self.tvar_sim_paths = list(builder.paths.values())
         logger.debug(f"List of tvar.sim file paths : \n {self.tvar_sim_paths}")
         # get the number of structurally identified fluxes from each "tvar.sim" files 
         # Fluxes are considered structurally identified if they have an SD <= 10000 
-        self.structures_identified={
-            file_path.name.split(".")[0]: sum([len(struct) for struct in pd.read_csv(file_path, sep="\t", usecols=["Struct_identif"]).values if struct == 'yes']) 
-            for file_path in self.tvar_sim_paths}
-
-        # dictionary containing columns "Name", "Kind" and "SD" from each tvar.sim file
-        tvar_sim_dataframes = {
-            f'{file_path.name.split(".")[0]}': pd.read_csv(
-                file_path, sep="\t", usecols=["Name", "Kind", "SD"], index_col=["Name", "Kind"]).rename(
-                    columns={"SD": f"{file_path.name.split('.')[0]}"})
-            for file_path in self.tvar_sim_paths
-        }
-        tvar_sim_dataframes = pd.concat(tvar_sim_dataframes.values(), axis=1, join="inner")
-        logger.debug(f"tvar_sim_dataframes: {tvar_sim_dataframes}")
-
-        # take the flux values from the first tvar.sim file 
-        # flux values are the same in all tvar.sim files
-        tvar_sim_values = pd.read_csv(self.tvar_sim_paths[0], sep="\t", usecols=["Value", "Name", "Kind"]) 
-
-        # take the "Name", "Kind" and "Value" columns from the input tvar file
-        input_tvar_file = self.mtf_files['tvar'].data[["Name", "Kind", "Value"]]
-        # merge data from the input tvar file with data from tvar.sim files based on flux names and kind
-        merged_tvar = pd.merge(input_tvar_file, tvar_sim_values, on=["Name", "Kind"], how="outer", suffixes=('_init', None))
-        merged_tvar["Value difference"] = merged_tvar["Value_init"] - merged_tvar["Value"]
-        logger.debug(f"Merged_tvar_values : {merged_tvar}")
-
-        # merge the "merged_tvar" dataframe with concatenated dataframes from the "tvar_sim_dataframes" dataframes
-        # delete the "Value_tvar_init" column, which is not required 
-        self.summary_dataframe = pd.merge(merged_tvar, tvar_sim_dataframes, on=["Name","Kind"]).rename(columns={"Value_init": " Intial flux value"})
-        logger.debug(f"Summary dataframe present in '{self.output_folder_path}' : {self.summary_dataframe}\n")
-
-        # Creating a Styler object for the summary_dataframe DataFrame
-        summary_dataframe_styler=self.summary_dataframe.style.apply(
-            # If at least one value is missing in the row, set the style with a pale yellow background color
-            # Repeating the style for each cell in the row
-            lambda row: ['background-color: #fffbcc' if row.isnull().any() else '' for _ in row],
-            # Applying the lambda function along the rows of the DataFrame
-            axis=1)
-        summary_dataframe_styler.to_excel(f"{self.output_folder_path}/{self.model_name}_summary.xlsx", index=False)
+        self.structures_identified = builder.structures_identified(self.linp_equivalences)
+        self.results = builder.build(self.mtf_files['tvar'].data, self.linp_equivalences, self.linp_infos)
+        self.filtered_results = None
+        self.summary_builder = None
+        # Each summary is saved in its own folder, so that the results of previous summaries 
+        # (e.g. of registered analyses) are not replaced
+        results_folder = Path(self.output_folder_path, f"{self.model_name}_results")
+        self.results.save(ResultsStore.new_folder(results_folder))
+        # Folders of the previous summaries that are not used by registered analyses are deleted
+        ResultsStore.prune_folders(results_folder, [self.results] + [analysis["results"].store for analysis in self.all_scores.values()
+                                                                     if isinstance(analysis.get("results"), ResultsView)])
+        logger.debug(f"{self.results} saved in '{self.results.path}'\n")
+
+        # Columnar and text exports are fast, the styled excel file is optional
+        export_summary(self.summary_dataframe, Path(self.output_folder_path, f"{self.model_name}_summary"), 
+                       self.SUMMARY_EXPORT_FORMATS)
+        if excel:
+            excel_path = Path(self.output_folder_path, f"{self.model_name}_summary.xlsx")
+            if background:
+                return write_excel_summary_in_background(self.summary_dataframe, excel_path)
+            write_excel_summary(self.summary_dataframe, excel_path)
 
 
     def data_filter(self, fluxes_names:list=None, kind:list=None, pathways:list=None):
@@ -605,14 +1160,16 @@ class Process:
         :return: filtered dataframe
         """
         
-        self.filtered_dataframe = self.summary_dataframe.copy()
+        # The filters select rows of the results store (the SDs are not copied)
+        fluxes = self.results.fluxes
+        mask = np.ones(len(fluxes), dtype=bool)
 
         if fluxes_names:
             # keep only rows with fluxes names in the list
-            self.filtered_dataframe = self.filtered_dataframe.loc[self.filtered_dataframe["Name"].isin(fluxes_names)]
+            mask &= fluxes["Name"].isin(fluxes_names).to_numpy()
         if kind:
             # keep only rows with kind in the list
-            self.filtered_dataframe = self.filtered_dataframe.loc[self.filtered_dataframe["Kind"].isin(kind)]
+            mask &= fluxes["Kind"].isin(kind).to_numpy()
         if pathways:
             # list storing all fluxes concerned by the selected metabolic pathway(s) 
             all_fluxes = []
@@ -621,7 +1178,8 @@ class Process:
                 # In netan dictionary, key : pathway names, value : list with fluxes names involved in this pathway as value
                 all_fluxes.extend(self.netan["pathway"][pathway_name])
         
-            self.filtered_dataframe = self.filtered_dataframe.loc[self.filtered_dataframe["Name"].isin(all_fluxes)]
+            mask &= fluxes["Name"].isin(all_fluxes).to_numpy()
+        self.filtered_results = self.results.view(np.flatnonzero(mask))
         # Store the filters used in the analysis
         self.filters = {
             "fluxes_names": fluxes_names,
@@ -640,15 +1198,16 @@ class Process:
         :param operation: operation to apply to the scores (Addition, Multiply, Divide)
         :param kwargs: additional arguments for the rating methods
         """
-        score_object = ScoreHandler(self.filtered_dataframe.iloc[:, 5:] if self.filtered_dataframe is not None else self.summary_dataframe.iloc[:, 5:])
+        results = self.filtered_results if self.filtered_results is not None else self.results
+        # The criteria are computed on the whole SD matrix of the results at once
+        score_object = ScoreHandler(results.sd_dataframe(), results.metadata)
         
         score_object.apply_criteria(method, **kwargs)
         if operation:
             score_object.apply_operations(operation)
 
         # Store the scores in a dataframe    
-        self.scores = pd.DataFrame.from_dict(score_object.columns_scores, 
-                                   orient='index')
+        self.scores = score_object.scores_dataframe
         # Store the criteria, parameters and operations used to generate the scores
         self.selected_criteria = method
         self.criteria_parameters = kwargs
@@ -663,19 +1222,154 @@ class Process:
         """
         self.scores=np.log10(self.scores)
 
+    def start_adaptive_design(self):
+        """
+        Start an adaptive design: the combinations of the first round are
+        the grid given by the number of intervals of the isotopomers, which
+        should be coarse. The following rounds are generated with refine_design.
+        """
+        self.generate_combinations()
+        self.configure_linp_files()
+        self.refinement = GridRefinement(self.label_input.isotopomer_group, self.label_input.denominators,
+                                         self.combinations.fractions, self.constraints)
+        self.refinement_rounds = []
+        logger.info(f"Adaptive design started with {len(self.combinations)} combinations "
+                    f"(resolution {self.refinement.resolution:g}).")
+
+    def refine_design(self, nb_best=5, score_column=None, ascending=None, target_resolution=None, 
+                      max_simulations=None, max_rounds=None):
+        """
+        Record the current round of an adaptive design with its scores (see generate_score)
+        and generate the combinations of the next round around the best combinations
+        of all rounds. The combinations of the previous rounds stay in the design
+        (with their linp files and results), so that the next round only simulates
+        the new combinations (see run_adaptive_design).
+
+        :param nb_best: number of best combinations to refine
+        :param score_column: column of the scores table used to rank the combinations.
+                             If None, the operation applied to the scores or the single criterion is used.
+        :param ascending: True if the best combinations have the lowest scores. If None,
+                          it is deduced from the criterion (see MINIMIZED_CRITERIA).
+        :param target_resolution: the refinement stops when the intervals of all isotopomers
+                                  are smaller or equal to this fraction
+        :param max_simulations: the refinement stops when this number of combinations has been generated
+        :param max_rounds: the refinement stops after this number of refinement rounds
+
+        :return: IDs of the new combinations (empty list if the refinement is finished)
+        """
+        if self.refinement is None:
+            raise ValueError("No adaptive design has been started. Please use start_adaptive_design first.")
+        if self.scores is None:
+            raise ValueError("No scores have been generated for the current round.")
+
+        if score_column is None:
+            if self.applied_operations:
+                score_column = self.applied_operations
+            elif len(self.scores.columns) == 1:
+                score_column = self.scores.columns[0]
+            else:
+                raise ValueError("Several criteria have been applied. Please give the score column used to rank the combinations.")
+        if ascending is None:
+            if score_column not in self.scores.columns or score_column == self.applied_operations:
+                raise ValueError(f"Cannot deduce whether {score_column} should be minimized. Please set the ascending parameter.")
+            ascending = score_column in MINIMIZED_CRITERIA
+
+        # Best combinations are searched among the scores of all rounds
+        all_scores = pd.concat([self.scores[score_column]] + [previous_round["scores"][score_column]
+                                                              for previous_round in self.refinement_rounds])
+        all_scores = all_scores[~all_scores.index.duplicated()]
+        best_ids = all_scores.sort_values(ascending=ascending, kind="stable").index[:nb_best].tolist()
+
+        # Combinations of the current round : enabled combinations not recorded in the previous rounds
+        previous_ids = {index for previous_round in self.refinement_rounds for index in previous_round["ids"]}
+        self.refinement_rounds.append({
+            "round": self.refinement.round,
+            "resolution": self.refinement.resolution,
+            "ids": [index for index in map(self.combinations.get_id, self.combinations.enabled_rows) if index not in previous_ids],
+            "scores": self.scores.copy(),
+            "best_ids": best_ids,
+        })
+        logger.info(f"Round {self.refinement.round} - best combinations : {best_ids}")
+
+        if max_rounds is not None and self.refinement.round >= max_rounds:
+            logger.info(f"Maximal number of rounds ({max_rounds}) has been reached.")
+            return []
+        if target_resolution is not None and self.refinement.resolution <= target_resolution:
+            logger.info(f"Target resolution {target_resolution:g} has been reached.")
+            return []
+        budget = max_simulations - len(self.combinations) if max_simulations is not None else None
+        if budget is not None and budget <= 0:
+            logger.info(f"Simulation budget ({max_simulations} combinations) has been reached.")
+            return []
+
+        fractions = self.refinement.refine([self.combinations.get_row(index) for index in best_ids], budget)
+        if not len(fractions):
+            logger.info("No new combination can be generated around the best combinations.")
+            return []
+
+        rows = self.combinations.append(fractions)
+        return [self.combinations.get_id(row) for row in rows]
+
+    def run_adaptive_design(self, param_list, method: list, operation=None, nb_best=5, score_column=None,
+                            ascending=None, target_resolution=None, max_simulations=None, max_rounds=None, **kwargs):
+        """
+        Run all rounds of an adaptive design: for each round, the linp files are
+        generated, simulated with influx_si, summarized and scored, then the
+        combinations surrounding the best ones are generated (see refine_design).
+        After the first round, the simulation is resumed: only the new combinations
+        are simulated and the summary and the scores cover all rounds.
+
+        :param param_list: list of command-line arguments to pass to influx_si
+        :param method: list of criteria methods to apply (see generate_score)
+        :param operation: operation to apply to the scores (see generate_score)
+        :param nb_best: number of best combinations to refine at each round
+        :param score_column: column of the scores table used to rank the combinations (see refine_design)
+        :param ascending: True if the best combinations have the lowest scores (see refine_design)
+        :param target_resolution: smallest interval (fraction) to reach
+        :param max_simulations: maximal number of combinations to simulate over all rounds
+        :param max_rounds: maximal number of refinement rounds
+        :param kwargs: additional arguments for the rating methods
+        """
+        self.start_adaptive_design()
+        while True:
+            self.generate_linp_files()
+            self.copy_files()
+            # Results of the previous rounds are kept
+            linp_to_simulate = self.prepare_simulation(resume=bool(self.refinement_rounds), param_list=param_list)
+
+            if linp_to_simulate:
+                result = self.influx_simulation(param_list)
+                _, stderr_output = result.communicate()
+                if result.returncode != 0:
+                    self.check_err_files()
+                    raise RuntimeError(f"An error has occured during the simulation: {stderr_output}")
+                self.cache_simulation_results(linp_to_simulate)
+
+            self.generate_summary()
+            # Linp files informations change at each round
+            kwargs.update(info_linp_files_dict=dict(self.linp_infos), struct_identif_dict=dict(self.structures_identified))
+            self.generate_score(method, operation, **kwargs)
+
+            if not self.refine_design(nb_best, score_column, ascending, target_resolution, max_simulations, max_rounds):
+                break
+        logger.info(f"Adaptive design finished after {len(self.refinement_rounds)} rounds "
+                    f"and {len(self.combinations)} combinations.")
+
     def register_scores(self, number, block_name):
         """
-        Stores the analysis data (dataframe, criteria, criteria parameters,
-        score table, filters and operations) in a dictionary.
+        Stores the analysis data (results view of the filtered fluxes, criteria, 
+        criteria parameters, score table, filters and operations) in a dictionary.
         This method updates the all_scores dictionary with a new key
         identified by the specified "number".
 
         :param number: number corresponding to the analysis 
         """
+        # The results of registered analyses are pickled with the session
+        self.results.pickle_sds = True
         self.all_scores.update(
             {number: {
                 "name" : block_name,
-                "dataframe": self.filtered_dataframe,
+                "results": self.filtered_results if self.filtered_results is not None else self.results.view(),
                 "filters": self.filters,
                 "criteria": self.selected_criteria,
                 "criteria_parameters": self.criteria_parameters,
@@ -697,7 +1391,10 @@ class Process:
         res_folder_path.mkdir(parents=True, exist_ok=True)
 
         # Export the dataframe and the scores table to tsv files
-        self.all_scores[number]["dataframe"].to_csv(f"{res_folder_path}/{self.all_scores[number]['name']}_dataframe.tsv", index=False, sep="\t")
+        # (dataframes were stored directly in previous versions)
+        scores = self.all_scores[number]
+        dataframe = scores["results"].dataframe if "results" in scores else scores["dataframe"]
+        dataframe.to_csv(f"{res_folder_path}/{self.all_scores[number]['name']}_dataframe.tsv", index=False, sep="\t")
         self.all_scores[number]["columns_scores"].to_csv(f"{res_folder_path}/{self.all_scores[number]['name']}_scores.tsv", index=True, sep="\t")
 
         figure.write_html(f"{res_folder_path}/{self.all_scores[number]['name']}_barplot.html")
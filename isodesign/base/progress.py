@@ -0,0 +1,214 @@
+from datetime import datetime
+import json
+import logging
+import os
+from pathlib import Path
+import statistics
+import threading
+import time
+
+logger = logging.getLogger(f"IsoDesign.{__name__}")
+
+# watchdog (inotify on Linux) is optional: the "_res" folders are scanned periodically without it
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler, Observer = object, None
+
+
+class _ResultsEventHandler(FileSystemEventHandler):
+    """
+    Forward the creation of results files and folders to a SimulationProgress object
+    """
+    def __init__(self, progress):
+        super().__init__()
+        self.progress = progress
+
+    def on_any_event(self, event):
+        if event.event_type == "deleted":
+            return
+        if event.event_type != "moved":
+            self.progress.record(Path(os.fsdecode(event.src_path)))
+            return
+        # Results moved (e.g. "_res" folders of the shards moved to the temp folder)
+        # are recorded at their new location
+        dest_path = Path(os.fsdecode(event.dest_path))
+        self.progress.record(dest_path)
+        if event.is_directory:
+            for tvar_sim_path in dest_path.glob("*.tvar.sim"):
+                self.progress.record(tvar_sim_path)
+
+
+class SimulationProgress:
+    """
+    Progress of a simulation, followed from the results written by influx_si
+    in the temp folder: a combination starts when its "_res" folder is created
+    and is completed when its ".tvar.sim" file is written. The results folder
+    is watched with watchdog (inotify on Linux) when it is installed, and
+    scanned periodically otherwise.
+
+    The progress (number of completed combinations, throughput, estimated
+    remaining time and stragglers) is written in a JSON file each time it changes.
+    """
+    # Time (in seconds) between two scans of the results folder without watchdog
+    POLL_INTERVAL = 5.0
+    # A running combination is a straggler if it runs for longer than
+    # STRAGGLER_FACTOR times the median duration of the completed combinations
+    STRAGGLER_FACTOR = 3.0
+
+    def __init__(self, folder, linp_ids, progress_file=None, watch=True, poll_interval=None, callback=None):
+        """
+        :param folder: folder in which influx_si writes the results (temp folder)
+        :param linp_ids: IDs of the simulated linp files
+        :param progress_file: path of the JSON file containing the progress (None to not write it)
+        :param watch: if True, the folder is watched with watchdog (if it is installed),
+                      otherwise it is scanned periodically
+        :param poll_interval: time between two scans of the folder in seconds (None for POLL_INTERVAL)
+        :param callback: function called with the progress (see snapshot) each time it changes
+        """
+        self.folder = Path(folder)
+        self.linp_ids = list(linp_ids)
+        self.progress_file = Path(progress_file) if progress_file is not None else None
+        self.watch = watch and Observer is not None
+        self.poll_interval = poll_interval if poll_interval is not None else self.POLL_INTERVAL
+        self.callback = callback
+
+        # Start and completion times of the combinations
+        # key : linp file ID, value : time (time.time())
+        self.started = {}
+        self.completed = {}
+        # Paths of the results of the completed combinations (updated when the results are moved)
+        # key : linp file ID, value : path of the ".tvar.sim" file
+        self.results_paths = {}
+        self.start_time = None
+        self.end_time = None
+        self._linp_ids = set(self.linp_ids)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._observer = None
+        self._poller = None
+
+    def __repr__(self) -> str:
+        return f"SimulationProgress({len(self.completed)}/{len(self.linp_ids)} combinations completed)"
+
+    def start(self):
+        """
+        Start following the progress of the simulation.
+        """
+        self.start_time = time.time()
+        if self.watch:
+            self._observer = Observer()
+            self._observer.schedule(_ResultsEventHandler(self), str(self.folder), recursive=True)
+            self._observer.start()
+        else:
+            self._poller = threading.Thread(target=self._poll, daemon=True)
+            self._poller.start()
+        # Results written before the folder is watched
+        self.scan()
+        return self
+
+    def stop(self):
+        """
+        Stop following the progress and write the final progress.
+        """
+        self._stop_event.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._poller is not None:
+            self._poller.join()
+        self.scan()
+        self.end_time = time.time()
+        self._write_progress()
+
+    def _poll(self):
+        # Event.wait returns as soon as the progress is stopped
+        while not self._stop_event.wait(self.poll_interval):
+            self.scan()
+
+    def scan(self):
+        """
+        Record all the results present in the results folder (including the folders of the shards).
+        """
+        for res_folder in [*self.folder.glob("*_res"), *self.folder.glob("*/*/*_res")]:
+            self.record(res_folder, res_folder.stat().st_mtime)
+            for tvar_sim_path in res_folder.glob("*.tvar.sim"):
+                self.record(tvar_sim_path)
+
+    def record(self, path, event_time=None):
+        """
+        Record the start ("_res" folder) or the completion (".tvar.sim" file) of a combination.
+        A ".tvar.sim" file recorded again (e.g. moved from the folder of a shard) only updates 
+        the path of the results of the combination.
+
+        :param path: path of the created file or folder
+        :param event_time: time of the creation (None for the current time)
+        """
+        event_time = event_time if event_time is not None else time.time()
+        if path.name.endswith("_res"):
+            linp_id, times = path.name[:-len("_res")], self.started
+        elif path.name.endswith(".tvar.sim"):
+            linp_id, times = path.name[:-len(".tvar.sim")], self.completed
+        else:
+            return
+        if linp_id not in self._linp_ids:
+            return
+
+        with self._lock:
+            if times is self.completed:
+                self.results_paths[linp_id] = path
+            if linp_id in times:
+                return
+            times[linp_id] = event_time
+            self.started.setdefault(linp_id, event_time)
+        if times is self.completed:
+            self._write_progress()
+
+    def stragglers(self, now=None):
+        """
+        Return the IDs of the running combinations that run for much longer than
+        the completed ones (see STRAGGLER_FACTOR).
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            durations = [self.completed[linp_id] - self.started[linp_id] for linp_id in self.completed]
+            running = {linp_id: start for linp_id, start in self.started.items() if linp_id not in self.completed}
+        if not durations:
+            return []
+        max_duration = self.STRAGGLER_FACTOR * max(statistics.median(durations), 1e-3)
+        return [linp_id for linp_id, start in running.items() if now - start > max_duration]
+
+    def snapshot(self):
+        """
+        Return the progress of the simulation: number of completed combinations,
+        throughput (combinations per minute), elapsed time and estimated remaining
+        time (ETA, in seconds) and the stragglers.
+        """
+        now = self.end_time or time.time()
+        elapsed_time = now - self.start_time if self.start_time is not None else 0.0
+        nb_completed = len(self.completed)
+        rate = nb_completed / elapsed_time * 60 if elapsed_time > 0 else 0.0
+        remaining = len(self.linp_ids) - nb_completed
+        return {"completed": nb_completed,
+                "total": len(self.linp_ids),
+                "elapsed_time": elapsed_time,
+                "combinations_per_minute": rate,
+                "eta": remaining / rate * 60 if rate > 0 else None,
+                "stragglers": self.stragglers(now),
+                "updated": datetime.now().isoformat(timespec="seconds")}
+
+    def _write_progress(self):
+        """
+        Write the progress in the progress file and pass it to the callback.
+        """
+        progress = self.snapshot()
+        if self.progress_file is not None:
+            # The file is replaced at once so that it is never read incomplete
+            tmp_path = self.progress_file.with_name(f"{self.progress_file.name}.tmp")
+            with self._lock:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(progress, f, indent=2)
+                os.replace(tmp_path, self.progress_file)
+        if self.callback is not None:
+            self.callback(progress)
@@ -0,0 +1,158 @@
+from itertools import product
+import logging
+import numpy as np
+
+logger = logging.getLogger(f"IsoDesign.{__name__}")
+
+# Criteria for which the best combinations have the lowest scores
+MINIMIZED_CRITERIA = ["sum of SDs", "number of labeled inputs", "price"]
+
+
+class GridRefinement:
+    """
+    Adaptive coarse-to-fine refinement of the combinations grid.
+
+    The first round is the grid given by the number of intervals of the isotopomers.
+    At each following round, the number of intervals of every isotopomer is doubled,
+    but only the points of the simplex cells surrounding the best combinations
+    are kept: each fraction of a best combination is moved by at most one
+    (new) interval. Combinations are handled as integer numerators over the
+    denominator of their isotopomers group (see LabelInput), so that points
+    of different rounds can be compared exactly.
+    """
+
+    def __init__(self, isotopomer_group: dict, denominators: dict, fractions, constraints=None):
+        """
+        :param isotopomer_group: dictionary containing as key substrate name of the isotopomer group
+                                 and as values the list of isotopomers (see LabelInput)
+        :param denominators: common denominator of the fractions of each isotopomers group (see LabelInput)
+        :param fractions: 2D array of the fractions of the combinations of the first round
+                          (one row per combination and one column per isotopomer, in the order of the groups)
+        :param constraints: Constraints object. New combinations that do not respect 
+                            the constraints are not generated.
+        """
+        self.isotopomer_group = isotopomer_group
+        self.constraints = constraints
+        # Columns of each isotopomers group in the combinations
+        # key : substrate name, value : slice of the columns
+        self.columns = {}
+        start = 0
+        for substrate, isotopomers in isotopomer_group.items():
+            self.columns[substrate] = slice(start, start + len(isotopomers))
+            start += len(isotopomers)
+
+        # Denominator of the fractions of each isotopomers group at the current round
+        self.denominators = dict(denominators)
+        # Number of the current round (0 for the first grid)
+        self.round = 0
+        # Numerators of all combinations generated so far, in the order of the combinations store
+        self.points = np.rint(np.asarray(fractions, dtype=np.float64) * self._column_denominators()).astype(np.int64)
+
+    def __repr__(self) -> str:
+        return f"GridRefinement(round {self.round}, resolution {self.resolution}, {len(self.points)} combinations)"
+
+    def _column_denominators(self):
+        """
+        Denominator of each column of the combinations
+        """
+        return np.concatenate([np.full(len(isotopomers), self.denominators[substrate], dtype=np.int64)
+                               for substrate, isotopomers in self.isotopomer_group.items()])
+
+    @staticmethod
+    def _varying_isotopomers(isotopomers):
+        """
+        Return the isotopomers whose fractions are generated in a group, the
+        fraction of the first isotopomer being deduced from the other ones (see LabelInput).
+        """
+        return isotopomers[1:] if len(isotopomers) > 1 else isotopomers
+
+    def _interval(self, isotopomer, substrate):
+        """
+        Size of an interval of an isotopomer at the current round, as a numerator
+        over the denominator of its group (0 if the fraction of the isotopomer is fixed).
+        """
+        first_denominator = self.denominators[substrate] // 2 ** self.round
+        return (isotopomer.upper_bound - isotopomer.lower_bound) * (first_denominator // isotopomer.intervals_nb)
+
+    @property
+    def resolution(self):
+        """
+        Largest interval (as a fraction) of the isotopomers at the current round
+        """
+        intervals = [self._interval(isotopomer, substrate) / self.denominators[substrate]
+                     for substrate, isotopomers in self.isotopomer_group.items()
+                     for isotopomer in self._varying_isotopomers(isotopomers)]
+        return max(intervals, default=0)
+
+    @property
+    def fractions(self):
+        """
+        Fractions of all combinations generated so far
+        """
+        return self.points / self._column_denominators()
+
+    def _group_neighbours(self, substrate, numerators):
+        """
+        Return the numerators of the points of an isotopomers group surrounding
+        a point, at the current round. Points outside of the bounds of the isotopomers
+        or whose fractions sum to more than 1 are discarded.
+
+        :param substrate: substrate name of the isotopomers group
+        :param numerators: numerators of the point (one per isotopomer of the group)
+
+        :return: 2D int64 array with one row per point
+        """
+        isotopomers = self.isotopomer_group[substrate]
+        denominator = self.denominators[substrate]
+        varying_isotopomers = self._varying_isotopomers(isotopomers)
+        varying_numerators = numerators[1:] if len(isotopomers) > 1 else numerators
+
+        intervals = np.array([self._interval(isotopomer, substrate) for isotopomer in varying_isotopomers], dtype=np.int64)
+        moves = np.array(list(product((-1, 0, 1), repeat=len(varying_isotopomers))), dtype=np.int64)
+        # Isotopomers with a fixed fraction are not moved
+        neighbours = np.unique(varying_numerators + moves * intervals, axis=0)
+
+        lower_bounds = np.array([isotopomer.lower_bound * denominator for isotopomer in varying_isotopomers])
+        upper_bounds = np.array([isotopomer.upper_bound * denominator for isotopomer in varying_isotopomers])
+        neighbours = neighbours[np.all((neighbours >= lower_bounds) & (neighbours <= upper_bounds), axis=1)
+                                & (neighbours.sum(axis=1) <= denominator)]
+
+        if len(isotopomers) > 1:
+            neighbours = np.column_stack((denominator - neighbours.sum(axis=1), neighbours))
+        return neighbours
+
+    def refine(self, rows, max_points=None):
+        """
+        Go to the next round: double the number of intervals of the isotopomers
+        and generate the combinations surrounding the given combinations that
+        have not been generated yet.
+
+        :param rows: row numbers of the combinations to refine (best combinations first)
+        :param max_points: maximal number of new combinations (None for no limit).
+                           Combinations surrounding the first rows are kept first.
+
+        :return: 2D float array of the fractions of the new combinations
+        """
+        self.round += 1
+        self.denominators = {substrate: denominator * 2 for substrate, denominator in self.denominators.items()}
+        self.points = self.points * 2
+
+        known_points = set(map(tuple, self.points.tolist()))
+        # Dictionary used as an ordered set of the new points
+        new_points = {}
+        for row in rows:
+            groups_neighbours = [self._group_neighbours(substrate, self.points[row, columns])
+                                 for substrate, columns in self.columns.items()]
+            for neighbours in product(*groups_neighbours):
+                point = tuple(np.concatenate(neighbours).tolist())
+                if point not in known_points:
+                    new_points[point] = None
+
+        new_points = np.array(list(new_points), dtype=np.int64).reshape(-1, self.points.shape[1])
+        if self.constraints is not None:
+            new_points = new_points[self.constraints.mask(self.isotopomer_group, new_points / self._column_denominators())]
+        new_points = new_points[:max_points]
+        self.points = np.vstack((self.points, new_points))
+        logger.info(f"Refinement round {self.round} (resolution {self.resolution:g}): "
+                    f"{len(new_points)} new combinations around {len(rows)} combinations.")
+        return new_points / self._column_denominators()
@@ -0,0 +1,162 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+import shutil
+
+logger = logging.getLogger(f"IsoDesign.{__name__}")
+
+
+def default_cache_folder():
+    """
+    Default folder of the results cache: "isodesign/results" in the user cache
+    folder (XDG_CACHE_HOME, or ~/.cache if it is not set).
+    """
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache", "isodesign", "results")
+
+
+def normalize_command(command_list):
+    """
+    Normalize influx_si command-line arguments so that equivalent commands give
+    the same cache key: the prefix (model name) is removed and the options
+    are sorted, each option keeping its values.
+
+    :param command_list: list of command-line arguments passed to influx_si
+    :return: tuple of the influx_si command and of the sorted options
+    """
+    command, *arguments = command_list
+    options = []
+    for argument in arguments:
+        if argument.startswith("-") or not options:
+            options.append([argument])
+        else:
+            options[-1].append(argument)
+    options = [option for option in options if option[0] != "--prefix"]
+    return (Path(command).name, *sorted(tuple(option) for option in options))
+
+
+class ResultCache:
+    """
+    Persistent cache of simulation results shared by all sessions. Each entry is
+    the tvar.sim file (fluxes values and SDs) of a simulated linp file, stored
+    under a key computed from the content of the model files, the options
+    of influx_si and the content of the linp file: a combination is not
+    simulated again as long as none of them changes.
+
+    The size of the cache is limited: the least recently used entries are
+    removed when it is exceeded.
+    """
+    # Default maximal size of the cache (in bytes)
+    MAX_SIZE = 1 << 30
+
+    def __init__(self, folder=None, max_size=None):
+        """
+        :param folder: folder of the cache (None for the default folder, see default_cache_folder)
+        :param max_size: maximal size of the cache in bytes (None for MAX_SIZE)
+        """
+        self.folder = Path(folder) if folder is not None else default_cache_folder()
+        self.max_size = max_size if max_size is not None else self.MAX_SIZE
+
+    def __repr__(self) -> str:
+        return f"ResultCache('{self.folder}', max size {self.max_size} bytes)"
+
+    @staticmethod
+    def model_key(files, command_list):
+        """
+        Key of a model simulated with a given command.
+
+        :param files: paths of the model files (MTF files)
+        :param command_list: list of command-line arguments passed to influx_si
+        :return: hexadecimal hash of the content of the files and of the normalized command
+        """
+        model_hash = hashlib.blake2b(digest_size=16)
+        for file in sorted(map(Path, files), key=lambda file: file.suffix):
+            model_hash.update(file.suffix.encode("utf-8") + b"\0")
+            model_hash.update(file.read_bytes() + b"\0")
+        model_hash.update(repr(normalize_command(command_list)).encode("utf-8"))
+        return model_hash.hexdigest()
+
+    @staticmethod
+    def key(model_key, linp_hash):
+        """
+        Key of a linp file simulated with a model (see model_key).
+
+        :param linp_hash: hash of the content of the linp file
+        """
+        return hashlib.blake2b(f"{model_key}:{linp_hash}".encode("utf-8"), digest_size=16).hexdigest()
+
+    def _path(self, key):
+        # Entries are spread in subfolders to keep folders small
+        return self.folder / key[:2] / f"{key}.tvar.sim"
+
+    def get(self, key, destination):
+        """
+        Copy the cached tvar.sim file of a key.
+
+        :param key: key of the entry (see key)
+        :param destination: path of the tvar.sim file to create
+        :return: True if the key is in the cache, otherwise False
+        """
+        path = self._path(key)
+        try:
+            Path(destination).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(path, destination)
+        except FileNotFoundError:
+            return False
+        # The modification time gives the last use of the entry
+        path.touch()
+        return True
+
+    def put(self, key, tvar_sim_path):
+        """
+        Store a tvar.sim file in the cache.
+
+        :param key: key of the entry (see key)
+        :param tvar_sim_path: path of the tvar.sim file
+        """
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # The file is written under a temporary name so that no incomplete entry can be read
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        shutil.copyfile(tvar_sim_path, tmp_path)
+        os.replace(tmp_path, path)
+
+    def entries(self):
+        """
+        Return the paths of the entries of the cache
+        """
+        return list(self.folder.glob("*/*.tvar.sim")) if self.folder.is_dir() else []
+
+    @property
+    def size(self):
+        """
+        Size of the cache in bytes
+        """
+        return sum(entry.stat().st_size for entry in self.entries())
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the size of the cache is below its maximal size.
+
+        :return: number of removed entries
+        """
+        entries = sorted(((entry.stat().st_mtime_ns, entry.stat().st_size, entry) for entry in self.entries()),
+                         key=lambda entry: entry[0])
+        size = sum(entry_size for _, entry_size, _ in entries)
+        nb_removed = 0
+        for _, entry_size, entry in entries:
+            if size <= self.max_size:
+                break
+            entry.unlink(missing_ok=True)
+            size -= entry_size
+            nb_removed += 1
+        if nb_removed:
+            logger.debug(f"{nb_removed} entries removed from the results cache.")
+        return nb_removed
+
+    def clear(self):
+        """
+        Remove all entries of the cache.
+        """
+        if self.folder.is_dir():
+            shutil.rmtree(self.folder)
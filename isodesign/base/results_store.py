@@ -0,0 +1,303 @@
+import logging
+import os
+from pathlib import Path
+import shutil
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(f"IsoDesign.{__name__}")
+
+# Columns of the summary describing the fluxes (the SDs of the combinations follow them)
+FLUXES_COLUMNS = ["Name", "Kind", " Intial flux value", "Value", "Value difference"]
+# Columns of the metadata of the combinations
+METADATA_COLUMNS = ["nb_labeled_inputs", "total_price", "structures_identified"]
+
+
+class ResultsStore:
+    """
+    Columnar storage of the simulation results of the combinations:
+    - a dataframe describing the fluxes (name, kind and values), one row per flux,
+    - a contiguous matrix of the SDs of the fluxes, one row per flux and one column per combination
+      (in row or column order),
+    - a dataframe of metadata of the combinations (number of labeled inputs, total price
+      and number of structurally identified fluxes), one row per combination.
+
+    The summary dataframe (fluxes followed by one SD column per combination) is built
+    from the store when it is needed. Filters select rows of the store (see ResultsView)
+    without copying the results.
+
+    The store can be saved in a folder, the SD matrix being saved in the ".npy" format.
+    Each store is saved in its own folder (see new_folder) and saved files are never
+    replaced, so that the folder of a store always contains its own results. A saved
+    store is pickled without its SD matrix (unless pickle_sds is True), which is
+    memory-mapped from the folder when it is accessed again.
+    """
+    SDS_FILE = "sds.npy"
+    FLUXES_FILE = "fluxes.tsv"
+    METADATA_FILE = "metadata.tsv"
+
+    def __init__(self, fluxes: pd.DataFrame, sds, ids: list, metadata: pd.DataFrame = None):
+        """
+        :param fluxes: dataframe describing the fluxes (FLUXES_COLUMNS), one row per flux
+        :param sds: matrix of the SDs, one row per flux and one column per combination
+        :param ids: IDs of the combinations
+        :param metadata: dataframe of the metadata of the combinations (METADATA_COLUMNS), indexed by ID
+        """
+        self.fluxes = fluxes.reset_index(drop=True)
+        self._sds = np.asarray(sds, dtype=np.float64).reshape(len(self.fluxes), len(ids))
+        # Contiguous matrices are not copied, in row (C) or column (Fortran) order
+        if not (self._sds.flags.c_contiguous or self._sds.flags.f_contiguous):
+            self._sds = np.ascontiguousarray(self._sds)
+        self.ids = list(ids)
+        self.metadata = metadata if metadata is not None else pd.DataFrame(index=self.ids, columns=METADATA_COLUMNS)
+        # Folder in which the store is saved (None if it has not been saved)
+        self.path = None
+        # If True, the SD matrix is pickled with the store even if it is saved 
+        # (e.g. results of registered analyses, see Process.register_scores)
+        self.pickle_sds = False
+        self._dataframe = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The summary dataframe is built again when needed
+        # and the SD matrix of a saved store is read from its folder
+        state["_dataframe"] = None
+        if self.path is not None and not self.pickle_sds:
+            state["_sds"] = None
+        elif self._sds is not None:
+            # A memory-mapped matrix is pickled as a regular array
+            state["_sds"] = np.asarray(self._sds)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update({"pickle_sds": False, **state})
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __repr__(self) -> str:
+        return f"ResultsStore({len(self.fluxes)} fluxes, {len(self.ids)} combinations)"
+
+    @property
+    def sds(self):
+        """
+        Matrix of the SDs (memory-mapped from the folder of a saved store)
+        """
+        if self._sds is None:
+            sds = np.load(Path(self.path, self.SDS_FILE), mmap_mode="r")
+            self._check_saved_results(self.path, sds, self.ids, len(self.fluxes))
+            self._sds = sds
+        return self._sds
+
+    @classmethod
+    def _check_saved_results(cls, folder, sds, ids, nb_fluxes):
+        """
+        Check that the SD matrix and the IDs saved in a folder correspond to a store.
+
+        :param folder: folder in which the store is saved
+        :param sds: SD matrix read from the folder
+        :param ids: IDs of the combinations of the store
+        :param nb_fluxes: number of fluxes of the store
+        """
+        saved_ids = pd.read_csv(Path(folder, cls.METADATA_FILE), sep="\t", usecols=["ID"], dtype={"ID": str})["ID"].tolist()
+        if sds.shape != (nb_fluxes, len(ids)) or saved_ids != list(ids):
+            raise ValueError(f"The results saved in '{folder}' ({sds.shape[0]} fluxes, {len(saved_ids)} combinations) "
+                             f"do not correspond to these results ({nb_fluxes} fluxes, {len(ids)} combinations). "
+                             "Please generate the summary again.")
+
+    def is_available(self):
+        """
+        Return True if the SD matrix can be read: it is in memory or its folder
+        contains the saved results of the store (folders of saved stores may have
+        been deleted or moved since the store was pickled).
+        """
+        try:
+            self.sds
+        except (OSError, ValueError) as error:
+            logger.warning(f"The results saved in '{self.path}' cannot be read: {error}")
+            return False
+        return True
+
+    @staticmethod
+    def new_folder(parent, prefix="summary"):
+        """
+        Create a new folder in which a store can be saved (prefix followed by 
+        the first number not used by the existing folders).
+
+        :param parent: folder containing the folders of the saved stores
+        :param prefix: prefix of the name of the folder
+        :return: path of the created folder
+        """
+        parent = Path(parent)
+        parent.mkdir(parents=True, exist_ok=True)
+        # Numbers of the deleted folders are used again (see prune_folders)
+        number = 1
+        while True:
+            folder = parent / f"{prefix}_{number}"
+            try:
+                folder.mkdir()
+                return folder
+            except FileExistsError:
+                number += 1
+
+    @classmethod
+    def from_dataframe(cls, summary_dataframe: pd.DataFrame, metadata: pd.DataFrame = None):
+        """
+        Create a store from a summary dataframe (fluxes columns followed by one SD column per combination).
+        """
+        nb_fluxes_columns = len(FLUXES_COLUMNS)
+        return cls(summary_dataframe.iloc[:, :nb_fluxes_columns],
+                   np.ascontiguousarray(summary_dataframe.iloc[:, nb_fluxes_columns:].to_numpy(dtype=np.float64)),
+                   list(summary_dataframe.columns[nb_fluxes_columns:]), metadata)
+
+    def sd_dataframe(self, rows=None):
+        """
+        Return the SDs as a dataframe with one column per combination
+        (without copying the SD matrix if all rows are selected).
+
+        :param rows: positions of the rows (fluxes) to select (None for all fluxes)
+        """
+        if rows is None:
+            return pd.DataFrame(self.sds, index=self.fluxes.index, columns=self.ids, copy=False)
+        return pd.DataFrame(self.sds[rows], index=self.fluxes.index[rows], columns=self.ids, copy=False)
+
+    @property
+    def dataframe(self):
+        """
+        Summary dataframe: columns describing the fluxes followed by one SD column per combination
+        """
+        if self._dataframe is None:
+            self._dataframe = pd.concat([self.fluxes, self.sd_dataframe()], axis=1)
+        return self._dataframe
+
+    def view(self, rows=None):
+        """
+        Return a view of some fluxes of the store.
+
+        :param rows: positions of the rows (fluxes) of the view (None for all fluxes)
+        """
+        return ResultsView(self, rows)
+
+    @staticmethod
+    def prune_folders(parent, stores, prefix="summary"):
+        """
+        Delete the folders of saved stores that are not used by the given stores anymore.
+        Folders that cannot be deleted (e.g. memory-mapped files on Windows) are kept.
+
+        :param parent: folder containing the folders of the saved stores (see new_folder)
+        :param stores: stores whose folders are kept
+        :param prefix: prefix of the name of the folders
+        :return: list of the deleted folders
+        """
+        used_folders = {Path(store.path).resolve() for store in stores if store is not None and store.path is not None}
+        deleted_folders = []
+        for folder in Path(parent).glob(f"{prefix}_*"):
+            if folder.is_dir() and folder.resolve() not in used_folders:
+                try:
+                    shutil.rmtree(folder)
+                    deleted_folders.append(folder)
+                except OSError as error:
+                    logger.debug(f"Results folder '{folder}' could not be deleted: {error}")
+        return deleted_folders
+
+    def save(self, folder):
+        """
+        Save the store in a folder that does not contain another store (see new_folder). 
+        Saved SD matrices are never replaced: they may be memory-mapped by other stores 
+        (and memory-mapped files cannot be replaced on Windows).
+
+        :param folder: path of the folder
+        """
+        folder = Path(folder)
+        if (folder / self.SDS_FILE).exists():
+            raise FileExistsError(f"Results are already saved in '{folder}'. Please use another folder (see new_folder).")
+        folder.mkdir(parents=True, exist_ok=True)
+        # The matrix is complete once it has its final name
+        tmp_path = folder / f"{self.SDS_FILE}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, self.sds)
+        os.rename(tmp_path, folder / self.SDS_FILE)
+        self.fluxes.to_csv(folder / self.FLUXES_FILE, sep="\t", index=False)
+        self.metadata.to_csv(folder / self.METADATA_FILE, sep="\t", index_label="ID")
+        self.path = folder
+        logger.debug(f"Results saved in '{folder}'.")
+
+    @classmethod
+    def load(cls, folder, mmap_mode="r"):
+        """
+        Load a store saved in a folder.
+
+        :param folder: path of the folder
+        :param mmap_mode: memory-map mode of the SD matrix (see numpy.load, None to read it in memory)
+        """
+        folder = Path(folder)
+        metadata = pd.read_csv(folder / cls.METADATA_FILE, sep="\t", index_col="ID", dtype={"ID": str})
+        fluxes = pd.read_csv(folder / cls.FLUXES_FILE, sep="\t")
+        sds = np.load(folder / cls.SDS_FILE, mmap_mode=mmap_mode)
+        cls._check_saved_results(folder, sds, list(metadata.index), len(fluxes))
+        # The memory-mapped matrix is already contiguous, so it is not copied
+        store = cls(fluxes, sds, list(metadata.index), metadata)
+        store.path = folder
+        return store
+
+
+class ResultsView:
+    """
+    Selection of some fluxes (rows) of a ResultsStore. The view only holds
+    the positions of its rows: the summary dataframe of the selected fluxes
+    is built when it is needed.
+    """
+
+    def __init__(self, store: ResultsStore, rows=None):
+        """
+        :param store: ResultsStore object
+        :param rows: positions of the rows (fluxes) of the view (None for all fluxes)
+        """
+        self.store = store
+        self.rows = np.arange(len(store.fluxes)) if rows is None else np.asarray(rows, dtype=np.int64)
+        self._dataframe = None
+
+    def __getstate__(self):
+        return {**self.__dict__, "_dataframe": None}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __repr__(self) -> str:
+        return f"ResultsView({len(self.rows)} fluxes, {len(self.store.ids)} combinations)"
+
+    @property
+    def ids(self):
+        return self.store.ids
+
+    @property
+    def metadata(self):
+        return self.store.metadata
+
+    @property
+    def fluxes(self):
+        return self.store.fluxes.iloc[self.rows]
+
+    @property
+    def sds(self):
+        """
+        SDs of the selected fluxes
+        """
+        return self.store.sds[self.rows]
+
+    def sd_dataframe(self):
+        """
+        Return the SDs of the selected fluxes as a dataframe with one column per combination
+        """
+        return self.store.sd_dataframe(self.rows)
+
+    @property
+    def dataframe(self):
+        """
+        Summary dataframe of the selected fluxes
+        """
+        if self._dataframe is None:
+            # Only the selected rows are built
+            self._dataframe = pd.concat([self.fluxes, self.sd_dataframe()], axis=1)
+        return self._dataframe
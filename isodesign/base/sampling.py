@@ -0,0 +1,235 @@
+import logging
+import numpy as np
+from scipy.stats import qmc
+
+from isodesign.base.label_input import LabelInput
+
+logger = logging.getLogger(f"IsoDesign.{__name__}")
+
+
+class LabelInputSampler(LabelInput):
+    """
+    Alternative to the full grid of LabelInput for designs with many isotopomers:
+    combinations are drawn uniformly over the simplex of each isotopomers group
+    with a quasi-random (Sobol, Halton) or Latin hypercube sequence.
+
+    The number of intervals of the isotopomers is not used. Isotopomers whose
+    bounds are equal keep a fixed fraction, the fractions of the other ones are
+    drawn between their bounds, the fractions of each group summing to 1. A group
+    containing a single isotopomer must therefore have equal bounds.
+    Sobol and Halton samples can be continued (see add_points). A Latin hypercube
+    sample cannot: the points of a continuation would not form a Latin hypercube
+    with the previous ones. Points discarded because of the bounds or the constraints
+    are replaced by the points of a new Latin hypercube.
+    Combinations are exposed with the same interface as LabelInput
+    (count_combinations, get_combinations, iter_combinations), so that they can
+    be configured in linp files in the same way.
+    """
+    SAMPLING_METHODS = {
+        "sobol": qmc.Sobol,
+        "halton": qmc.Halton,
+        "latin hypercube": qmc.LatinHypercube,
+    }
+
+    def __init__(self, isotopomer_group: dict, nb_points: int, method="sobol", seed=None, constraints=None):
+        """
+        :param isotopomer_group: dictionary containing as key substrate name of the isotopomer group
+                                and as values a list of isotopomer
+        :param nb_points: number of combinations to draw
+        :param method: sampling method ("sobol", "halton" or "latin hypercube")
+        :param seed: seed of the sequence, the same seed giving the same combinations.
+                     If None, a random seed is chosen.
+        :param constraints: Constraints object. Drawn combinations that do not 
+                            respect the constraints are discarded.
+        """
+        super().__init__(isotopomer_group, constraints)
+        if method not in self.SAMPLING_METHODS:
+            raise ValueError(f"Unknown sampling method {method}. Available methods: {list(self.SAMPLING_METHODS)}")
+        if nb_points < 1:
+            raise ValueError("The number of combinations to draw must be at least 1")
+        for isotopomer_name, isotopomers in isotopomer_group.items():
+            if len(isotopomers) == 1 and isotopomers[0].step != 0:
+                raise ValueError(f"The fraction of {isotopomer_name} cannot vary between {isotopomers[0].lower_bound} and "
+                                 f"{isotopomers[0].upper_bound}: it is the only isotopomer of its group, so its fraction "
+                                 "must be 1 (equal bounds). Please add isotopomers to the group or set equal bounds.")
+
+        self.nb_points = nb_points
+        self.method = method
+        # A seed is chosen when none is given, so that the sample can be continued
+        self.seed = seed if seed is not None else int(np.random.default_rng().integers(2**32))
+        # Number of points drawn from the sequence (points outside of the bounds are discarded)
+        self.nb_drawn = 0
+        # Fractions of the drawn combinations, one row per combination and one column per isotopomer
+        self.samples = np.empty((0, sum(len(isotopomers) for isotopomers in isotopomer_group.values())))
+
+    def __repr__(self):
+        return f"{self.method} sampling of {self.nb_points} combinations (seed {self.seed})\n" + super().__repr__()
+
+    @property
+    def dimension(self):
+        """
+        Number of dimensions of the sequence: on a simplex of k free isotopomers,
+        k - 1 dimensions are needed (the spacings between the sorted coordinates
+        give the fractions).
+        """
+        return sum(len(self._free_columns(isotopomers)) - 1
+                   for isotopomers in self.isotopomer_group.values() if len(isotopomers) > 1)
+
+    @staticmethod
+    def _free_columns(isotopomers):
+        """
+        Position in the group of the isotopomers whose fraction is drawn. As in
+        LabelInput, the first isotopomer of a group takes the remaining fraction.
+        The fraction of a single isotopomer is fixed (see __init__).
+        """
+        if len(isotopomers) == 1:
+            return []
+        return [0] + [column for column, isotopomer in enumerate(isotopomers) if column and isotopomer.step != 0]
+
+    def _draw(self, nb_points):
+        """
+        Draw the next points of the sequence and convert them into fractions.
+
+        :param nb_points: number of points to draw
+
+        :return: 2D float array of fractions (points outside of the bounds or
+                 not respecting the constraints are discarded)
+        """
+        engine = self.SAMPLING_METHODS[self.method](max(self.dimension, 1), rng=self.seed)
+        # The sequence is continued after the points previously drawn
+        if self.nb_drawn:
+            engine.fast_forward(self.nb_drawn)
+        uniforms = engine.random(nb_points)
+        self.nb_drawn += nb_points
+
+        groups = []
+        dimension = 0
+        for isotopomers in self.isotopomer_group.values():
+            fractions = np.zeros((nb_points, len(isotopomers)))
+            free_columns = self._free_columns(isotopomers)
+            # Isotopomers with equal bounds keep a fixed fraction
+            for column, isotopomer in enumerate(isotopomers):
+                if column not in free_columns:
+                    fractions[:, column] = isotopomer.upper_bound
+
+            if len(isotopomers) > 1:
+                lower_bounds = np.array([0] + [isotopomers[column].lower_bound for column in free_columns[1:]])
+                remaining = 1 - fractions.sum(axis=1, keepdims=True) - lower_bounds.sum()
+                # Spacings between sorted uniform coordinates are uniform over the simplex
+                coordinates = np.sort(uniforms[:, dimension:dimension + len(free_columns) - 1], axis=1)
+                spacings = np.diff(coordinates, axis=1, prepend=0, append=1)
+                fractions[:, free_columns] = lower_bounds + remaining * spacings
+                dimension += len(free_columns) - 1
+            groups.append(fractions)
+        fractions = np.hstack(groups)
+
+        upper_bounds = np.array([isotopomer.upper_bound if column else 1
+                                 for isotopomers in self.isotopomer_group.values() for column, isotopomer in enumerate(isotopomers)])
+        mask = np.all((fractions >= 0) & (fractions <= upper_bounds), axis=1)
+        if self.constraints is not None:
+            mask &= self.constraints.mask(self.isotopomer_group, fractions)
+        return fractions[mask]
+
+    def _sample(self, nb_points):
+        """
+        Draw points until nb_points combinations within the bounds have been obtained.
+
+        :param nb_points: number of combinations to obtain
+
+        :return: 2D float array of fractions
+        """
+        samples = []
+        nb_samples = 0
+        while nb_samples < nb_points:
+            fractions = self._draw(nb_points - nb_samples)
+            if not len(fractions) and self.nb_drawn > 1000 * nb_points:
+                raise ValueError("The bounds of the isotopomers and the constraints cannot be respected. "
+                                 "Please check the bounds and the constraints.")
+            samples.append(fractions)
+            nb_samples += len(fractions)
+        return np.vstack(samples)
+
+    def generate_labelling_combinations(self, lazy=False):
+        """
+        Draw the combinations of all isotopomers groups.
+
+        :param lazy: if True, the combinations of all isotopomers groups ("All_combinations")
+                     are not stored as a list of combinations (see LabelInput)
+        """
+        self.names = [isotopomer.name for isotopomers in self.isotopomer_group.values() for isotopomer in isotopomers]
+        self.labelling_patterns = [isotopomer.labelling for isotopomers in self.isotopomer_group.values() for isotopomer in isotopomers]
+        self.nb_drawn = 0
+        self.samples = self._sample(self.nb_points)
+        self._update_combinations(lazy)
+
+    def add_points(self, nb_points, lazy=True):
+        """
+        Add combinations to the sample. The sequence is continued, so that the new
+        combinations fill the gaps between the previous ones. Only Sobol and Halton
+        samples can be continued.
+
+        :param nb_points: number of combinations to add
+        :param lazy: see generate_labelling_combinations
+
+        :return: 2D float array of the fractions of the new combinations
+        """
+        if self.method == "latin hypercube":
+            raise ValueError("A Latin hypercube sample cannot be continued. Please draw a new sample "
+                             "or use the sobol or halton method.")
+        new_samples = self._sample(nb_points)
+        self.samples = np.vstack((self.samples, new_samples))
+        self.nb_points += nb_points
+        self._update_combinations(lazy)
+        logger.info(f"{nb_points} combinations have been added to the sample ({self.nb_points} combinations).")
+        return new_samples
+
+    def _update_combinations(self, lazy):
+        """
+        Store the combinations of each isotopomers group (columns of the samples)
+        """
+        start = 0
+        self.isotopomer_combinations = {}
+        for isotopomer_name, isotopomers in self.isotopomer_group.items():
+            self.isotopomer_combinations[isotopomer_name] = self.samples[:, start:start + len(isotopomers)]
+            start += len(isotopomers)
+        if not lazy:
+            self.isotopomer_combinations["All_combinations"] = list(self.samples)
+        self._check_labelling_combinations()
+
+    def _check_labelling_combinations(self):
+        """
+        Check if the sum of all fractions is equal to 1 for all isotopomers group
+        """
+        for isotopomer_name, isotopomers in self.isotopomer_group.items():
+            if len(isotopomers) > 1 and not np.allclose(self.isotopomer_combinations[isotopomer_name].sum(axis=1), 1):
+                raise ValueError(f"Sum of all fractions is not equal to 1 for {isotopomer_name} group")
+
+    def count_labelling_combinations(self):
+        """
+        Number of combinations of each isotopomers group (one per drawn point)
+        """
+        return {isotopomer_name: self.nb_points for isotopomer_name in self.isotopomer_group}
+
+    @property
+    def combinations_filtered(self):
+        """
+        Drawn combinations already respect the constraints, count_combinations is exact
+        """
+        return False
+
+    def count_combinations(self):
+        """
+        Return the total number of combinations (one per drawn point)
+        """
+        return self.nb_points
+
+    def get_combinations(self, start, stop):
+        """
+        Return a block of combinations of all isotopomers groups
+
+        :param start: index of the first combination of the block
+        :param stop: index following the last combination of the block
+
+        :return: 2D float array with one row per combination and one column per isotopomer
+        """
+        return self.samples[start:stop]
@@ -1,149 +1,119 @@
 import logging
 import functools 
 
+import numpy as np
+import pandas as pd
+
 logger = logging.getLogger(f"IsoDesign.{__name__}")  
 
-class Score:
-    """
-    Class containing the implementation of the rating criteria 
+class ScoreHandler:
+    """ 
+    This class applies rating methods and performs operations between them.
+    Each criterion is computed for all label inputs at once: criteria on SDs 
+    are reductions over the columns of the SD matrix, the other criteria are 
+    taken from the label inputs informations aligned on the IDs of the columns.
     """
-    def __init__(self, label_input):
+    def __init__(self, dataframe, metadata=None):
         """
-        :param label_input: series containing fluxes SDs for a given label inputs
+        :param dataframe: the SDs of the summary dataframe (filtered or not), with one column per label input
+        :param metadata: dataframe indexed by label input ID containing the number of labeled inputs, 
+                         the total price and the number of structurally identified fluxes 
+                         (used if the corresponding dictionaries are not given to apply_criteria)
         """
+        
+        self.dataframe = dataframe
+        self.metadata = metadata
+        self.ids = pd.Index(dataframe.columns)
+        # Scores of the rating methods and operations applied to the dataframe columns
+        # Key : rating method or operation, value : series containing the score of each column
+        self.scores = {}
 
-        # The different rating crieria that can be applied. Key: criterion name, value: method to apply  
-        self.SCORING_METHODS = {
-        "sum of SDs" : self.apply_sum_sd, 
-        "number of fluxes with SDs < threshold" : self.apply_sum_nb_flux_sd,  
-        "number of labeled inputs" : self.apply_number_labeled_inputs,
-        "price": self.apply_price,
-        "number of structurally identified fluxes": self.structurally_identified_fluxes
-        }
+    @property
+    def columns_scores(self):
+        """
+        Dictionary containing the results of rating methods applied to the dataframe columns
+        Key : column name, value : dictionary containing the rating method as key and the score as value
+        """
+        return {column: {method: scores.iloc[index] for method, scores in self.scores.items()} 
+                for index, column in enumerate(self.ids)}
 
-        self.label_input = label_input 
-        # The score obtained after applying the criteria
-        self.score = None
+    @property
+    def scores_dataframe(self):
+        """
+        Dataframe of the scores, one row per column (label input) and one column per rating method or operation
+        """
+        return pd.DataFrame(self.scores, index=self.ids)
 
-    def __call__(self):
+    def _label_inputs_values(self, values_dict, metadata_column, field=None):
         """
-        Returns the score obtained after applying the criteria
+        Return the values of the label inputs, aligned on the IDs of the columns.
+        Label inputs without value are not scored (NaN) and a warning is logged.
+
+        :param values_dict: dictionary containing a value for each label input ID
+        :param metadata_column: column of the metadata used if values_dict is None
+        :param field: field of the namedtuples of values_dict containing the value 
         """
-        return self.score
-    
-    def compute(self, criteria, **kwargs):
+        if values_dict is None:
+            metadata = self.metadata if self.metadata is not None else pd.DataFrame(columns=[metadata_column])
+            values = metadata[metadata_column].reindex(self.ids)
+            missing = self.ids[~self.ids.isin(metadata.index)].tolist()
+        else:
+            values = [values_dict.get(label_input) for label_input in self.ids]
+            if field is not None:
+                values = [getattr(value, field) if value is not None else None for value in values]
+            values = pd.Series(values, index=self.ids, dtype=np.float64)
+            missing = [label_input for label_input in self.ids if label_input not in values_dict]
+        if missing:
+            logger.warning(f"No {metadata_column} for the label inputs {missing}, they are not scored. "
+                           "Please check that the linp files informations correspond to the summary.")
+        return values
+
+    def compute(self, criteria, sds, **kwargs):
         """
-        Computes the score and stores it in self.score according to the given criteria.  
-        
+        Computes the scores of all columns according to the given criteria. 
+
         :param criteria: the criteria to apply 
+        :param sds: matrix of the SDs (one column per label input)
         :param kwargs: additional arguments to pass to the selected criteria. If the weight is 
         not provided in kwargs for the selected criteria, the default value is 1.
-        
+        :return: series containing the score of each column
         """
         match criteria:
-            # Apply the method associated with the criteria and store the result in self.score
             case "number of fluxes with SDs < threshold":
-                self.score = self.SCORING_METHODS[criteria](kwargs["threshold"], kwargs["weight_flux"] if "weight_flux" in kwargs else 1)
+                return pd.Series((sds < kwargs["threshold"]).sum(axis=0), index=self.ids) * kwargs.get("weight_flux", 1)
             case "number of labeled inputs":
-                self.score = self.SCORING_METHODS[criteria](kwargs["info_linp_files_dict"], kwargs["weight_labeled_input"] if "weight_labeled_input" in kwargs else 1)
+                return self._label_inputs_values(kwargs.get("info_linp_files_dict"), "nb_labeled_inputs", 
+                                                 "nb_labeled_inputs") * kwargs.get("weight_labeled_input", 1)
             case "sum of SDs":
-                self.score = self.SCORING_METHODS[criteria](kwargs["weight_sum_sd"] if "weight_sum_sd" in kwargs else 1)
+                # Missing SDs are ignored. The SDs of each column are summed contiguously
+                # (Fortran order), as when the columns are summed separately
+                filled_sds = np.array(sds, dtype=np.float64, order="F")
+                filled_sds[np.isnan(filled_sds)] = 0.0
+                return pd.Series(filled_sds.sum(axis=0), index=self.ids) * kwargs.get("weight_sum_sd", 1)
             case "price":
-                self.score = self.SCORING_METHODS[criteria](kwargs["info_linp_files_dict"])
+                return self._label_inputs_values(kwargs.get("info_linp_files_dict"), "total_price", "total_price")
             case "number of structurally identified fluxes":
-                self.score = self.SCORING_METHODS[criteria](kwargs["struct_identif_dict"], kwargs["weight_struct_identif"] if "weight_struct_identif" in kwargs else 1)
-
-    def apply_sum_sd(self, weight_sum_sd=1):
-        """
-        Returns the sum of standard deviations for a given label input
-
-        :param weight_sum_sd: he weight to apply to the score
-        """
-        return self.label_input.sum() * weight_sum_sd
-        
-    
-    def apply_sum_nb_flux_sd(self, threshold, weight_flux=1):
-        """
-        Returns the total number of fluxes with sds below a given threshold.
-
-        :param threshold: the threshold value used to filter the flux values
-        :param weight_flux: the weight to apply to the score
-        """
-
-        return (self.label_input < threshold).sum() * weight_flux
-    
-    def apply_number_labeled_inputs(self, info_linp_files_dict, weight_labeled_input=1):
-        """
-        Returns the number of labelled substrates for each label input.
-
-        :param info_linp_files_dict: dictionary containing namedtuples with 
-                                    the number of labelled substrates for each label input
-        :param weight_labeled_input: the weight to apply to the score
-        """
-
-        for file_name, nb_labeled_species in info_linp_files_dict.items():
-            if self.label_input.name in file_name:
-                return nb_labeled_species.nb_labeled_inputs * weight_labeled_input
-
-    def apply_price(self, info_linp_files_dict):
-        """
-        Returns the price for each label input.
-
-        :param info_linp_files_dict: dictionary containing namedtuples with 
-                                    the price for each label input
-        """
-        for file_name, price in info_linp_files_dict.items():
-            if self.label_input.name in file_name:
-                return price.total_price
-
-    def structurally_identified_fluxes(self, struct_identif_dict, weight_struct_identif=1):
-        """
-        Returns the number of structurally identified fluxes for each label input.
-
-        :param struct_identif_dict: dictionary containing the number of 
-                                    structurally identified fluxes for each label input
-        """
-        for filename, nb_structures_identified in struct_identif_dict.items():
-            if self.label_input.name in filename:
-                return nb_structures_identified * weight_struct_identif
-        
-
-class ScoreHandler:
-    """ 
-    This class applies rating methods and performs operations between them.
-    . 
-    """
-    def __init__(self, dataframe):
-        """
-        :param dataframe: the summary dataframe (filtered or not) of the results of the various label input proportions following the simulation
-        
-        """
-        
-        self.dataframe = dataframe
-        # dictionary containing the results of rating methods applied to the dataframe columns
-        # Key : column name, value : dictionary containing the rating method as key and the score as value
-        self.columns_scores = {}
-    
+                return self._label_inputs_values(kwargs.get("struct_identif_dict"), 
+                                                 "structures_identified") * kwargs.get("weight_struct_identif", 1)
+        raise ValueError(f"Invalid criteria '{criteria}'.")
 
     def apply_criteria(self, criteria : list, **kwargs):
         """ 
-        Apply criteria to the dataframe columns via the score_object class
+        Apply criteria to all the dataframe columns at once
         
         :param criteria: method(s) to apply to the columns
         :param kwargs: additional arguments 
         """
-        for column in self.dataframe.columns:
-            # Each dataframe column is converted into a score_object object to offer flexibility in the subsequent manipulation of each score
-            score_object = Score(self.dataframe[column])
-            for method in criteria:
-                score_object.compute(method, **kwargs)
-                self.columns_scores.update({column: {method: score_object()}}) if column not in self.columns_scores.keys() else self.columns_scores[column].update({method: score_object()})
+        sds = self.dataframe.to_numpy(dtype=np.float64)
+        for method in criteria:
+            self.scores[method] = self.compute(method, sds, **kwargs)
 
     def apply_operations(self, operation):
         """
-        Apply an operation to the score_objects of the columns
+        Apply an operation to the scores of the columns
         
-        :param operation: the operation to apply to the score_objects (Addition, Multiply, Divide)
+        :param operation: the operation to apply to the scores (Addition, Multiply, Divide)
+        :return: series containing the result of the operation for each column
         """
         operations = {
             "Add": lambda x, y: x + y,
@@ -151,8 +121,5 @@ class ScoreHandler:
             "Division": lambda x, y: x / y
         }
         
-        for key, score_object in self.columns_scores.items():
-            # if key != 'dataframe':
-            score_object.update({operation: functools.reduce(operations[operation], score_object.values())})
-        
-        return score_object
\ No newline at end of file
+        self.scores[operation] = functools.reduce(operations[operation], self.scores.values())
+        return self.scores[operation]
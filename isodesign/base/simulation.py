@@ -0,0 +1,325 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+import io
+import logging
+import os
+from pathlib import Path
+from queue import Queue
+import shutil
+import signal
+import subprocess
+import threading
+
+import numpy as np
+import pandas as pd
+
+from isodesign.base.staging import stage_files
+
+logger = logging.getLogger(f"IsoDesign.{__name__}")
+
+
+class SimulationRunner:
+    """
+    influx_si process whose end is waited without polling (blocking wait on the
+    process) and whose error output is read line by line while it runs, by a
+    reader thread, instead of being read once at the end. Waiting for a long
+    simulation therefore uses no CPU on the IsoDesign side.
+
+    It is handled like a subprocess.Popen object (poll, wait, communicate,
+    terminate, returncode and stderr).
+    """
+
+    def __init__(self, command_list, cwd=None, stderr_callback=None, cpu_cores=None):
+        """
+        :param command_list: command-line arguments to pass to influx_si
+        :param cwd: folder in which influx_si is run (None for the current folder)
+        :param stderr_callback: function called with each line of the error output, as soon as it is written
+        :param cpu_cores: CPU cores to which influx_si is bound (None for no binding). The
+                          affinity is set right after the process is created (not in the child
+                          before exec, which is unsafe when threads are running): the processes
+                          started by influx_si afterwards inherit it.
+        """
+        self.command_list = list(command_list)
+        self.stderr_callback = stderr_callback
+        # Lines of the error output read so far
+        self.stderr_lines = []
+        self.process = subprocess.Popen(self.command_list, cwd=cwd, stderr=subprocess.PIPE, text=True, bufsize=1)
+        if cpu_cores:
+            try:
+                os.sched_setaffinity(self.process.pid, list(cpu_cores))
+            except OSError as error:
+                # The process may already be finished
+                logger.debug(f"CPU affinity of process {self.process.pid} could not be set: {error}")
+        self._reader = threading.Thread(target=self._read_stderr, daemon=True)
+        self._reader.start()
+
+    def __repr__(self) -> str:
+        return f"SimulationRunner(pid {self.pid}, returncode {self.returncode})"
+
+    def _read_stderr(self):
+        # Iterating over the pipe blocks until a line is written or the process ends
+        for line in self.process.stderr:
+            self.stderr_lines.append(line)
+            logger.debug(f"influx_si: {line.rstrip()}")
+            if self.stderr_callback is not None:
+                self.stderr_callback(line)
+        self.process.stderr.close()
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    @property
+    def returncode(self):
+        return self.process.returncode
+
+    def poll(self):
+        """
+        Return the return code if the process is finished, otherwise None.
+        """
+        return self.process.poll()
+
+    def wait(self, timeout=None):
+        """
+        Wait (without polling) for the process to finish and for its error output to be read.
+
+        :param timeout: maximal waiting time in seconds (None to wait until the end of the process)
+        :return: the return code
+        """
+        self.process.wait(timeout)
+        self._reader.join(timeout)
+        return self.returncode
+
+    def communicate(self):
+        """
+        Wait for the process to finish.
+
+        :return: tuple (None, error output)
+        """
+        self.wait()
+        return None, self.stderr_output
+
+    def terminate(self):
+        """
+        Terminate the process if it is still running.
+        """
+        if self.process.poll() is None:
+            self.process.terminate()
+
+    @property
+    def stderr_output(self):
+        """
+        Error output read so far
+        """
+        return "".join(self.stderr_lines)
+
+    @property
+    def stderr(self):
+        """
+        Error output read so far, as a file (like the stderr of subprocess.Popen)
+        """
+        return io.StringIO(self.stderr_output)
+
+
+class ShardedSimulation:
+    """
+    Simulation of the combinations of a vmtf file split in shards. Each shard
+    is a vmtf file containing part of the rows of the vmtf file, simulated
+    by its own influx_si process in its own folder of the temp folder (the
+    model and linp files being linked in this folder, see staging.py). At most
+    max_workers shards are simulated at the same time, and the "_res" folders
+    of each shard are moved to the temp folder as soon as the shard is
+    finished, so that the results have the same layout as a single simulation.
+
+    The simulation starts when the object is created and is handled like the
+    subprocess.Popen object of a single simulation (poll, wait, communicate,
+    terminate, returncode and stderr). Each shard is run by a SimulationRunner.
+    """
+    # Folder of the temp folder containing the folders of the shards
+    SHARDS_FOLDER = "shards"
+
+    def __init__(self, command_list, vmtf_file, files, nb_shards, max_workers=None, cpu_affinity=False, stderr_callback=None):
+        """
+        :param command_list: command-line arguments to pass to influx_si (run in the folder of each shard)
+        :param vmtf_file: path to the vmtf file containing all the combinations
+        :param files: paths of the model files used by all the combinations
+        :param nb_shards: number of shards (vmtf files) to simulate
+        :param max_workers: maximal number of shards simulated at the same time
+                            (None for the number of CPU cores)
+        :param cpu_affinity: if True, each running shard is bound to its own
+                             subset of the CPU cores (only on platforms supporting it)
+        :param stderr_callback: function called with each line of the error output of the shards
+        """
+        if nb_shards < 1:
+            raise ValueError("The number of shards should be at least 1.")
+
+        self.command_list = list(command_list)
+        self.vmtf_file = Path(vmtf_file)
+        self.folder = self.vmtf_file.parent
+        self.files = list(files)
+
+        vmtf = pd.read_csv(self.vmtf_file, sep="\t", dtype=str, keep_default_na=False)
+        # Rows of the vmtf file of each shard (consecutive rows, empty shards are removed)
+        self.shards = [vmtf.iloc[rows] for rows in np.array_split(np.arange(len(vmtf)), min(nb_shards, max(len(vmtf), 1))) if len(rows)]
+        self.max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(self.shards)))
+        self.cpu_affinity = cpu_affinity and hasattr(os, "sched_setaffinity")
+        self.stderr_callback = stderr_callback
+
+        self.returncode = None
+        self.returncodes = [None] * len(self.shards)
+        self.stderr_outputs = [""] * len(self.shards)
+        self._runners = {}
+        self._terminated = False
+        self._lock = threading.Lock()
+
+        # Each running shard takes a slot, the slot number giving its CPU cores
+        self._slots = Queue()
+        for slot in range(self.max_workers):
+            self._slots.put(slot)
+
+        shards_folder = self.folder / self.SHARDS_FOLDER
+        if shards_folder.exists():
+            shutil.rmtree(shards_folder)
+        for shard in range(len(self.shards)):
+            self._prepare_shard(shard)
+
+        logger.info(f"Simulation of {len(vmtf)} combinations in {len(self.shards)} shards "
+                    f"({self.max_workers} shards at the same time).")
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._futures = [self._executor.submit(self._run_shard, shard) for shard in range(len(self.shards))]
+
+    def __repr__(self) -> str:
+        return f"ShardedSimulation({len(self.shards)} shards, {self.max_workers} workers, returncode {self.returncode})"
+
+    def shard_folder(self, shard):
+        """
+        Folder in which a shard is simulated
+        """
+        return self.folder / self.SHARDS_FOLDER / f"shard_{shard + 1}"
+
+    def _prepare_shard(self, shard):
+        """
+        Create the folder of a shard, containing its vmtf file, its linp files and the model files.
+        """
+        folder = self.shard_folder(shard)
+        folder.mkdir(parents=True)
+        rows = self.shards[shard]
+        rows.to_csv(folder / self.vmtf_file.name, sep="\t", index=False)
+
+        stage_files(self.files + [self.folder / f"{linp_file}.linp" for linp_file in rows["linp"]], folder)
+
+    def _cores(self, slot):
+        """
+        CPU cores of the shards running in a slot
+        """
+        cores = sorted(os.sched_getaffinity(0))
+        return [core for index, core in enumerate(cores) if index * self.max_workers // len(cores) == slot] or cores
+
+    def _run_shard(self, shard):
+        """
+        Simulate a shard and move its results to the temp folder.
+        """
+        slot = self._slots.get()
+        try:
+            with self._lock:
+                if self._terminated:
+                    self.returncodes[shard] = -signal.SIGTERM
+                    return
+                runner = SimulationRunner(self.command_list, self.shard_folder(shard), self.stderr_callback,
+                                          self._cores(slot) if self.cpu_affinity else None)
+                self._runners[shard] = runner
+
+            _, self.stderr_outputs[shard] = runner.communicate()
+            self.returncodes[shard] = runner.returncode
+            if runner.returncode == 0:
+                self._merge_shard(shard)
+            else:
+                logger.error(f"Simulation of shard {shard + 1} failed: {self.stderr_outputs[shard]}")
+        finally:
+            self._slots.put(slot)
+
+    def _merge_shard(self, shard):
+        """
+        Move the "_res" folders of a shard to the temp folder and delete the shard folder.
+        Results of a previous simulation of the same combinations are replaced.
+        """
+        folder = self.shard_folder(shard)
+        for res_folder in folder.iterdir():
+            if res_folder.is_dir() and res_folder.name.endswith("_res"):
+                destination = self.folder / res_folder.name
+                if destination.exists():
+                    shutil.rmtree(destination)
+                os.replace(res_folder, destination)
+        shutil.rmtree(folder)
+        logger.debug(f"Shard {shard + 1} has been simulated.")
+
+    def _finish(self):
+        """
+        Set the return code once all shards are finished: 0 if all shards
+        have been simulated successfully, otherwise the first error code.
+        The end is handled only once, even if poll and wait are called from different threads.
+        """
+        with self._lock:
+            if self.returncode is not None:
+                return self.returncode
+            self._executor.shutdown()
+            # Shards that could not be run (e.g. influx_si not found)
+            for shard, future in enumerate(self._futures):
+                if future.exception() is not None:
+                    self.returncodes[shard] = 1
+                    self.stderr_outputs[shard] += f"{future.exception()}\n"
+            shards_folder = self.folder / self.SHARDS_FOLDER
+            # Folders of the shards that failed are kept to check their errors
+            if shards_folder.exists() and not any(shards_folder.iterdir()):
+                shards_folder.rmdir()
+            # The return code is set last, so that it is only seen once the end is handled
+            self.returncode = next((returncode for returncode in self.returncodes if returncode != 0), 0)
+            return self.returncode
+
+    def poll(self):
+        """
+        Return the return code if all shards are finished, otherwise None.
+        """
+        if self.returncode is None and all(future.done() for future in self._futures):
+            self._finish()
+        return self.returncode
+
+    def wait(self):
+        """
+        Wait for all shards to finish and return the return code.
+        """
+        if self.returncode is None:
+            wait(self._futures)
+            self._finish()
+        return self.returncode
+
+    def communicate(self):
+        """
+        Wait for all shards to finish.
+
+        :return: tuple (None, error output of all shards)
+        """
+        self.wait()
+        return None, self.stderr_output
+
+    def terminate(self):
+        """
+        Terminate the running shards. Shards that have not been started yet are not simulated.
+        """
+        with self._lock:
+            self._terminated = True
+            for runner in self._runners.values():
+                runner.terminate()
+
+    @property
+    def stderr_output(self):
+        """
+        Error output of all shards
+        """
+        return "".join(self.stderr_outputs)
+
+    @property
+    def stderr(self):
+        """
+        Error output of all shards, as a file (like the stderr of subprocess.Popen)
+        """
+        return io.StringIO(self.stderr_output)
@@ -0,0 +1,81 @@
+import logging
+import os
+import shutil
+from pathlib import Path
+
+logger = logging.getLogger(f"IsoDesign.{__name__}")
+
+# Ways of staging a file, tried in this order until one succeeds
+STAGING_MODES = ("hardlink", "symlink", "copy")
+
+
+def _is_staged(source: Path, destination: Path):
+    """
+    Check if a file has already been staged: the destination is a link to the
+    source, or a copy with the same size and modification time.
+    """
+    if not destination.is_file():
+        return False
+    if os.path.samefile(source, destination):
+        return True
+    source_stat, destination_stat = source.stat(), destination.stat()
+    return (not destination.is_symlink() and
+            (source_stat.st_size, source_stat.st_mtime_ns) == (destination_stat.st_size, destination_stat.st_mtime_ns))
+
+
+def _stage_file(source: Path, destination: Path, mode):
+    if mode == "hardlink":
+        os.link(source, destination)
+    elif mode == "symlink":
+        os.symlink(source.resolve(), destination)
+    else:
+        # copy2 keeps the modification time of the source
+        shutil.copy2(source, destination)
+
+
+def stage_files(files, folder, modes=STAGING_MODES):
+    """
+    Make files available in a folder without copying them when possible.
+    Each file is linked (hard link, then symbolic link) in the folder, and
+    only copied if the links cannot be created (e.g. folders on different
+    file systems or on Windows without the required privileges).
+    Files already staged are not staged again.
+
+    Linked files share their content with the original files: staged files
+    must only be read.
+
+    :param files: paths of the files to stage
+    :param folder: folder in which the files are staged
+    :param modes: ways of staging the files, tried in this order (see STAGING_MODES)
+
+    :return: dictionary containing as key the path of the staged file
+             and as value the way it has been staged (None if it was already staged)
+    """
+    for mode in modes:
+        if mode not in STAGING_MODES:
+            raise ValueError(f"Staging mode '{mode}' is not valid. Available modes: {', '.join(STAGING_MODES)}")
+
+    staged_files = {}
+    for source in map(Path, files):
+        destination = Path(folder, source.name)
+        if _is_staged(source, destination):
+            staged_files[destination] = None
+            continue
+        if destination.exists() or destination.is_symlink():
+            destination.unlink()
+
+        for mode in modes:
+            try:
+                _stage_file(source, destination, mode)
+            except OSError as error:
+                logger.debug(f"{source} could not be staged ({mode}): {error}")
+                continue
+            staged_files[destination] = mode
+            break
+        else:
+            msg = f"{source} could not be staged in {folder}."
+            logger.error(msg)
+            raise OSError(msg)
+
+    logger.debug(f"Staged files in '{folder}': {staged_files}")
+    return staged_files
@@ -0,0 +1,312 @@
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from isodesign.base.ingestion import read_tvar_sim_files, sd_matrix
+from isodesign.base.results_store import ResultsStore, METADATA_COLUMNS
+
+logger = logging.getLogger(f"IsoDesign.{__name__}")
+
+
+class SummaryBuilder:
+    """
+    Incremental builder of the summary of a simulation: the tvar.sim files are
+    ingested as soon as they are written by influx_si (see update), each file
+    being read only once, and the results store is assembled from the ingested
+    results when needed (see build). At the end of the simulation, only the
+    files that have not been ingested yet (or that have been modified since)
+    are read.
+
+    The SDs of each ingested file are added as a row of a matrix enlarged by
+    doubling its capacity, so that the results already ingested are neither
+    copied nor assembled again when the store is built: the SD matrix of the
+    store is a view of the rows of the ingested files (unless the files do not
+    contain the same fluxes).
+    """
+    # During the simulation, a tvar.sim file is ingested once it has not been
+    # modified for SETTLE_TIME seconds (so that it is not read while it is written)
+    SETTLE_TIME = 1.0
+    # Initial number of rows of the SD matrix
+    INITIAL_CAPACITY = 64
+
+    def __init__(self, max_workers=None):
+        """
+        :param max_workers: number of threads reading the tvar.sim files (None for the default of ThreadPoolExecutor)
+        """
+        self.max_workers = max_workers
+        # Results of the ingested tvar.sim files
+        # key : linp file ID, value : tvar_sim_results namedtuple (see ingestion.read_tvar_sim_files)
+        self.tvar_sim_results = {}
+        # Paths of the ingested tvar.sim files (updated when the files are moved)
+        # key : linp file ID, value : path of the tvar.sim file
+        self.paths = {}
+        # Size and modification time of the ingested tvar.sim files
+        self._signatures = {}
+        # Flux names, kinds and values of the first ingested file
+        self._reference = None
+        # SDs of the ingested files containing the same fluxes as the first one (one row per file)
+        # and number of structurally identified fluxes of each row
+        self._sds = np.empty((0, 0))
+        self._nb_identified = np.empty(0, dtype=np.int64)
+        self._nb_rows = 0
+        # Row of each ingested file in the SD matrix (-1 if its fluxes differ from the first file), 
+        # in the same order as tvar_sim_results
+        self._rows = {}
+        self._nb_different = 0
+        # Fluxes of the summary computed from the last input tvar file (see _fluxes)
+        self._fluxes_cache = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_fluxes_cache"] = None
+        state["_sds"] = self._sds[:self._nb_rows]
+        state["_nb_identified"] = self._nb_identified[:self._nb_rows]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tvar_sim_results)
+
+    def __repr__(self) -> str:
+        return f"SummaryBuilder({len(self.tvar_sim_results)} tvar.sim files ingested)"
+
+    def _add_row(self, result):
+        """
+        Add the SDs of an ingested file at the end of the SD matrix (called with the lock held).
+
+        :param result: tvar_sim_results namedtuple
+        :return: row of the file in the SD matrix (-1 if its fluxes differ from the first ingested file)
+        """
+        if self._reference is None:
+            self._reference = (result.names, result.kinds, result.values)
+            self._sds = np.empty((self.INITIAL_CAPACITY, len(result.names)))
+            self._nb_identified = np.empty(self.INITIAL_CAPACITY, dtype=np.int64)
+        names, kinds, _ = self._reference
+        if len(result.names) != len(names) or not np.array_equal(result.names, names) or not np.array_equal(result.kinds, kinds):
+            return -1
+
+        if self._nb_rows == len(self._sds):
+            # The rows of the previous matrix are kept by the stores already built
+            sds = np.empty((2 * max(self._nb_rows, self.INITIAL_CAPACITY // 2), self._sds.shape[1]))
+            sds[:self._nb_rows] = self._sds[:self._nb_rows]
+            nb_identified = np.empty(len(sds), dtype=np.int64)
+            nb_identified[:self._nb_rows] = self._nb_identified[:self._nb_rows]
+            self._sds, self._nb_identified = sds, nb_identified
+        # Rows are only written once, a file read again gets a new row
+        self._sds[self._nb_rows] = result.sds
+        self._nb_identified[self._nb_rows] = result.nb_identified
+        self._nb_rows += 1
+        return self._nb_rows - 1
+
+    def _remove(self, linp_id):
+        """
+        Remove the results of an ingested file (called with the lock held)
+        """
+        self._nb_different -= self._rows.pop(linp_id) == -1
+        del self.tvar_sim_results[linp_id], self.paths[linp_id], self._signatures[linp_id]
+
+    def add(self, paths, min_age=None):
+        """
+        Ingest tvar.sim files. Files already ingested are read again only if
+        they have been modified since (size or modification time), the path of
+        a file moved since its ingestion being updated.
+
+        :param paths: paths of the tvar.sim files
+        :param min_age: minimal time (in seconds) since the last modification
+                        of the files to ingest (None to ingest all files)
+        :return: number of ingested files
+        """
+        now = time.time()
+        to_read = {}
+        moved = {}
+        for path in map(Path, paths):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # File moved in the meantime (e.g. results of a shard), it is ingested from its new location
+                continue
+            if min_age is not None and now - stat.st_mtime < min_age:
+                continue
+            linp_id = path.name.split(".")[0]
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self._signatures.get(linp_id) != signature:
+                to_read[linp_id] = (path, signature)
+            elif self.paths[linp_id] != path:
+                moved[linp_id] = path
+        with self._lock:
+            self.paths.update(moved)
+        if not to_read:
+            return 0
+
+        results = read_tvar_sim_files([path for path, _ in to_read.values()], self.max_workers)
+        with self._lock:
+            for (linp_id, (path, signature)), result in zip(to_read.items(), results):
+                row = self._add_row(result)
+                self._nb_different += (row == -1) - (self._rows.get(linp_id, 0) == -1)
+                self._rows[linp_id] = row
+                self.tvar_sim_results[linp_id] = result
+                self.paths[linp_id] = path
+                self._signatures[linp_id] = signature
+        logger.debug(f"{len(to_read)} tvar.sim files ingested ({len(self.tvar_sim_results)} in total)")
+        return len(to_read)
+
+    def scan(self, folder):
+        """
+        Ingest all the tvar.sim files of a folder and of its subfolders. 
+        Results of files that are no longer in the folder are removed and the
+        paths of the files moved since their ingestion are updated.
+
+        :param folder: folder containing the results of influx_si (temp folder)
+        :return: number of ingested files
+        """
+        # use os.walk to generate the names of folders, subfolders and files in the folder
+        paths = [Path(root, file_name) for root, _, files_names in os.walk(folder)
+                 for file_name in files_names if file_name.endswith(".tvar.sim")]
+        linp_ids = {path.name.split(".")[0] for path in paths}
+        with self._lock:
+            for linp_id in [linp_id for linp_id in self.tvar_sim_results if linp_id not in linp_ids]:
+                self._remove(linp_id)
+        return self.add(paths)
+
+    def update(self, progress):
+        """
+        Ingest the tvar.sim files of the combinations completed during a simulation.
+        Files that are still being written are ingested at the next update.
+
+        :param progress: SimulationProgress object following the simulation
+        :return: number of ingested files
+        """
+        # New files and files moved since their ingestion (e.g. results of a shard)
+        paths = [path for linp_id, path in list(progress.results_paths.items()) if self.paths.get(linp_id) != path]
+        try:
+            return self.add(paths, self.SETTLE_TIME)
+        except (OSError, ValueError) as error:
+            # File moved or incomplete: it is ingested at the next update or at the end of the simulation
+            logger.debug(f"tvar.sim files not ingested yet: {error}")
+            return 0
+
+    def structures_identified(self, linp_equivalences=None):
+        """
+        Return the number of structurally identified fluxes of each combination.
+
+        :param linp_equivalences: dictionary associating each combination to the combination simulated in its place
+        :return: dictionary, key : linp file ID, value : number of structurally identified fluxes
+        """
+        with self._lock:
+            structures_identified = {linp_id: result.nb_identified for linp_id, result in self.tvar_sim_results.items()}
+        if linp_equivalences:
+            structures_identified = {index: structures_identified[simulated_index]
+                                     for index, simulated_index in linp_equivalences.items()
+                                     if simulated_index in structures_identified}
+        return structures_identified
+
+    @staticmethod
+    def _merge_fluxes(input_tvar: pd.DataFrame, fluxes_index, tvar_sim_values: pd.DataFrame):
+        """
+        Describe the fluxes of the summary from the input tvar file and the tvar.sim files.
+
+        :param input_tvar: dataframe of the input tvar file
+        :param fluxes_index: (Name, Kind) index of the rows of the SD matrix
+        :param tvar_sim_values: dataframe of the flux names, kinds and values in the tvar.sim files
+        :return: tuple of the fluxes dataframe and of the row of each flux in the SD matrix
+        """
+        # merge data from the input tvar file with data from tvar.sim files based on flux names and kind
+        merged_tvar = pd.merge(input_tvar[["Name", "Kind", "Value"]], tvar_sim_values, on=["Name", "Kind"],
+                               how="outer", suffixes=('_init', None))
+        merged_tvar["Value difference"] = merged_tvar["Value_init"] - merged_tvar["Value"]
+        logger.debug(f"Merged_tvar_values : {merged_tvar}")
+
+        # keep the fluxes of the "merged_tvar" dataframe that are present in all tvar.sim files
+        # with the row of their SDs in the SD matrix
+        # rename the "Value_init" column to " Intial flux value"
+        sd_rows = pd.DataFrame({"Name": fluxes_index.get_level_values("Name"), "Kind": fluxes_index.get_level_values("Kind"),
+                                "sd_row": np.arange(len(fluxes_index))})
+        fluxes = pd.merge(merged_tvar, sd_rows, on=["Name","Kind"]).rename(columns={"Value_init": " Intial flux value"})
+        return fluxes.drop(columns="sd_row"), fluxes["sd_row"].to_numpy()
+
+    def _fluxes(self, input_tvar, reference):
+        """
+        Fluxes of the summary when all the files contain the fluxes of the first ingested file 
+        (computed once for each input tvar file, see _merge_fluxes)
+        """
+        if self._fluxes_cache is None or self._fluxes_cache[0] is not input_tvar or self._fluxes_cache[1] is not reference:
+            names, kinds, values = reference
+            self._fluxes_cache = (input_tvar, reference, 
+                                  *self._merge_fluxes(input_tvar, pd.MultiIndex.from_arrays([names, kinds], names=["Name", "Kind"]),
+                                                      pd.DataFrame({"Name": names, "Kind": kinds, "Value": values})))
+        return self._fluxes_cache[2:]
+
+    def build(self, input_tvar: pd.DataFrame, linp_equivalences=None, linp_infos=None):
+        """
+        Assemble the results store from the ingested tvar.sim files:
+            - flux names, flux types,
+            - the flux values in the tvar.sim files,
+            - the difference between the flux values in the input tvar file and the tvar.sim files,
+            - flux SDs in each tvar.sim file
+
+        :param input_tvar: dataframe of the input tvar file
+        :param linp_equivalences: dictionary associating each combination to the combination simulated in its place
+        :param linp_infos: dictionary containing the number of labeled inputs and the total price of each combination
+        :return: ResultsStore object (None if no tvar.sim file has been ingested)
+        """
+        with self._lock:
+            if not self._rows:
+                return None
+            simulated_ids = list(self._rows)
+            rows = np.fromiter(self._rows.values(), dtype=np.int64, count=len(simulated_ids))
+            same_fluxes = not self._nb_different
+            reference, sds, nb_identified = self._reference, self._sds, self._nb_identified
+            tvar_sim_results = None if same_fluxes else list(self.tvar_sim_results.values())
+
+        # Combinations that have not been simulated (same linp file as another combination)
+        # get the results of the combination simulated in their place
+        if linp_equivalences:
+            columns = {linp_id: column for column, linp_id in enumerate(simulated_ids)}
+            linp_ids = [index for index, simulated_index in linp_equivalences.items() if simulated_index in columns]
+            columns = np.fromiter((columns[linp_equivalences[index]] for index in linp_ids), dtype=np.int64, count=len(linp_ids))
+        else:
+            linp_ids, columns = simulated_ids, np.arange(len(simulated_ids))
+
+        if same_fluxes:
+            # The SDs of the combinations are the rows of the ingested files (taken without copy
+            # if they are the first rows of the matrix, in the same order)
+            fluxes, sd_rows = self._fluxes(input_tvar, reference)
+            rows = rows[columns]
+            structures = nb_identified[rows]
+            if np.array_equal(rows, np.arange(len(rows))) and np.array_equal(sd_rows, np.arange(sds.shape[1])):
+                sds = sds[:len(rows)].T
+            else:
+                sds = sds[np.ix_(rows, sd_rows)].T
+        else:
+            # Files with different fluxes: only the fluxes present in all files are kept
+            fluxes_index, sds = sd_matrix(tvar_sim_results)
+            # take the flux values from the first tvar.sim file
+            # flux values are the same in all tvar.sim files
+            fluxes, sd_rows = self._merge_fluxes(input_tvar, fluxes_index,
+                                                 pd.DataFrame({"Name": tvar_sim_results[0].names, "Kind": tvar_sim_results[0].kinds,
+                                                               "Value": tvar_sim_results[0].values}))
+            structures = np.array([tvar_sim_results[column].nb_identified for column in columns], dtype=np.int64)
+            sds = sds[np.ix_(sd_rows, columns)]
+
+        # Number of labeled inputs, total price and number of structurally identified fluxes of each combination
+        index = pd.Index(linp_ids, name="ID")
+        if linp_infos:
+            infos = pd.DataFrame(list(linp_infos.values()), index=list(linp_infos)).reindex(index)
+        else:
+            infos = pd.DataFrame(np.nan, index=index, columns=["nb_labeled_inputs", "total_price"])
+        metadata = pd.DataFrame({"nb_labeled_inputs": infos["nb_labeled_inputs"], "total_price": infos["total_price"],
+                                 "structures_identified": structures}, index=index, columns=METADATA_COLUMNS)
+
+        # The SDs are stored in a matrix (one row per flux, one column per combination),
+        # the summary dataframe is built from it when needed
+        return ResultsStore(fluxes, sds, linp_ids, metadata)
@@ -0,0 +1,131 @@
+from collections import Counter
+import logging
+
+logger = logging.getLogger(f"IsoDesign.{__name__}")
+
+
+def _consuming_transitions(carbotrans: dict, substrate: str):
+    """
+    Return the atom transitions of the reactions consuming a substrate, grouped
+    by reaction family. Reactions of the same family have the same reactants and
+    products: this is how influx_si networks describe the scrambling of symmetric
+    molecules (e.g. "fum_a: Suc (ABCD) -> Fum (ABCD)" and "fum_b: Suc (ABCD) -> Fum (DCBA)").
+
+    :param carbotrans: "carbotrans" dictionary of the network analysis (netan)
+    :param substrate: substrate name
+
+    :return: dictionary containing as key the reaction family and as value
+             the list of atom mappings of its reactions. An atom mapping is a list of
+             (source, position) -> destinations entries, the source being ("substrate", occurrence)
+             for the atoms of the substrate and ("reactant", index) for the other reactants.
+    """
+    families = {}
+    for reaction in carbotrans.values():
+        left, right = reaction["left"], reaction["right"]
+        if substrate not in [metabolite for metabolite, _ in left]:
+            continue
+
+        family = (tuple(metabolite for metabolite, _ in left), tuple(metabolite for metabolite, _ in right))
+        # Positions of each atom (letter) in the products
+        destinations = {}
+        for product_index, (_, letters) in enumerate(right):
+            for position, letter in enumerate(letters):
+                destinations.setdefault(letter, []).append((product_index, position))
+
+        mapping = []
+        occurrence = 0
+        for reactant_index, (metabolite, letters) in enumerate(left):
+            if metabolite == substrate:
+                source = ("substrate", occurrence)
+                occurrence += 1
+            else:
+                source = ("reactant", reactant_index)
+            mapping += [((source, position), tuple(sorted(destinations.get(letter, []))))
+                        for position, letter in enumerate(letters)]
+        families.setdefault(family, []).append(mapping)
+    return families
+
+def _permute_mapping(mapping, permutation):
+    """
+    Apply a permutation to the positions of the substrate atoms of an atom mapping.
+
+    :param mapping: atom mapping (see _consuming_transitions)
+    :param permutation: tuple giving for each position of the substrate its new position
+    """
+    return tuple(sorted(((source, permutation[position] if source[0] == "substrate" else position), destinations)
+                        for (source, position), destinations in mapping))
+
+def _candidate_permutations(families, atoms_nb):
+    """
+    Permutations of the substrate atoms that could leave the transitions unchanged:
+    the reversal of the carbon chain and the permutations between the reactions of a same family.
+
+    :param families: transitions grouped by reaction family (see _consuming_transitions)
+    :param atoms_nb: number of atoms of the substrate
+    """
+    candidates = {tuple(reversed(range(atoms_nb)))}
+    for mappings in families.values():
+        for first in mappings:
+            for second in mappings:
+                first_destinations = {position: destinations for (source, position), destinations in first if source == ("substrate", 0)}
+                second_positions = {destinations: position for (source, position), destinations in second if source == ("substrate", 0)}
+                if len(first_destinations) != atoms_nb or len(second_positions) != atoms_nb:
+                    continue
+                # Position of the atom of the second reaction with the same destinations
+                if all(destinations in second_positions for destinations in first_destinations.values()):
+                    candidates.add(tuple(second_positions[first_destinations[position]] for position in range(atoms_nb)))
+    candidates.discard(tuple(range(atoms_nb)))
+    return candidates
+
+def find_symmetries(netan: dict, substrate: str):
+    """
+    Find the permutations of the atoms of an input substrate that leave its
+    transitions unchanged. Labellings related by such a permutation cannot be
+    distinguished by the network, so they give the same simulation results.
+    Reactions of a same family are assumed to carry the same flux, as it is
+    the case when a symmetric molecule is described by several transitions.
+
+    :param netan: network analysis dictionary (see Process.analyse_model)
+    :param substrate: input substrate name
+
+    :return: list of permutations, each permutation being a tuple giving
+             for each atom position its equivalent position
+    """
+    atoms_nb = netan["Clen"][substrate]
+    families = _consuming_transitions(netan.get("carbotrans", {}), substrate)
+    if not families or atoms_nb < 2:
+        return []
+
+    # Each family must contain the same atom mappings once the permutation is applied
+    reference = {family: Counter(_permute_mapping(mapping, tuple(range(atoms_nb))) for mapping in mappings)
+                 for family, mappings in families.items()}
+    symmetries = [permutation for permutation in sorted(_candidate_permutations(families, atoms_nb))
+                  if all(Counter(_permute_mapping(mapping, permutation) for mapping in mappings) == reference[family]
+                         for family, mappings in families.items())]
+
+    if symmetries:
+        logger.info(f"{substrate} is symmetric. Equivalent atom positions: {symmetries}")
+    return symmetries
+
+def equivalent_labellings(labelling: str, symmetries: list):
+    """
+    Return all labellings equivalent to a labelling through the symmetries
+    of the substrate (including the labelling itself).
+
+    :param labelling: labelling of the isotopomer
+    :param symmetries: permutations returned by find_symmetries
+    """
+    labellings = {labelling}
+    to_permute = [labelling]
+    # Closure of the labelling under all permutations (and their compositions)
+    while to_permute:
+        current = to_permute.pop()
+        for permutation in symmetries:
+            permuted = [""] * len(current)
+            for position, label in enumerate(current):
+                permuted[permutation[position]] = label
+            permuted = "".join(permuted)
+            if permuted not in labellings:
+                labellings.add(permuted)
+                to_permute.append(permuted)
+    return labellings
@@ -26,3 +26,18 @@ def process():
         "ID_3": {"Id": [None, None], "Comment" : [None, None], "Specie" : ["Gluc", "FTHF_in"], "Isotopomer" : ["111111", "0"], "Value" : [1.0, 1.0], "Price" : [np.nan, np.nan]}
         }
     return process
+
+@pytest.fixture
+def write_tvar_sim():
+    """
+    Return a function writing a tvar.sim file (influx_si simulation results) 
+    in the "_res" folder of a linp file. 
+    """
+    def _write_tvar_sim(folder, linp_id, sds, struct_identif=("yes", "yes", "no")):
+        res_folder = folder / f"{linp_id}_res"
+        res_folder.mkdir(parents=True, exist_ok=True)
+        with open(res_folder / f"{linp_id}.tvar.sim", "w") as f:
+            f.write("Id\tComment\tName\tKind\tType\tValue\tSD\tStruct_identif\n")
+            for (name, kind, value), sd, struct in zip([("pgi", "NET", 0.7), ("pgi", "XCH", 0.1), ("pyk", "NET", 1.4)], sds, struct_identif):
+                f.write(f"\t\t{name}\t{kind}\tD\t{value}\t{sd}\t{struct}\n")
+    return _write_tvar_sim
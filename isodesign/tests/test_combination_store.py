@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from isodesign.base.combination_store import CombinationStore, LinpDataframes
+from isodesign.base.process import Process
+
+
+def test_from_blocks():
+    store = CombinationStore.from_blocks(["Gluc", "Gluc", "FTHF_in"], ["100000", "111111", "0"], [10, None, 2],
+                                         [np.array([[1, 0, 1], [0.5, 0.5, 1]]), np.array([[0, 1, 1]])], 3)
+    
+    assert store.fractions.shape == (3, 3)
+    assert store.ids == ["ID_1", "ID_2", "ID_3"]
+    assert store.get_row("ID_2") == 1
+    assert store.to_linp_dict(0) == {"Id": [None, None], "Comment": [None, None], "Specie": ["Gluc", "FTHF_in"],
+                                     "Isotopomer": ["100000", "0"], "Value": [1.0, 1.0], "Price": [10.0, 2.0]}
+    assert store.to_linp_dict(2)["Price"] == [np.nan, 2.0]
+
+def test_linp_dataframes_view(process):
+    store = process.combinations
+    assert store.species == ["Gluc", "Gluc", "FTHF_in"]
+    assert store.patterns == ["100000", "111111", "0"]
+    assert np.array_equal(store.fractions, [[1, 0, 1], [0.5, 0.5, 1], [0, 1, 1]])
+
+    store.enabled[1] = False
+    assert list(LinpDataframes(store)) == ["ID_1", "ID_3"]
+    assert list(LinpDataframes(store, enabled=False)) == ["ID_2"]
+    assert "ID_2" not in process.linp_dataframes
+
+def test_legacy_session(process):
+    linp_dataframes = dict(process.linp_dataframes)
+    state = process.__dict__.copy()
+    del state["combinations"]
+    state["linp_dataframes"] = {key: value for key, value in linp_dataframes.items() if key != "ID_2"}
+    state["linp_to_remove"] = {1: {"ID_2": linp_dataframes["ID_2"]}}
+
+    legacy_process = Process.__new__(Process)
+    legacy_process.__setstate__(state)
+
+    assert list(legacy_process.linp_dataframes) == ["ID_1", "ID_3"]
+    assert legacy_process.linp_to_remove == {1: {"ID_2": linp_dataframes["ID_2"]}}
+
+def test_prices_and_labeled_inputs():
+    store = CombinationStore.from_blocks(["Gluc", "Gluc", "FTHF_in"], ["000000", "111111", "0"], [10, None, 2],
+                                         [np.array([[1, 0, 1], [0.5, 0.5, 1], [0, 1, 1]])], 3)
+
+    assert np.array_equal(store.labeled, [False, True, False])
+    assert np.array_equal(store.total_prices(), [12, 7, 2])
+    assert np.array_equal(store.total_prices([1, 2]), [7, 2])
+    assert np.array_equal(store.nb_labeled_inputs(), [0, 1, 1])
+
+def test_selection_history(process):
+    store = process.combinations
+
+    assert store.set_enabled([0, 2], False).tolist() == [0, 2]
+    # Rows already disabled are not recorded again
+    assert store.set_enabled([0], False).tolist() == []
+    assert store.set_enabled_where(lambda store: store.fractions[:, 1] > 0, False).tolist() == [1]
+    assert store.disabled_rows.tolist() == [0, 1, 2]
+
+    assert store.undo().tolist() == [1]
+    assert store.disabled_rows.tolist() == [0, 2]
+    assert store.undo().tolist() == [0, 2]
+    assert store.enabled.all()
+    assert store.undo().tolist() == []
+
+def test_write_linp_files(tmp_path):
+    store = CombinationStore(["Gluc", "Gluc", "Gluc", "FTHF_in"], ["000000", "100000", "111111", "0"], [3, None, 0.1, 2e-7])
+    store.append([[1 / 3, 2 / 3, 0, 1], [1e-7, 0.1 + 0.2, 1 - 0.3 - 1e-7, 1], [0, 0, 0, 0]])
+    store.write_linp_files(range(len(store)), tmp_path, max_workers=2)
+
+    for row in range(len(store)):
+        # Same content as the linp files previously written with pandas
+        expected = pd.DataFrame.from_dict(store.to_linp_dict(row)).to_csv(sep="\t", index=False)
+        with open(tmp_path / f"{store.get_id(row)}.linp", newline="") as linp_file:
+            assert linp_file.read() == expected
+
+def test_append_ids():
+    store = CombinationStore.from_blocks(["Gluc"], ["100000"], None, [np.ones((9, 1))], 9)
+    rows = store.append(np.ones((2, 1)))
+    # IDs of the previous combinations are kept, the added combinations get wider IDs
+    assert [store.get_id(row) for row in rows] == ["ID_10", "ID_11"]
+    assert store.get_row("ID_9") == 8 and store.get_row("ID_10") == 9
+
+    store = CombinationStore.from_blocks(["Gluc"], ["100000"], None, [np.ones((10, 1))], 10)
+    assert store.ids[:2] == ["ID_01", "ID_02"]
+    store.append(np.ones((89, 1)))
+    assert store.get_id(98) == "ID_99"
+    store.append(np.ones((2, 1)))
+    assert store.ids[-3:] == ["ID_99", "ID_100", "ID_101"] and store.get_id(0) == "ID_01"
+    assert store.get_row("ID_100") == 99 and store.get_row("ID_05") == 4
+    with pytest.raises(KeyError):
+        store.get_row("ID_005")
+
+def test_get_combinations(process):
+    process.combinations.set_enabled([0], False)
+    page = process.get_combinations(1, 2)
+    assert list(page.columns) == ["ID", "Specie", "Isotopomer", "Value", "Price"]
+    assert page["ID"].tolist() == ["ID_3"] and page.loc[0, "Value"] == [1.0, 1.0]
+    assert process.get_combinations(enabled=False)["ID"].tolist() == ["ID_1"]
+
+def test_from_filtered_blocks():
+    blocks = [np.array([[1, 0, 1], [0.5, 0.5, 1]]), np.empty((0, 3)), np.array([[0, 1, 1]])]
+    store = CombinationStore.from_blocks(["Gluc", "Gluc", "FTHF_in"], ["100000", "111111", "0"], None,
+                                         iter(blocks), None, max_combinations=5)
+    assert np.array_equal(store.fractions, np.vstack(blocks))
+    assert len(store.enabled) == 3
+    with pytest.raises(ValueError):
+        CombinationStore.from_blocks(["Gluc", "Gluc", "FTHF_in"], ["100000", "111111", "0"], None, blocks, None, max_combinations=2)
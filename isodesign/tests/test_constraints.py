@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from isodesign.base.constraints import Constraints
+from isodesign.base.isotopomer import Isotopomer
+from isodesign.base.label_input import LabelInput
+
+
+@pytest.fixture
+def isotopomers():
+    return {
+        "Gluc": [Isotopomer("Gluc", "000000", 10, 0, 1, price=1),
+                 Isotopomer("Gluc", "100000", 10, 0, 1, price=100),
+                 Isotopomer("Gluc", "111111", 10, 0, 1, price=200)],
+        "Ace": [Isotopomer("Ace", "00", 5, 0, 1),
+                Isotopomer("Ace", "11", 5, 0, 1, price=50)]
+    }
+
+@pytest.mark.parametrize("constraints", [
+    Constraints(max_price=80),
+    Constraints(max_labeled_inputs=1),
+    Constraints(min_fractions={("Gluc", "111111"): 0.2}),
+    Constraints(enrichment_ranges={"Gluc": (0.3, 0.5)}),
+    Constraints(max_price=120, max_labeled_inputs=2, min_fractions={("Ace", "11"): 0.4}),
+])
+def test_constrained_combinations(isotopomers, constraints):
+    label_input = LabelInput(isotopomers)
+    label_input.generate_labelling_combinations(lazy=True)
+    all_combinations = np.vstack(list(label_input.iter_combinations()))
+    expected = all_combinations[constraints.mask(isotopomers, all_combinations)]
+
+    constrained_label_input = LabelInput(isotopomers, constraints)
+    constrained_label_input.generate_labelling_combinations(lazy=True)
+    combinations = np.vstack(list(constrained_label_input.iter_combinations(chunk_size=7)))
+
+    # Same combinations in the same order, without generating the infeasible ones
+    assert len(expected) < len(all_combinations)
+    assert np.array_equal(combinations, expected)
+    assert constrained_label_input.count_combinations() <= label_input.count_combinations()
+
+def test_prune_groups(isotopomers):
+    label_input = LabelInput(isotopomers, Constraints(max_price=80))
+    label_input.generate_labelling_combinations(lazy=True)
+
+    # Glucose combinations costing more than 80 are discarded before combining the groups
+    assert np.all(label_input.isotopomer_combinations["Gluc"] @ [1, 100, 200] <= 80)
+    assert label_input.count_labelling_combinations()["Gluc"] == len(label_input.isotopomer_combinations["Gluc"])
+
+def test_invalid_constraints(isotopomers):
+    with pytest.raises(ValueError):
+        Constraints(enrichment_ranges={"Gluc": (0.6, 0.5)})
+    with pytest.raises(ValueError):
+        LabelInput(isotopomers, Constraints(min_fractions={("Gluc", "010000"): 0.2}))
+
+def test_configure_constrained_linp_files(process, isotopomers):
+    process.isotopomers = isotopomers
+    process.set_constraints(max_price=80, max_labeled_inputs=1)
+    process.generate_combinations()
+    process.configure_linp_files()
+
+    assert len(process.combinations) > 0
+    assert np.all(process.combinations.total_prices() <= 80)
+    assert np.all(process.combinations.nb_labeled_inputs() <= 1)
+    assert process.combinations.get_id(len(process.combinations) - 1) == f"ID_{len(process.combinations)}"
+
+    process.set_constraints()
+    assert process.constraints is None
@@ -0,0 +1,48 @@
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+
+from isodesign.base import export
+from isodesign.base.export import export_summary, missing_values_styles, write_excel_summary_in_background
+
+
+@pytest.fixture
+def summary():
+    return pd.DataFrame({"Name": ["pgi", "pyk", "BM"], "Kind": ["NET", "NET", "NET"],
+                         " Intial flux value": [0.7, 1.4, np.nan], "Value": [0.7, 1.4, 0.1],
+                         "ID_1": [0.5, 0.25, 1.0], "ID_2": [1.0, 2.0, 3.0]})
+
+def test_export_summary(tmp_path, summary, monkeypatch):
+    paths = export_summary(summary, tmp_path / "model_summary")
+    assert [path.name for path in paths] == ["model_summary.parquet", "model_summary.feather", "model_summary.tsv"]
+    assert pd.read_parquet(paths[0]).equals(summary)
+    assert pd.read_feather(paths[1]).equals(summary)
+    assert pd.read_csv(paths[2], sep="\t").equals(summary)
+    with pytest.raises(ValueError):
+        export_summary(summary, tmp_path / "model_summary", ["xlsx"])
+
+    # Columnar formats are skipped without pyarrow
+    monkeypatch.setattr(export, "pyarrow", None)
+    assert [path.name for path in export_summary(summary, tmp_path / "other")] == ["other.tsv"]
+
+def test_excel_summary(tmp_path, summary):
+    # Same styles as highlighting each row with missing values separately
+    expected = summary.apply(lambda row: [f"background-color: {export.MISSING_VALUES_COLOR}" if row.isnull().any() else "" for _ in row],
+                             axis=1, result_type="broadcast")
+    assert missing_values_styles(summary).equals(expected)
+
+    path = write_excel_summary_in_background(summary, tmp_path / "model_summary.xlsx").result(timeout=30)
+    sheet = openpyxl.load_workbook(path).active
+    assert [cell.value for cell in sheet[1]] == list(summary.columns)
+    assert [sheet[f"A{row}"].fill.fgColor.rgb.endswith("FFFBCC") for row in range(2, 5)] == [False, False, True]
+    assert not (tmp_path / "~model_summary.xlsx").exists()
+
+def test_excel_summary_error(tmp_path, summary, caplog):
+    # Errors of the background export are logged even if the Future is not checked
+    future = write_excel_summary_in_background(summary, tmp_path / "missing_folder" / "model_summary.xlsx")
+    with pytest.raises(OSError):
+        future.result(timeout=30)
+    # The callback has been run once the next export starts (single worker)
+    export._excel_executor.submit(lambda: None).result(timeout=30)
+    assert "The Excel summary could not be written" in caplog.text
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from isodesign.base.ingestion import read_tvar_sim, read_tvar_sim_files, sd_matrix
+
+
+def test_read_tvar_sim_files(tmp_path, write_tvar_sim):
+    for index in range(1, 4):
+        write_tvar_sim(tmp_path, f"ID_{index}", [index / 3, np.nan, 1e5 * index], ("yes", "no", "no"))
+    # File with another column order and different fluxes
+    with open(tmp_path / "ID_4.tvar.sim", "w") as f:
+        f.write("Name\tKind\tId\tComment\tType\tValue\tSD\tStruct_identif\n"
+                "pyk\tNET\t\t\tD\t1.4\t0.25\tyes\npgi\tNET\t\t\tD\t0.7\t0.5\tyes\n")
+    paths = [tmp_path / f"ID_{index}_res" / f"ID_{index}.tvar.sim" for index in range(1, 4)] + [tmp_path / "ID_4.tvar.sim"]
+
+    results = read_tvar_sim_files(paths, max_workers=2)
+    assert [result.linp_id for result in results] == ["ID_1", "ID_2", "ID_3", "ID_4"]
+    assert [result.nb_identified for result in results] == [1, 1, 1, 2]
+    # Values are parsed as if each file was parsed separately
+    for path, result in zip(paths, results):
+        expected = pd.read_csv(path, sep="\t")
+        assert np.array_equal(result.sds, expected["SD"].to_numpy(), equal_nan=True)
+        assert list(result.names) == list(expected["Name"]) and list(result.values) == list(expected["Value"])
+        assert np.array_equal(read_tvar_sim(path).sds, result.sds, equal_nan=True)
+
+    index, sds = sd_matrix(results[:3])
+    assert list(index) == [("pgi", "NET"), ("pgi", "XCH"), ("pyk", "NET")]
+    assert np.array_equal(sds[2], [1e5, 2e5, 3e5])
+    # Only the fluxes of all files are kept
+    index, sds = sd_matrix(results)
+    assert list(index) == [("pgi", "NET"), ("pyk", "NET")]
+    assert np.array_equal(sds[:, 3], [0.5, 0.25])
+
+def test_read_tvar_sim_files_malformed(tmp_path, write_tvar_sim):
+    write_tvar_sim(tmp_path, "ID_1", [0.5, 1.0, 2.0])
+    write_tvar_sim(tmp_path, "ID_2", [0.5, "1.0.0", 2.0])
+    paths = [tmp_path / f"ID_{index}_res" / f"ID_{index}.tvar.sim" for index in (1, 2)]
+
+    results = read_tvar_sim_files(paths)
+    # A malformed value only changes the types of its own file
+    assert results[0].sds.dtype == np.float64 and results[0].values.dtype == np.float64
+    assert np.array_equal(results[0].sds, [0.5, 1.0, 2.0])
+    assert list(results[1].sds) == list(read_tvar_sim(paths[1]).sds) == ["0.5", "1.0.0", "2.0"]
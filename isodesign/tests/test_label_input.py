@@ -0,0 +1,78 @@
+import pytest
+from fractions import Fraction
+from itertools import product
+import numpy as np
+
+from isodesign.base.isotopomer import Isotopomer
+from isodesign.base.label_input import LabelInput
+
+
+def meshgrid_combinations(isotopomers):
+    """
+    Reference implementation of the combinations of one isotopomers group 
+    (all fractions on a meshgrid filtered with sum <= 1, the first fraction 
+    being deduced from the others).
+    """
+    fractions = [[Fraction(isotopomer.lower_bound) + k * Fraction(isotopomer.upper_bound - isotopomer.lower_bound, isotopomer.intervals_nb)
+                  for k in range(isotopomer.intervals_nb + 1)] if isotopomer.step else [Fraction(isotopomer.upper_bound)]
+                 for isotopomer in isotopomers[1:]]
+    grid = np.array(np.meshgrid(*[np.array(f, dtype=object) for f in fractions])).T.reshape(-1, len(fractions))
+    return [[1 - sum(row)] + list(row) for row in grid if sum(row) <= 1]
+
+@pytest.mark.parametrize("intervals", [(10, 10, 10), (2, 5, 10), (3, 4, 1), (10, 10, 10, 10)])
+def test_generate_labelling_combinations_matches_meshgrid(intervals):
+    isotopomers = [Isotopomer("Gluc", "000000", 10, 1, 1)] + [
+        Isotopomer("Gluc", f"{index:06b}", intervals_nb, 0, 1) for index, intervals_nb in enumerate(intervals, start=1)]
+    label_input = LabelInput({"Gluc": isotopomers})
+    label_input.generate_labelling_combinations()
+
+    expected = meshgrid_combinations(isotopomers)
+    numerators = label_input.isotopomer_numerators["Gluc"]
+    denominator = label_input.denominators["Gluc"]
+
+    assert [[Fraction(int(value), denominator) for value in row] for row in numerators] == expected
+    assert np.all(numerators.sum(axis=1) == denominator)
+    assert np.allclose(label_input.isotopomer_combinations["Gluc"], np.array(expected, dtype=float))
+
+def test_generate_labelling_combinations_all_combinations_order():
+    label_input = LabelInput({
+        "Gluc": [Isotopomer("Gluc", "000000", 10, 1, 1), Isotopomer("Gluc", "111111", 2, 0, 1)],
+        "Ace": [Isotopomer("Ace", "00", 10, 1, 1), Isotopomer("Ace", "11", 1, 0, 1)]})
+    label_input.generate_labelling_combinations()
+
+    expected = [np.concatenate(pair) for pair in product(label_input.isotopomer_combinations["Gluc"],
+                                                          label_input.isotopomer_combinations["Ace"])]
+    assert np.array_equal(label_input.isotopomer_combinations["All_combinations"], expected)
+
+def test_generate_labelling_combinations_invalid_sum():
+    label_input = LabelInput({"Gluc": [Isotopomer("Gluc", "111111", 2, 0, 1)]})
+    with pytest.raises(ValueError, match="Sum of all fractions is not equal to 1 for Gluc group"):
+        label_input.generate_labelling_combinations()
+
+def test_iter_combinations_blocks():
+    label_input = LabelInput({
+        "Gluc": [Isotopomer("Gluc", "000000", 10, 1, 1), Isotopomer("Gluc", "111111", 10, 0, 1)],
+        "Ace": [Isotopomer("Ace", "00", 10, 1, 1), Isotopomer("Ace", "11", 4, 0, 1)]})
+    label_input.generate_labelling_combinations()
+    expected = np.array(label_input.isotopomer_combinations["All_combinations"])
+
+    lazy_label_input = LabelInput(label_input.isotopomer_group)
+    lazy_label_input.generate_labelling_combinations(lazy=True)
+    blocks = list(lazy_label_input.iter_combinations(chunk_size=7))
+
+    assert "All_combinations" not in lazy_label_input.isotopomer_combinations
+    assert lazy_label_input.count_combinations() == len(expected) == 55
+    assert all(len(block) <= 7 for block in blocks)
+    assert np.array_equal(np.vstack(blocks), expected)
+    assert np.array_equal(lazy_label_input.get_combinations(10, 20), expected[10:20])
+
+@pytest.mark.parametrize("intervals", [(10, 10, 10), (2, 5, 10), (3, 4, 1), (20, 20, 20, 20)])
+def test_count_labelling_combinations(intervals):
+    isotopomers = [Isotopomer("Gluc", "000000", 10, 1, 1)] + [
+        Isotopomer("Gluc", f"{index:06b}", intervals_nb, 0, 1) for index, intervals_nb in enumerate(intervals, start=1)]
+    label_input = LabelInput({"Gluc": isotopomers, "Ace": [Isotopomer("Ace", "00", 10, 1, 1)]})
+    counts = label_input.count_labelling_combinations()
+
+    label_input.generate_labelling_combinations(lazy=True)
+    assert counts == {"Gluc": len(label_input.isotopomer_combinations["Gluc"]), "Ace": 1}
+    assert label_input.count_combinations() == counts["Gluc"]
@@ -1,43 +1,52 @@
+import os
 import pytest
 # from isodesign.base.process import Process
 from isodesign.base.isotopomer import Isotopomer
 import numpy as np
+import pandas as pd
 from decimal import Decimal as D
+from isodesign.base.process import file_info
+from isodesign.base.symmetry import find_symmetries
 
 def test_configure_unlabelled_form(process):
     process.configure_unlabelled_form()
     assert len(process.isotopomers["Gluc"]) == 1
     assert process.isotopomers["Gluc"][0].labelling == "000000"
     assert process.isotopomers["Gluc"][0].intervals_nb == 10
-    assert process.isotopomers["Gluc"][0].lower_bound == 100
-    assert process.isotopomers["Gluc"][0].upper_bound == 100
+    assert process.isotopomers["Gluc"][0].lower_bound == 1
+    assert process.isotopomers["Gluc"][0].upper_bound == 1
     assert process.isotopomers["Gluc"][0].price is None
 
     assert len(process.isotopomers["FTHF_in"]) == 1
     assert process.isotopomers["FTHF_in"][0].labelling == "0"
     assert process.isotopomers["FTHF_in"][0].intervals_nb == 10
-    assert process.isotopomers["FTHF_in"][0].lower_bound == 100
-    assert process.isotopomers["FTHF_in"][0].upper_bound == 100
+    assert process.isotopomers["FTHF_in"][0].lower_bound == 1
+    assert process.isotopomers["FTHF_in"][0].upper_bound == 1
     assert process.isotopomers["FTHF_in"][0].price is None
 
 def test_add_isotopomer_valid(process):
-    process.isotopomers = {"Gluc": [Isotopomer("Gluc", "000000", 10, 0, 100)]}  
-    process.add_isotopomer("Gluc", "100000", 10, 0, 100)
+    process.isotopomers = {"Gluc": [Isotopomer("Gluc", "000000", 10, 0, 1)]}  
+    process.add_isotopomer("Gluc", "100000", 10, 0, 1)
     assert len(process.isotopomers["Gluc"]) == 2
     assert process.isotopomers["Gluc"][1].labelling == "100000"
  
+def test_add_isotopomer_invalid_bounds(process):
+    # Bounds are fractions (0 or 1), not percentages
+    with pytest.raises(ValueError, match="Values must not exceed 1."):
+        process.add_isotopomer("Gluc", "100000", 10, 0, 100)
+
 def test_add_isotopomer_invalid_length(process):
     with pytest.raises(ValueError, match="Number of atoms for Gluc should be equal to 6"):
-        process.add_isotopomer("Gluc", "10000", 10, 0, 100)
+        process.add_isotopomer("Gluc", "10000", 10, 0, 1)
 
 def test_add_isotopomer_duplicate_labelling(process):
-    process.isotopomers = {"Gluc": [Isotopomer("Gluc", "100000", 10, 0, 100)]}  
+    process.isotopomers = {"Gluc": [Isotopomer("Gluc", "100000", 10, 0, 1)]}  
     with pytest.raises(ValueError, match="Isotopomer 100000 already exists for Gluc"):
-        process.add_isotopomer("Gluc", "100000", 10, 0, 100)
+        process.add_isotopomer("Gluc", "100000", 10, 0, 1)
 
 def test_remove_isotopomer(process):
-    process.isotopomers = {"Gluc": [Isotopomer("Gluc", "100000", 10, 0, 100)]}  
-    process.add_isotopomer("Gluc", "111111", 10, 0, 100)
+    process.isotopomers = {"Gluc": [Isotopomer("Gluc", "100000", 10, 0, 1)]}  
+    process.add_isotopomer("Gluc", "111111", 10, 0, 1)
     process.remove_isotopomer("Gluc", "111111")
     assert len(process.isotopomers["Gluc"]) == 1
     assert process.isotopomers["Gluc"][0].labelling == "100000"  
@@ -53,9 +62,9 @@ def test_generate_combinations_empty_isotopomers(process):
 
 def test_generate_combinations_success(process):
     process.isotopomers = {
-        "Gluc": [Isotopomer("Gluc", "100000", 2, 0, 100),
-                 Isotopomer("Gluc", "111111", 2, 0, 100)],
-        "FTHF_in": [Isotopomer("FTHF_in", "0", 100, 100, 100)]
+        "Gluc": [Isotopomer("Gluc", "100000", 2, 0, 1),
+                 Isotopomer("Gluc", "111111", 2, 0, 1)],
+        "FTHF_in": [Isotopomer("FTHF_in", "0", 100, 1, 1)]
     }
 
     process.generate_combinations()
@@ -66,18 +75,19 @@ def test_generate_combinations_success(process):
     
     assert np.array_equal(process.label_input.isotopomer_combinations["FTHF_in"], np.array([[D("1")]]))
     
-    assert np.array_equal(process.label_input.isotopomer_combinations["All_combinations"], [np.array([D("1"), D("0"), D("1")]),
-                                                                                            np.array([D("0.5"), D("0.5"), D("1")]),
-                                                                                            np.array([D("0"), D("1"), D("1")])])
+    assert process.label_input.count_combinations() == 3
+    assert np.array_equal(np.vstack(list(process.label_input.iter_combinations(chunk_size=2))), np.array([[1, 0, 1],
+                                                                                                         [0.5, 0.5, 1],
+                                                                                                         [0, 1, 1]]))
 
     assert process.label_input.names == ["Gluc", "Gluc", "FTHF_in"]
     assert process.label_input.labelling_patterns == ["100000", "111111", "0"]
 
 def test_configure_linp_files(process):
     process.isotopomers = {
-        "Gluc": [Isotopomer("Gluc", "100000", 2, 0, 100),
-                 Isotopomer("Gluc", "111111", 2, 0, 100)],
-        "FTHF_in": [Isotopomer("FTHF_in", "0", 100, 100, 100)]
+        "Gluc": [Isotopomer("Gluc", "100000", 2, 0, 1),
+                 Isotopomer("Gluc", "111111", 2, 0, 1)],
+        "FTHF_in": [Isotopomer("FTHF_in", "0", 1, 1, 1)]
     }
 
     process.generate_combinations()
@@ -109,8 +119,132 @@ def test_reintegrate_linp_configuration(process):
     assert "ID_2" in process.linp_dataframes
     assert process.linp_to_remove == {}
 
+def test_undo_linp_configuration(process):
+    process.remove_linp_configuration([0, 2])
+    process.set_linp_configuration_where(lambda combinations: combinations.fractions[:, 0] == 0.5)
+    assert list(process.linp_dataframes) == []
+
+    assert process.undo_linp_configuration()
+    assert list(process.linp_dataframes) == ["ID_2"]
+    assert process.undo_linp_configuration()
+    assert list(process.linp_dataframes) == ["ID_1", "ID_2", "ID_3"]
+    assert not process.undo_linp_configuration()
+
 def test_reintegrate_linp_configuration_invalid_index(process):
     process.remove_linp_configuration([0, 2])
     with pytest.raises(KeyError):
         process.reintegrate_linp_configuration([5])
 
+
+def test_estimate_design_cost(process):
+    process.isotopomers = {
+        "Gluc": [Isotopomer("Gluc", "100000", 10, 0, 1),
+                 Isotopomer("Gluc", "111111", 10, 0, 1),
+                 Isotopomer("Gluc", "110000", 10, 0, 1)],
+        "FTHF_in": [Isotopomer("FTHF_in", "0", 1, 1, 1)]
+    }
+    cost = process.estimate_design_cost()
+
+    assert cost.combinations_per_substrate == {"Gluc": 66, "FTHF_in": 1}
+    assert cost.nb_combinations == 66
+    assert cost.memory_size == 66 * 4 * 8
+    assert cost.simulation_time is None
+
+    process.command_list = ["influx_s", "--prefix", "design_test_1"]
+    process.vmtf_element_dict["linp"] = ["ID_1", "ID_2"]
+    process.record_simulation_time(10)
+    assert process.simulation_timings == {"influx_s": [5]}
+    assert process.estimate_design_cost().simulation_time == 66 * 5
+    assert process.estimate_design_cost(influx_mode="influx_i").simulation_time is None
+
+def test_isotopomer_registry(process):
+    process.configure_unlabelled_form()
+    process.add_isotopomer("Gluc", "100000", 10, 0, 1, price=50)
+    process.add_isotopomer("Gluc", "111111", 10, 0, 1)
+
+    assert [isotopomer.labelling for isotopomer in process.isotopomers["Gluc"]] == ["000000", "100000", "111111"]
+    assert process.get_isotopomer_price("100000", "Gluc") == 50
+    assert process.get_isotopomer_price("110000", "Gluc") is None
+
+    process.remove_isotopomer("Gluc", "100000")
+    process.add_isotopomer("Gluc", "100000", 10, 0, 1)
+    assert [isotopomer.labelling for isotopomer in process.isotopomers["Gluc"]] == ["000000", "111111", "100000"]
+
+def test_legacy_isotopomers(process):
+    state = process.__dict__.copy()
+    del state["_isotopomers"]
+    state["isotopomers"] = {"Gluc": [Isotopomer("Gluc", "000000", 10, 1, 1)]}
+
+    legacy_process = type(process).__new__(type(process))
+    legacy_process.__setstate__(state)
+    legacy_process.add_isotopomer("Gluc", "100000", 10, 0, 1)
+
+    assert [isotopomer.labelling for isotopomer in legacy_process.isotopomers["Gluc"]] == ["000000", "100000"]
+
+def test_generate_linp_files_duplicates(process, tmp_path, write_tvar_sim):
+    process.model_name = "design_test_1"
+    process.output_folder_path = tmp_path
+    process.tmp_folder_path = tmp_path / "design_test_1_tmp"
+    process.tmp_folder_path.mkdir()
+    # ID_4 gives the same linp file as ID_2
+    process.linp_dataframes = {**process.linp_dataframes, "ID_4": process.linp_dataframes["ID_2"]}
+
+    process.generate_linp_files()
+
+    assert sorted(path.name for path in process.tmp_folder_path.glob("*.linp")) == ["ID_1.linp", "ID_2.linp", "ID_3.linp"]
+    assert process.vmtf_element_dict["linp"] == ["ID_1", "ID_2", "ID_3"]
+    assert process.linp_equivalences["ID_4"] == "ID_2"
+    assert set(process.linp_infos) == {"ID_1", "ID_2", "ID_3", "ID_4"}
+    with open(tmp_path / "design_test_1_IDs_combinations.tsv") as f:
+        assert f.readlines()[-1].split("\t")[-1] == "ID_2\n"
+
+    process.mtf_files["tvar"] = file_info(None, pd.DataFrame({"Name": ["pgi", "pgi", "pyk"], "Kind": ["NET", "XCH", "NET"], "Value": [0.7, 0.1, 1.4]}))
+    for index, linp_id in enumerate(process.vmtf_element_dict["linp"]):
+        write_tvar_sim(process.tmp_folder_path, linp_id, [index, index + 0.5, 100])
+    process.generate_summary()
+
+    assert list(process.summary_dataframe.columns[5:]) == ["ID_1", "ID_2", "ID_3", "ID_4"]
+    assert process.summary_dataframe["ID_4"].equals(process.summary_dataframe["ID_2"].rename("ID_4"))
+    assert process.structures_identified == {"ID_1": 2, "ID_2": 2, "ID_3": 2, "ID_4": 2}
+
+def test_generate_linp_files_incremental(process, tmp_path):
+    process.model_name = "design_test_1"
+    process.output_folder_path = tmp_path
+    process.tmp_folder_path = tmp_path / "design_test_1_tmp"
+    process.tmp_folder_path.mkdir()
+    process.generate_linp_files()
+    first_generation = {path.name: path.stat().st_mtime_ns for path in process.tmp_folder_path.glob("*.linp")}
+    assert set(process.read_linp_manifest()) == {"ID_1.linp", "ID_2.linp", "ID_3.linp"}
+
+    # Unchanged files are kept, missing files are written again and obsolete files are deleted
+    process.remove_linp_configuration([2])
+    (process.tmp_folder_path / "ID_2.linp").unlink()
+    os.utime(process.tmp_folder_path / "ID_1.linp", ns=(0, 0))
+    process.generate_linp_files()
+
+    assert sorted(path.name for path in process.tmp_folder_path.glob("*.linp")) == ["ID_1.linp", "ID_2.linp"]
+    assert (process.tmp_folder_path / "ID_1.linp").stat().st_mtime_ns == 0
+    assert set(process.read_linp_manifest()) == {"ID_1.linp", "ID_2.linp"}
+    assert set(first_generation) == {"ID_1.linp", "ID_2.linp", "ID_3.linp"}
+
+def test_symmetric_isotopomers(process):
+    process.netan["input"]["Suc_in"] = 1
+    process.netan["Clen"]["Suc_in"] = 4
+    process.netan["carbotrans"] = {
+        "sdh_a": {"left": [("Suc_in", "ABCD")], "right": [("Fum", "ABCD")]},
+        "sdh_b": {"left": [("Suc_in", "ABCD")], "right": [("Fum", "DCBA")]},
+        "gluc_upt": {"left": [("Gluc", "ABCDEF")], "right": [("Glc6P", "ABCDEF")]}}
+    process.symmetries = {substrate: find_symmetries(process.netan, substrate) for substrate in process.netan["input"]}
+    assert process.symmetries == {"Gluc": [], "FTHF_in": [], "Suc_in": [(3, 2, 1, 0)]}
+
+    process.configure_unlabelled_form()
+    process.add_isotopomer("Suc_in", "1000", 10, 0, 1)
+    with pytest.raises(ValueError, match="Isotopomer 0001 is equivalent to isotopomer 1000 for Suc_in"):
+        process.add_isotopomer("Suc_in", "0001", 10, 0, 1)
+    process.add_isotopomer("Suc_in", "1100", 10, 0, 1)
+    
+    # Isotopomers configured without the symmetry analysis (e.g. in a previous session)
+    process.isotopomers.add("Suc_in", Isotopomer("Suc_in", "0011", 10, 0, 1))
+    assert process.find_equivalent_isotopomers() == {"Suc_in": {"0011": "1100"}}
+    process.generate_combinations()
+    assert process.label_input.labelling_patterns == ["000000", "0", "0000", "1000", "1100"]
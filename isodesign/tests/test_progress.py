@@ -0,0 +1,57 @@
+import json
+import os
+import time
+
+import pytest
+
+from isodesign.base.progress import SimulationProgress
+
+
+def wait_for(condition, timeout=10):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.05)
+    return condition()
+
+@pytest.mark.parametrize("watch", [True, False])
+def test_simulation_progress(tmp_path, watch):
+    updates = []
+    progress = SimulationProgress(tmp_path, ["ID_1", "ID_2", "ID_3"], tmp_path / "progress.json",
+                                  watch=watch, poll_interval=0.05, callback=updates.append).start()
+    for linp_id in ["ID_1", "ID_2"]:
+        (tmp_path / f"{linp_id}_res").mkdir()
+    (tmp_path / "ID_1_res" / "ID_1.tvar.sim").write_text("results")
+    # Results of the shards are followed too
+    (tmp_path / "shards" / "shard_2" / "ID_3_res").mkdir(parents=True)
+    (tmp_path / "shards" / "shard_2" / "ID_3_res" / "ID_3.tvar.sim").write_text("results")
+
+    assert wait_for(lambda: len(progress.completed) == 2)
+    progress.stop()
+    snapshot = progress.snapshot()
+    assert (snapshot["completed"], snapshot["total"]) == (2, 3)
+    assert snapshot["combinations_per_minute"] > 0 and snapshot["eta"] > 0
+    assert updates[-1]["completed"] == 2
+    with open(tmp_path / "progress.json") as f:
+        assert json.load(f)["completed"] == 2
+
+@pytest.mark.parametrize("watch", [True, False])
+def test_moved_results(tmp_path, watch):
+    progress = SimulationProgress(tmp_path, ["ID_1"], watch=watch, poll_interval=0.05).start()
+    shard_res_folder = tmp_path / "shards" / "shard_1" / "ID_1_res"
+    shard_res_folder.mkdir(parents=True)
+    (shard_res_folder / "ID_1.tvar.sim").write_text("results")
+    assert wait_for(lambda: progress.results_paths.get("ID_1") == shard_res_folder / "ID_1.tvar.sim")
+    completion_time = progress.completed["ID_1"]
+
+    # Results moved from the folder of the shard are followed at their new location
+    os.replace(shard_res_folder, tmp_path / "ID_1_res")
+    assert wait_for(lambda: progress.results_paths["ID_1"] == tmp_path / "ID_1_res" / "ID_1.tvar.sim")
+    progress.stop()
+    assert progress.completed["ID_1"] == completion_time
+
+def test_stragglers(tmp_path):
+    progress = SimulationProgress(tmp_path, ["ID_1", "ID_2", "ID_3", "ID_4"])
+    progress.started = {"ID_1": 0, "ID_2": 0, "ID_3": 10, "ID_4": 25}
+    progress.completed = {"ID_1": 10, "ID_2": 12}
+    # ID_3 runs for more than 3 times the median duration (11 s)
+    assert progress.stragglers(now=50) == ["ID_3"]
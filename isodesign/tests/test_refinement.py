@@ -0,0 +1,109 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from isodesign.base.isotopomer import Isotopomer
+from isodesign.base.process import file_info
+from isodesign.base.refinement import GridRefinement
+
+
+@pytest.fixture
+def isotopomers():
+    return {
+        "Gluc": [Isotopomer("Gluc", "000000", 2, 0, 1),
+                 Isotopomer("Gluc", "100000", 2, 0, 1),
+                 Isotopomer("Gluc", "111111", 2, 0, 1)],
+        "FTHF_in": [Isotopomer("FTHF_in", "0", 1, 1, 1)]
+    }
+
+def test_refine(isotopomers):
+    refinement = GridRefinement(isotopomers, {"Gluc": 2, "FTHF_in": 1}, [[1, 0, 0, 1], [0.5, 0.5, 0, 1], [0, 0.5, 0.5, 1]])
+    assert refinement.resolution == 0.5
+
+    new_fractions = refinement.refine([1])
+
+    assert refinement.round == 1
+    assert refinement.resolution == 0.25
+    # Points at 1/4 around (0.5, 0.5, 0), inside the simplex and not generated yet
+    assert sorted(map(tuple, new_fractions.tolist())) == [(0, 0.75, 0.25, 1), (0.25, 0.5, 0.25, 1), (0.25, 0.75, 0, 1),
+                                                          (0.5, 0.25, 0.25, 1), (0.75, 0.25, 0, 1)]
+    assert np.array_equal(refinement.fractions[:3], [[1, 0, 0, 1], [0.5, 0.5, 0, 1], [0, 0.5, 0.5, 1]])
+
+    # Points already generated are not generated again
+    assert not {tuple(point) for point in refinement.refine([1]).tolist()} & \
+        {tuple(point) for point in refinement.fractions[:8].tolist()}
+
+def test_refine_budget(isotopomers):
+    refinement = GridRefinement(isotopomers, {"Gluc": 2, "FTHF_in": 1}, [[1, 0, 0, 1], [0.5, 0.5, 0, 1]])
+
+    assert len(refinement.refine([1, 0], max_points=2)) == 2
+    assert len(refinement.points) == 4
+
+def test_refine_design(process, isotopomers):
+    process.isotopomers = isotopomers
+    process.start_adaptive_design()
+    assert len(process.combinations) == 6
+
+    with pytest.raises(ValueError):
+        process.refine_design()
+
+    process.scores = pd.DataFrame({"sum of SDs": [3.0, 1.0, 2.0, 5.0, 6.0, 4.0]}, index=process.combinations.ids)
+    new_ids = process.refine_design(nb_best=1)
+
+    assert process.refinement_rounds[0]["best_ids"] == ["ID_2"]
+    assert process.refinement_rounds[0]["ids"] == process.combinations.ids[:6]
+    assert new_ids == process.combinations.ids[6:]
+    # Combinations of the previous round stay in the design
+    assert list(process.linp_dataframes) == process.combinations.ids
+    assert not process.combinations.history
+
+    process.scores = pd.DataFrame({"sum of SDs": np.zeros(len(process.combinations))}, index=process.combinations.ids)
+    assert process.refine_design(nb_best=1, max_simulations=len(process.combinations)) == []
+    assert len(process.refinement_rounds) == 2
+    assert process.refinement_rounds[1]["ids"] == new_ids
+
+# Fake influx_si command: the SD of the fluxes is the distance between the
+# fraction of the fully labelled glucose and 0.3
+FAKE_INFLUX = """
+import os
+import sys
+import pandas as pd
+
+vmtf = pd.read_csv(sys.argv[1], sep="\\t")
+for linp_id in vmtf["linp"]:
+    linp = pd.read_csv(f"{linp_id}.linp", sep="\\t", dtype={"Isotopomer": str})
+    fraction = linp.loc[linp["Isotopomer"] == "111111", "Value"].sum()
+    os.makedirs(f"{linp_id}_res", exist_ok=True)
+    with open(f"{linp_id}_res/{linp_id}.tvar.sim", "w") as f:
+        f.write("Id\\tComment\\tName\\tKind\\tType\\tValue\\tSD\\tStruct_identif\\n")
+        f.write(f"\\t\\tpgi\\tNET\\tD\\t0.7\\t{abs(fraction - 0.3)}\\tyes\\n")
+"""
+
+def test_run_adaptive_design(process, isotopomers, tmp_path):
+    process.isotopomers = isotopomers
+    process.model_name = "design_test"
+    process.output_folder_path = tmp_path
+    process.tmp_folder_path = tmp_path / "design_test_tmp"
+    process.tmp_folder_path.mkdir()
+    tvar_path = tmp_path / "design_test.tvar"
+    pd.DataFrame({"Name": ["pgi"], "Kind": ["NET"], "Value": [0.7]}).to_csv(tvar_path, sep="\t", index=False)
+    process.mtf_files["tvar"] = file_info(tvar_path, pd.read_csv(tvar_path, sep="\t"))
+    (tmp_path / "fake_influx.py").write_text(FAKE_INFLUX)
+
+    process.run_adaptive_design([sys.executable, str(tmp_path / "fake_influx.py"), "design_test.vmtf"],
+                                ["sum of SDs"], nb_best=2, target_resolution=0.1)
+
+    assert [simulation_round["resolution"] for simulation_round in process.refinement_rounds] == [0.5, 0.25, 0.125, 0.0625]
+    best_id = process.refinement_rounds[-1]["best_ids"][0]
+    best_fraction = process.combinations.fractions[process.combinations.get_row(best_id), 2]
+    assert abs(best_fraction - 0.3) <= 0.0625
+    # Far fewer combinations than the full grid at the final resolution (153 combinations)
+    assert len(process.combinations) < 60
+    # The summary and the scores cover the combinations of all rounds
+    assert sorted(process.results.ids) == sorted(process.combinations.ids)
+    assert set(process.scores.index) == set(process.combinations.ids)
+    # Only the results folder of the last summary is kept
+    assert [folder.name for folder in (tmp_path / "design_test_results").iterdir()] == [process.results.path.name]
+    assert sum(len(simulation_round["ids"]) for simulation_round in process.refinement_rounds) == len(process.combinations)
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pandas as pd
+
+from isodesign.base.process import file_info
+from isodesign.base.result_cache import ResultCache, normalize_command
+from isodesign.tests.test_simulation import FAKE_INFLUX
+
+
+def test_normalize_command():
+    assert (normalize_command(["influx_s", "--prefix", "e_coli", "--noopt", "--np", "4", "--emu"]) 
+            == normalize_command(["/usr/bin/influx_s", "--emu", "--prefix", "e_coli_2", "--np", "4", "--noopt"]))
+    assert normalize_command(["influx_s", "--np", "4"]) != normalize_command(["influx_s", "--np", "2"])
+    assert normalize_command(["influx_s", "--emu"]) != normalize_command(["influx_i", "--emu"])
+
+def test_result_cache_eviction(tmp_path):
+    tvar_sim_path = tmp_path / "ID_1.tvar.sim"
+    tvar_sim_path.write_text("x" * 100)
+    cache = ResultCache(tmp_path / "cache", max_size=250)
+    for index, key in enumerate(["a1", "b2", "c3"]):
+        cache.put(key, tvar_sim_path)
+        os.utime(cache._path(key), ns=(index, index))
+
+    # The least recently used entry is removed
+    assert cache.get("a1", tmp_path / "ID_1_res" / "ID_1.tvar.sim")
+    assert cache.evict() == 1
+    assert cache.size == 200
+    assert not cache.get("b2", tmp_path / "ID_2.tvar.sim")
+    assert cache.get("c3", tmp_path / "ID_3.tvar.sim")
+    assert (tmp_path / "ID_1_res" / "ID_1.tvar.sim").read_text() == "x" * 100
+
+def test_cached_simulation(process, tmp_path):
+    process.model_name = "design_test"
+    process.output_folder_path = tmp_path
+    process.tmp_folder_path = tmp_path / "design_test_tmp"
+    process.tmp_folder_path.mkdir()
+    tvar_path = tmp_path / "design_test.tvar"
+    pd.DataFrame({"Name": ["pgi"], "Kind": ["NET"], "Value": [0.7]}).to_csv(tvar_path, sep="\t", index=False)
+    process.mtf_files["tvar"] = file_info(tvar_path, pd.read_csv(tvar_path, sep="\t"))
+    (tmp_path / "fake_influx.py").write_text(FAKE_INFLUX)
+    command_list = [sys.executable, str(tmp_path / "fake_influx.py"), "design_test.vmtf"]
+    process.set_result_cache(folder=tmp_path / "cache")
+    process.generate_linp_files()
+
+    assert process.prepare_simulation(param_list=command_list) == ["ID_1", "ID_2", "ID_3"]
+    process.influx_simulation(command_list).wait()
+    process.cache_simulation_results(["ID_1", "ID_2", "ID_3"])
+    assert len(process.result_cache.entries()) == 3
+
+    # Results are taken from the cache (even in another temp folder)
+    process.clear_tmp_folder()
+    process.tmp_folder_path.mkdir()
+    process.generate_linp_files()
+    assert process.prepare_simulation(param_list=command_list) == []
+    process.generate_summary()
+    assert process.summary_dataframe[["ID_1", "ID_2", "ID_3"]].values.tolist() == [[1, 2, 3]]
+
+    # Results depend on the options of influx_si and on the model
+    assert process.prepare_simulation(param_list=command_list + ["--emu"]) == ["ID_1", "ID_2", "ID_3"]
+    pd.DataFrame({"Name": ["pgi"], "Kind": ["NET"], "Value": [0.5]}).to_csv(tvar_path, sep="\t", index=False)
+    assert process.prepare_simulation(param_list=command_list) == ["ID_1", "ID_2", "ID_3"]
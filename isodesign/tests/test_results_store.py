@@ -0,0 +1,96 @@
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from isodesign.base.process import Process
+from isodesign.base.results_store import ResultsStore
+
+
+def summary():
+    return pd.DataFrame({"Name": ["pgi", "pgi", "pyk"], "Kind": ["NET", "XCH", "NET"],
+                         " Intial flux value": [0.7, 0.1, 1.4], "Value": [0.7, 0.1, 1.4],
+                         "Value difference": [0.0, 0.0, 0.0],
+                         "ID_1": [0.5, np.nan, 0.25], "ID_10": [1.0, 2.0, 3.0]})
+
+def test_results_store(tmp_path):
+    metadata = pd.DataFrame({"nb_labeled_inputs": [1, 2], "total_price": [10.0, 20.0], "structures_identified": [2, 3]},
+                            index=pd.Index(["ID_1", "ID_10"], name="ID"))
+    store = ResultsStore.from_dataframe(summary(), metadata)
+    assert store.sds.flags["C_CONTIGUOUS"] and store.sds.shape == (3, 2)
+    assert store.dataframe.equals(summary())
+
+    view = store.view([0, 2])
+    assert np.array_equal(view.sds, [[0.5, 1.0], [0.25, 3.0]])
+    assert view.dataframe.equals(summary().iloc[[0, 2]])
+    assert list(view.sd_dataframe().index) == [0, 2]
+
+    # The SD matrix of a saved store is memory-mapped and not pickled
+    store.save(tmp_path / "results")
+    loaded = ResultsStore.load(tmp_path / "results")
+    assert not loaded.sds.flags.owndata and not loaded.sds.flags.writeable
+    assert loaded.dataframe.equals(summary()) and loaded.metadata.equals(metadata)
+    pickled = pickle.dumps(store.view([1]))
+    unpickled = pickle.loads(pickled)
+    assert unpickled.store._sds is None
+    assert np.array_equal(unpickled.sds, [[np.nan, 2.0]], equal_nan=True)
+
+    # Saved results are never replaced
+    with pytest.raises(FileExistsError):
+        store.save(tmp_path / "results")
+
+def test_results_store_folders(tmp_path):
+    first_store = ResultsStore.from_dataframe(summary())
+    first_store.save(ResultsStore.new_folder(tmp_path))
+    second_summary = summary().drop(columns="ID_10")
+    second_store = ResultsStore.from_dataframe(second_summary)
+    second_store.save(ResultsStore.new_folder(tmp_path))
+    assert [first_store.path.name, second_store.path.name] == ["summary_1", "summary_2"]
+
+    # Each store reads its own results after being pickled
+    first_store, second_store = pickle.loads(pickle.dumps((first_store, second_store)))
+    assert first_store.dataframe.equals(summary())
+    assert second_store.dataframe.equals(second_summary)
+
+    # Results that do not correspond to the store are rejected
+    first_store = pickle.loads(pickle.dumps(ResultsStore.load(tmp_path / "summary_1")))
+    first_store.path = second_store.path
+    with pytest.raises(ValueError):
+        first_store.sds
+
+    # Folders that are not used anymore are deleted and their numbers are used again
+    pickled = pickle.dumps(ResultsStore.load(tmp_path / "summary_1"))
+    assert ResultsStore.prune_folders(tmp_path, [second_store]) == [tmp_path / "summary_1"]
+    assert ResultsStore.new_folder(tmp_path).name == "summary_1"
+    # Stores whose folder has been deleted are not available anymore
+    assert not pickle.loads(pickled).is_available()
+    assert second_store.is_available()
+
+    # The SD matrix is pickled with the store if requested
+    second_store.pickle_sds = True
+    pickled = pickle.dumps(second_store)
+    shutil.rmtree(tmp_path / "summary_2")
+    assert pickle.loads(pickled).dataframe.equals(second_summary)
+
+def test_legacy_summary_dataframe():
+    # Summary and filtered dataframes of previous session files are converted to a results store
+    process = Process.__new__(Process)
+    process.__setstate__({"summary_dataframe": summary(), "filtered_dataframe": summary().iloc[[1]]})
+    assert process.summary_dataframe.equals(summary())
+    assert list(process.filtered_results.rows) == [1]
+
+    process.data_filter(kind=["NET"])
+    assert process.filtered_dataframe.equals(summary().iloc[[0, 2]])
+    process.generate_score(["sum of SDs"])
+    assert process.scores.loc["ID_10", "sum of SDs"] == 4.0
+
+def test_missing_results_folder(tmp_path):
+    process = Process()
+    process.results = ResultsStore.from_dataframe(summary())
+    process.results.save(tmp_path / "summary_1")
+    state = pickle.dumps(process)
+    shutil.rmtree(tmp_path / "summary_1")
+    # The session is restored without its results
+    assert pickle.loads(state).results is None
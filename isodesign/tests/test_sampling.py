@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from isodesign.base.isotopomer import Isotopomer
+from isodesign.base.sampling import LabelInputSampler
+
+
+@pytest.fixture
+def isotopomers():
+    return {
+        "Gluc": [Isotopomer("Gluc", "000000", 10, 0, 1),
+                 Isotopomer("Gluc", "100000", 10, 0, 1),
+                 Isotopomer("Gluc", "111111", 10, 0, 1),
+                 Isotopomer("Gluc", "110000", 10, 0, 0)],
+        "FTHF_in": [Isotopomer("FTHF_in", "0", 1, 1, 1)]
+    }
+
+@pytest.mark.parametrize("method", ["sobol", "halton", "latin hypercube"])
+def test_sample_simplex(isotopomers, method):
+    sampler = LabelInputSampler(isotopomers, 64, method, seed=42)
+    sampler.generate_labelling_combinations(lazy=True)
+    samples = np.vstack(list(sampler.iter_combinations(chunk_size=10)))
+
+    assert samples.shape == (64, 5)
+    assert sampler.count_combinations() == 64
+    assert np.allclose(samples[:, :4].sum(axis=1), 1)
+    assert np.all(samples >= 0)
+    # Fixed fractions
+    assert np.all(samples[:, 3] == 0) and np.all(samples[:, 4] == 1)
+    # Points are spread over the simplex
+    assert samples[:, 2].min() < 0.1 and samples[:, 2].max() > 0.7
+    assert sampler.names == ["Gluc"] * 4 + ["FTHF_in"]
+
+def test_sample_seed(isotopomers):
+    first_sampler = LabelInputSampler(isotopomers, 16, seed=1)
+    first_sampler.generate_labelling_combinations()
+    second_sampler = LabelInputSampler(isotopomers, 8, seed=1)
+    second_sampler.generate_labelling_combinations()
+
+    # The sample is continued with the next points of the sequence
+    second_sampler.add_points(8)
+    assert np.array_equal(first_sampler.samples, second_sampler.samples)
+    assert second_sampler.count_combinations() == 16
+
+def test_sample_invalid_method(isotopomers):
+    with pytest.raises(ValueError):
+        LabelInputSampler(isotopomers, 16, "grid")
+
+def test_sample_combinations(process, isotopomers):
+    process.isotopomers = isotopomers
+    process.sample_combinations(8, seed=0)
+    process.configure_linp_files()
+    assert list(process.linp_dataframes) == [f"ID_{index}" for index in range(1, 9)]
+
+    process.sample_combinations(4, extend=True)
+    assert len(process.linp_dataframes) == 12
+    assert process.combinations.get_id(0) == "ID_1"
+    assert np.array_equal(process.combinations.fractions, process.label_input.samples)
+
+def test_sample_invalid_bounds(isotopomers):
+    # The fraction of a single isotopomer cannot vary
+    isotopomers["FTHF_in"] = [Isotopomer("FTHF_in", "0", 10, 0, 1)]
+    with pytest.raises(ValueError, match="FTHF_in"):
+        LabelInputSampler(isotopomers, 16)
+
+def test_sample_latin_hypercube_continuation(isotopomers):
+    sampler = LabelInputSampler(isotopomers, 16, "latin hypercube", seed=1)
+    sampler.generate_labelling_combinations()
+    with pytest.raises(ValueError):
+        sampler.add_points(8)
+    assert sampler.count_combinations() == 16
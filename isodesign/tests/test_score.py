@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from isodesign.base.process import linp_info
+from isodesign.base.score import ScoreHandler
+
+
+@pytest.fixture
+def sds():
+    return pd.DataFrame({"ID_1": [0.5, np.nan, 20.0], "ID_10": [1.0, 2.0, 3.0]})
+
+def test_score_handler(sds):
+    # "ID_10" is before "ID_1": label inputs are found by their exact ID
+    info_linp_files_dict = {"ID_10": linp_info(2, 30.0), "ID_1": linp_info(1, 10.0)}
+    struct_identif_dict = {"ID_10": 3, "ID_1": 2}
+    score_handler = ScoreHandler(sds)
+    score_handler.apply_criteria(["sum of SDs", "number of fluxes with SDs < threshold", "number of labeled inputs",
+                                  "price", "number of structurally identified fluxes"],
+                                 threshold=2.5, weight_flux=2, info_linp_files_dict=info_linp_files_dict,
+                                 struct_identif_dict=struct_identif_dict)
+    score_handler.apply_operations("Add")
+
+    assert score_handler.columns_scores == {
+        "ID_1": {"sum of SDs": 20.5, "number of fluxes with SDs < threshold": 2, "number of labeled inputs": 1,
+                 "price": 10.0, "number of structurally identified fluxes": 2, "Add": 35.5},
+        "ID_10": {"sum of SDs": 6.0, "number of fluxes with SDs < threshold": 4, "number of labeled inputs": 2,
+                  "price": 30.0, "number of structurally identified fluxes": 3, "Add": 45.0}}
+
+def test_score_handler_metadata(sds):
+    metadata = pd.DataFrame({"nb_labeled_inputs": [1, 2], "total_price": [10.0, 30.0], "structures_identified": [2, 3]},
+                            index=["ID_1", "ID_10"])
+    score_handler = ScoreHandler(sds, metadata)
+    score_handler.apply_criteria(["price", "number of structurally identified fluxes"], weight_struct_identif=2)
+    score_handler.apply_operations("Division")
+    assert score_handler.scores_dataframe.to_dict(orient="index") == {
+        "ID_1": {"price": 10.0, "number of structurally identified fluxes": 4, "Division": 2.5},
+        "ID_10": {"price": 30.0, "number of structurally identified fluxes": 6, "Division": 5.0}}
+    with pytest.raises(ValueError):
+        score_handler.apply_criteria(["unknown"])
+
+def test_score_handler_missing_label_inputs(sds, caplog):
+    # Label inputs without informations are not scored
+    score_handler = ScoreHandler(sds)
+    score_handler.apply_criteria(["number of labeled inputs", "number of structurally identified fluxes"],
+                                 info_linp_files_dict={"ID_1": linp_info(1, 10.0)}, struct_identif_dict={"ID_10": 3})
+    scores = score_handler.scores_dataframe
+    assert scores.loc["ID_1", "number of labeled inputs"] == 1
+    assert np.isnan(scores.loc["ID_10", "number of labeled inputs"])
+    assert np.isnan(scores.loc["ID_1", "number of structurally identified fluxes"])
+    assert scores.loc["ID_10", "number of structurally identified fluxes"] == 3
+    assert "ID_10" in caplog.text
+    score_handler.apply_criteria(["price"])
+    assert score_handler.scores_dataframe["price"].isna().all()
+
+    metadata = pd.DataFrame({"nb_labeled_inputs": [1], "total_price": [10.0], "structures_identified": [2]}, index=["ID_1"])
+    score_handler = ScoreHandler(sds, metadata)
+    score_handler.apply_criteria(["price"])
+    assert score_handler.scores_dataframe["price"].tolist()[0] == 10.0
+    assert np.isnan(score_handler.scores_dataframe.loc["ID_10", "price"])
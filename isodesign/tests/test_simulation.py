@@ -0,0 +1,182 @@
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from isodesign.base.process import file_info
+from isodesign.base.simulation import ShardedSimulation, SimulationRunner
+
+# Fake influx_si command simulating the linp files of the vmtf file given as argument.
+# The simulation of ID_2 fails if "fail" is given as second argument.
+FAKE_INFLUX = """
+import os
+import sys
+import time
+import pandas as pd
+
+vmtf = pd.read_csv(sys.argv[1], sep="\\t")
+if "sleep" in sys.argv:
+    time.sleep(30)
+for linp_id in vmtf["linp"]:
+    if linp_id == "ID_2" and "fail" in sys.argv:
+        sys.exit("ID_2 failed")
+    os.makedirs(f"{linp_id}_res", exist_ok=True)
+    with open(f"{linp_id}_res/{linp_id}.tvar.sim", "w") as f:
+        f.write("Id\\tComment\\tName\\tKind\\tType\\tValue\\tSD\\tStruct_identif\\n")
+        f.write(f"\\t\\tpgi\\tNET\\tD\\t0.7\\t{linp_id[3:]}\\tyes\\n")
+"""
+
+@pytest.fixture
+def simulation_process(process, tmp_path):
+    process.model_name = "design_test"
+    process.output_folder_path = tmp_path
+    process.tmp_folder_path = tmp_path / "design_test_tmp"
+    process.tmp_folder_path.mkdir()
+    tvar_path = tmp_path / "design_test.tvar"
+    pd.DataFrame({"Name": ["pgi"], "Kind": ["NET"], "Value": [0.7]}).to_csv(tvar_path, sep="\t", index=False)
+    process.mtf_files["tvar"] = file_info(tvar_path, pd.read_csv(tvar_path, sep="\t"))
+    (tmp_path / "fake_influx.py").write_text(FAKE_INFLUX)
+
+    process.generate_linp_files()
+    process.generate_vmtf_file()
+    process.copy_files()
+    return process
+
+def fake_influx_command(tmp_path, *options):
+    return [sys.executable, str(tmp_path / "fake_influx.py"), "design_test.vmtf", *options]
+
+def test_sharded_simulation(simulation_process, tmp_path):
+    progress = simulation_process.track_simulation_progress(["ID_1", "ID_2", "ID_3"])
+    simulation = simulation_process.influx_simulation(fake_influx_command(tmp_path), nb_shards=2, max_workers=2, cpu_affinity=True)
+    assert isinstance(simulation, ShardedSimulation)
+    assert [list(rows["linp"]) for rows in simulation.shards] == [["ID_1", "ID_2"], ["ID_3"]]
+    assert simulation.wait() == 0
+    progress.stop()
+    assert progress.snapshot()["completed"] == 3
+    assert (simulation_process.tmp_folder_path / simulation_process.PROGRESS_FILE).is_file()
+
+    # Results have the same layout as a single simulation
+    assert sorted(path.name for path in simulation_process.tmp_folder_path.glob("*_res")) == ["ID_1_res", "ID_2_res", "ID_3_res"]
+    assert not (simulation_process.tmp_folder_path / ShardedSimulation.SHARDS_FOLDER).exists()
+    simulation_process.generate_summary()
+    assert simulation_process.summary_dataframe[["ID_1", "ID_2", "ID_3"]].values.tolist() == [[1, 2, 3]]
+
+def test_sharded_simulation_error(simulation_process, tmp_path):
+    simulation = simulation_process.influx_simulation(fake_influx_command(tmp_path, "fail"), nb_shards=3, max_workers=1)
+    _, stderr_output = simulation.communicate()
+
+    assert simulation.returncode == 1
+    assert simulation.returncodes == [0, 1, 0]
+    assert "ID_2 failed" in stderr_output
+    # The folder of the failed shard is kept
+    assert [path.name for path in (simulation_process.tmp_folder_path / ShardedSimulation.SHARDS_FOLDER).iterdir()] == ["shard_2"]
+    assert sorted(path.name for path in simulation_process.tmp_folder_path.glob("*_res")) == ["ID_1_res", "ID_3_res"]
+
+def test_sharded_simulation_terminate(simulation_process, tmp_path):
+    simulation = simulation_process.influx_simulation(fake_influx_command(tmp_path, "sleep"), nb_shards=3, max_workers=1)
+    simulation.terminate()
+
+    assert simulation.wait() != 0
+    assert not list(simulation_process.tmp_folder_path.glob("*_res"))
+
+def test_resume_simulation(simulation_process, tmp_path):
+    assert simulation_process.prepare_simulation() == ["ID_1", "ID_2", "ID_3"]
+    # The run stops at ID_2
+    assert simulation_process.influx_simulation(fake_influx_command(tmp_path, "fail")).wait() != 0
+    assert simulation_process.get_simulated_linp() == ["ID_1"]
+
+    # Only the remaining combinations are simulated
+    assert simulation_process.prepare_simulation(resume=True) == ["ID_2", "ID_3"]
+    vmtf = pd.read_csv(simulation_process.tmp_folder_path / "design_test.vmtf", sep="\t")
+    assert list(vmtf["ftbl"]) == ["ID_2", "ID_3"]
+    assert simulation_process.influx_simulation(fake_influx_command(tmp_path)).wait() == 0
+    simulation_process.generate_summary()
+    assert simulation_process.summary_dataframe[["ID_1", "ID_2", "ID_3"]].values.tolist() == [[1, 2, 3]]
+
+    # Results with errors are not complete
+    (simulation_process.tmp_folder_path / "ID_3_res" / "ID_3.err").write_text("error")
+    assert simulation_process.prepare_simulation(resume=True) == ["ID_3"]
+    assert not (simulation_process.tmp_folder_path / "ID_3_res").exists()
+
+def test_changed_linp_results(simulation_process, tmp_path):
+    simulation_process.prepare_simulation()
+    assert simulation_process.influx_simulation(fake_influx_command(tmp_path)).wait() == 0
+
+    # Results of a linp file whose content has changed are removed
+    linp_dataframes = simulation_process.linp_dataframes
+    simulation_process.linp_dataframes = {"ID_1": linp_dataframes["ID_1"], "ID_2": linp_dataframes["ID_3"], "ID_3": linp_dataframes["ID_2"]}
+    simulation_process.generate_linp_files()
+    assert simulation_process.get_simulated_linp() == ["ID_1"]
+
+def test_simulation_runner():
+    first_line = threading.Event()
+    lines = []
+    def stderr_callback(line):
+        lines.append(line)
+        first_line.set()
+    script = "import sys, time; print('start', file=sys.stderr, flush=True); time.sleep(1); sys.exit('end')"
+
+    start_cpu_time = time.process_time()
+    runner = SimulationRunner([sys.executable, "-c", script], stderr_callback=stderr_callback)
+    # The error output is read while the process runs
+    assert first_line.wait(timeout=10)
+    assert runner.poll() is None
+    assert runner.wait() == 1
+    # The end of the process is waited without polling
+    assert time.process_time() - start_cpu_time < 0.5
+    assert lines == ["start\n", "end\n"]
+    assert runner.communicate() == (None, "start\nend\n")
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="CPU affinity is not supported on this platform")
+def test_simulation_runner_affinity():
+    core = min(os.sched_getaffinity(0))
+    # The process is bound to the cores from its start
+    runner = SimulationRunner([sys.executable, "-c", "import os, sys; sys.stderr.write(str(sorted(os.sched_getaffinity(0))))"],
+                              cpu_cores=[core])
+    assert runner.communicate() == (None, str([core]))
+
+def test_sharded_simulation_finish(simulation_process, tmp_path):
+    simulation = simulation_process.influx_simulation(fake_influx_command(tmp_path), nb_shards=2, max_workers=2)
+    # The end is handled once when poll and wait are called from several threads
+    threads = [threading.Thread(target=simulation.poll if index % 2 else simulation.wait) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert simulation.wait() == 0
+    assert simulation.returncodes == [0, 0]
+
+def test_incremental_summary(simulation_process, tmp_path, monkeypatch):
+    monkeypatch.setattr("isodesign.base.summary.SummaryBuilder.SETTLE_TIME", 0)
+    linp_to_simulate = simulation_process.prepare_simulation()
+    progress = simulation_process.track_simulation_progress(linp_to_simulate)
+    simulation_process.update_summary(progress)
+    assert simulation_process.results is None
+
+    assert simulation_process.influx_simulation(fake_influx_command(tmp_path)).wait() == 0
+    progress.stop()
+    # The results are available before the summary is generated
+    assert simulation_process.update_summary(progress)
+    assert simulation_process.results.ids == ["ID_1", "ID_2", "ID_3"]
+    assert simulation_process.structures_identified == {"ID_1": 1, "ID_2": 1, "ID_3": 1}
+    assert not simulation_process.update_summary(progress)
+
+    simulation_process.generate_summary()
+    assert simulation_process.summary_builder is None
+    assert simulation_process.summary_dataframe[["ID_1", "ID_2", "ID_3"]].values.tolist() == [[1, 2, 3]]
+
+def test_discard_partial_summary(simulation_process, tmp_path, monkeypatch):
+    monkeypatch.setattr("isodesign.base.summary.SummaryBuilder.SETTLE_TIME", 0)
+    linp_to_simulate = simulation_process.prepare_simulation()
+    progress = simulation_process.track_simulation_progress(linp_to_simulate)
+    assert simulation_process.influx_simulation(fake_influx_command(tmp_path)).wait() == 0
+    progress.stop()
+    assert simulation_process.update_summary(progress)
+    # The preview of an interrupted (or failed) simulation is not kept
+    simulation_process.discard_partial_summary()
+    assert simulation_process.summary_builder is None
+    assert simulation_process.results is None
+    assert simulation_process.structures_identified == {}
@@ -0,0 +1,61 @@
+import os
+import pytest
+
+from isodesign.base.process import file_info
+from isodesign.base.staging import stage_files
+
+
+@pytest.fixture
+def model_files(tmp_path):
+    model_directory = tmp_path / "model"
+    model_directory.mkdir()
+    for name in ["design_test_1.netw", "design_test_1.tvar", "design_test_2.netw", "design_test_1_summary.xlsx"]:
+        (model_directory / name).write_text(name)
+    return model_directory
+
+def test_stage_files(model_files, tmp_path):
+    source = model_files / "design_test_1.netw"
+    staging_folder = tmp_path / "staging"
+    staging_folder.mkdir()
+
+    assert stage_files([source], staging_folder) == {staging_folder / "design_test_1.netw": "hardlink"}
+    assert os.path.samefile(source, staging_folder / "design_test_1.netw")
+    # Files already staged are not staged again
+    assert stage_files([source], staging_folder) == {staging_folder / "design_test_1.netw": None}
+
+@pytest.mark.parametrize("modes", [("symlink", "copy"), ("copy",)])
+def test_stage_files_fallback(model_files, tmp_path, monkeypatch, modes):
+    # Hard links are not possible (e.g. folders on different file systems)
+    def link(source, destination):
+        raise OSError("Invalid cross-device link")
+    monkeypatch.setattr(os, "link", link)
+    source = model_files / "design_test_1.netw"
+
+    staged_files = stage_files([source], tmp_path, ("hardlink",) + modes)
+    assert staged_files == {tmp_path / "design_test_1.netw": modes[0]}
+    assert (tmp_path / "design_test_1.netw").is_symlink() == (modes[0] == "symlink")
+    assert (tmp_path / "design_test_1.netw").read_text() == "design_test_1.netw"
+
+    with pytest.raises(OSError):
+        stage_files([model_files / "design_test_1.tvar"], tmp_path, ("hardlink",))
+    with pytest.raises(ValueError):
+        stage_files([source], tmp_path, ("move",))
+
+def test_copy_files(process, model_files, tmp_path):
+    process.model_name = "design_test_1"
+    process.model_directory_path = model_files
+    process.tmp_folder_path = tmp_path / "design_test_1_tmp"
+    process.tmp_folder_path.mkdir()
+
+    # Only the MTF files of the model are staged
+    model_files_paths = process.get_model_files()
+    assert sorted(file.name for file in model_files_paths) == ["design_test_1.netw", "design_test_1.tvar"]
+    process.mtf_files = {file.suffix[1:]: file_info(file, None) for file in model_files_paths}
+    process.copy_files()
+    assert sorted(file.name for file in process.tmp_folder_path.iterdir()) == ["design_test_1.netw", "design_test_1.tvar"]
+
+    # A model file replaced by a new version is staged again
+    (model_files / "design_test_1.tvar").unlink()
+    (model_files / "design_test_1.tvar").write_text("new version")
+    process.copy_files()
+    assert (process.tmp_folder_path / "design_test_1.tvar").read_text() == "new version"
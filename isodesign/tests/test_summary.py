@@ -0,0 +1,74 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from isodesign.base.summary import SummaryBuilder
+
+
+def input_tvar():
+    return pd.DataFrame({"Name": ["pgi", "pgi", "pyk", "BM"], "Kind": ["NET", "XCH", "NET", "NET"], "Value": [0.6, 0.1, 1.5, 0.2]})
+
+def test_summary_builder(tmp_path, write_tvar_sim):
+    for index in range(1, 4):
+        write_tvar_sim(tmp_path, f"ID_{index}", [index, 2 * index, 1e5])
+    full = SummaryBuilder()
+    assert full.scan(tmp_path) == 3
+    equivalences = {"ID_1": "ID_1", "ID_2": "ID_2", "ID_3": "ID_3", "ID_4": "ID_2"}
+    expected = full.build(input_tvar(), equivalences)
+    assert expected.ids == ["ID_1", "ID_2", "ID_3", "ID_4"]
+    assert full.structures_identified(equivalences) == {"ID_1": 2, "ID_2": 2, "ID_3": 2, "ID_4": 2}
+
+    # Results are ingested as they are completed, files still being written are ingested later
+    builder = SummaryBuilder()
+    progress = SimpleNamespace(results_paths={"ID_2": tmp_path / "ID_2_res" / "ID_2.tvar.sim",
+                                              "ID_3": tmp_path / "ID_3_res" / "ID_3.tvar.sim"})
+    old_time = os.stat(progress.results_paths["ID_2"]).st_mtime - 10
+    os.utime(progress.results_paths["ID_2"], (old_time, old_time))
+    assert builder.update(progress) == 1
+    preview = builder.build(input_tvar(), equivalences)
+    assert preview.ids == ["ID_2", "ID_4"]
+    assert builder.update(progress) == 0
+
+    # At the end, only the files not ingested yet are read
+    assert builder.scan(tmp_path) == 2
+    assert builder.build(input_tvar(), equivalences).dataframe.equals(expected.dataframe)
+    assert builder.structures_identified(equivalences) == full.structures_identified(equivalences)
+
+    # The SD matrix of the store is a view of the rows of the ingested files
+    store = builder.build(input_tvar())
+    sds = store.sds.copy()
+    assert np.shares_memory(store.sds, builder._sds)
+    # Results added or read again later do not change the stores already built
+    write_tvar_sim(tmp_path, "ID_5", [5, 10, 1e5])
+    write_tvar_sim(tmp_path, "ID_1", [7, 7, 7])
+    assert builder.scan(tmp_path) == 2
+    assert store.ids == ["ID_2", "ID_1", "ID_3"] and np.array_equal(store.sds, sds)
+    assert builder.build(input_tvar()).sd_dataframe()[["ID_1", "ID_5"]].values.tolist() == [[7, 5], [7, 10], [7, 1e5]]
+    os.remove(tmp_path / "ID_5_res" / "ID_5.tvar.sim")
+
+    # Results of removed files are removed
+    os.remove(tmp_path / "ID_3_res" / "ID_3.tvar.sim")
+    assert builder.scan(tmp_path) == 0
+    assert builder.build(input_tvar()).ids == ["ID_2", "ID_1"]
+    assert SummaryBuilder().build(input_tvar()) is None
+
+def test_moved_results(tmp_path, write_tvar_sim):
+    shard_folder = tmp_path / "shards" / "shard_1"
+    write_tvar_sim(shard_folder, "ID_1", [1, 2, 1e5])
+    builder = SummaryBuilder()
+    progress = SimpleNamespace(results_paths={"ID_1": shard_folder / "ID_1_res" / "ID_1.tvar.sim"})
+    builder.SETTLE_TIME = 0
+    assert builder.update(progress) == 1
+
+    # The results moved from the folder of the shard are not read again, only their path is updated
+    os.replace(shard_folder / "ID_1_res", tmp_path / "ID_1_res")
+    progress.results_paths["ID_1"] = tmp_path / "ID_1_res" / "ID_1.tvar.sim"
+    assert builder.update(progress) == 0
+    assert builder.paths == {"ID_1": tmp_path / "ID_1_res" / "ID_1.tvar.sim"}
+
+    # Paths are also updated when the folder is scanned
+    os.replace(tmp_path / "ID_1_res", shard_folder / "ID_1_res")
+    assert builder.scan(tmp_path) == 0
+    assert builder.paths == {"ID_1": shard_folder / "ID_1_res" / "ID_1.tvar.sim"}
@@ -0,0 +1,66 @@
+import argparse
+import pickle
+import sys
+from pathlib import Path
+
+
+def parse_args(args=None):
+    """
+    Parse the command line arguments of IsoDesign.
+
+    :param args: list of arguments (sys.argv[1:] if None)
+    """
+    parser = argparse.ArgumentParser(prog="isodesign",
+                                     description="IsoDesign command line interface.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    estimate = subparsers.add_parser("estimate",
+                                     help="Estimate the cost of a design before generating its combinations.")
+    estimate.add_argument("session_file", type=Path,
+                          help='IsoDesign session file (".pkl") containing the configured isotopomers.')
+    estimate.add_argument("--mode", choices=["influx_s", "influx_i"], default=None,
+                          help="influx_si mode whose previous timings are used to estimate the simulation time.")
+    estimate.add_argument("--max-time", type=float, default=None,
+                          help="Maximal simulation time (in hours). Default: 24 hours.")
+    return parser.parse_args(args)
+
+def estimate(session_file, mode=None, max_time=None):
+    """
+    Print the estimated cost of the design stored in a session file. 
+
+    :param session_file: path to the session file
+    :param mode: influx_si mode ("influx_s" or "influx_i")
+    :param max_time: maximal simulation time in hours
+
+    :return: exit code, 1 if the estimated simulation time exceeds the maximal time
+    """
+    with open(session_file, "rb") as file:
+        process_object = pickle.load(file)
+
+    cost = process_object.estimate_design_cost(influx_mode=mode)
+    max_time = max_time * 3600 if max_time is not None else process_object.MAX_SIMULATION_TIME
+
+    for substrate, count in cost.combinations_per_substrate.items():
+        print(f"{substrate}\t{count} combinations")
+    print(f"Total\t{cost.nb_combinations} combinations")
+    print(f"Estimated memory\t{cost.memory_size / 1e6:.1f} MB")
+    print(f"Estimated linp files size\t{cost.linp_files_size / 1e6:.1f} MB")
+
+    if cost.simulation_time is None:
+        print("Estimated simulation time\tunknown (no previous run has been timed)")
+        return 0
+    
+    print(f"Estimated simulation time\t{cost.simulation_time / 3600:.1f} h")
+    if cost.simulation_time > max_time:
+        print(f"The estimated simulation time exceeds {max_time / 3600:.1f} h.", file=sys.stderr)
+        return 1
+    return 0
+
+def main(args=None):
+    """ 
+    Main routine of the command line interface.
+    """
+    args = parse_args(args)
+    
+    if args.command == "estimate":
+        return estimate(args.session_file, args.mode, args.max_time)
@@ -1,6 +1,8 @@
 import streamlit as st
 from sess_i.base.main import SessI
-import pandas as pd
+
+# Number of combinations displayed per page
+COMBINATIONS_PAGE_SIZE = 500
 
 #############
 # FUNCTIONS #
@@ -18,6 +20,21 @@ def get_carbon_length(substrate):
         return carbon_length[substrate]
 
         
+def select_page(nb_combinations, key):
+    """
+    Display a page selector when the combinations do not fit in a single page.
+
+    :param nb_combinations: number of combinations to display
+    :param key: key of the widget
+    :return: position of the first combination of the selected page
+    """
+    nb_pages = max(1, -(-nb_combinations // COMBINATIONS_PAGE_SIZE))
+    if nb_pages == 1:
+        return 0
+    page = st.number_input(f"Page (1 - {nb_pages}, {COMBINATIONS_PAGE_SIZE} combinations per page)", 
+                           min_value=1, max_value=nb_pages, value=1, step=1, key=key)
+    return (int(page) - 1) * COMBINATIONS_PAGE_SIZE
+
 def remove_rows(indexes : list):
     """
     Function for deleting undesired rows (i.e. linp file configuration) 
@@ -41,10 +58,9 @@ def reintegrate_rows(indexes : list):
     # Register the widget status
     session.register_widgets({"reintegrate_combination": True})
 
-    # Create a list of keys to reintegrate by getting the keys from linp_to_remove
-    # corresponding to the selected indexes.
-    keys_to_reintegrate = [
-            list(process_object.linp_to_remove.keys())[index] for index in indexes]
+    # Rows of the combinations store corresponding to the selected indexes 
+    # (removed combinations are displayed in the order of their rows)
+    keys_to_reintegrate = process_object.combinations.disabled_rows[indexes]
     # Call the reintegrate_linp_configuration method to reintegrate the selected 
     # linp DataFrames back into the linp_dataframes list.
     process_object.reintegrate_linp_configuration(keys_to_reintegrate)
@@ -136,11 +152,70 @@ else:
                         except ValueError as e:
                             st.error(f"An error occurred: {e}")
             
+            # Combinations that do not respect the constraints are not generated
+            with st.expander("Constraints"):
+                max_price, max_labeled_inputs = st.columns(2)
+                with max_price:
+                    max_price = st.text_input("Maximal total price", 
+                                              key="max_price", 
+                                              value=None)
+                with max_labeled_inputs:
+                    max_labeled_inputs = st.text_input("Maximal number of labeled inputs", 
+                                                       key="max_labeled_inputs", 
+                                                       value=None)
+                enrichment_ranges = {}
+                for substrate_name in process_object.netan["input"]:
+                    enrichment_range = st.slider(f"{substrate_name} 13C enrichment", 
+                                                 min_value=0.0, 
+                                                 max_value=1.0, 
+                                                 value=(0.0, 1.0), 
+                                                 key=f"enrichment_{substrate_name}",
+                                                 help="Mean fraction of labelled atoms of the substrate.")
+                    # The full range does not constrain the combinations
+                    if enrichment_range != (0.0, 1.0):
+                        enrichment_ranges[substrate_name] = enrichment_range
+            try:
+                process_object.set_constraints(max_price=float(max_price) if max_price else None,
+                                               max_labeled_inputs=int(max_labeled_inputs) if max_labeled_inputs else None,
+                                               enrichment_ranges=enrichment_ranges)
+            except ValueError as e:
+                st.error(f"An error occurred: {e}")
+
+            # The full grid can be replaced by a quasi-random sample of the simplex of each substrate
+            design_mode = st.radio("Design mode", 
+                                   ["Full grid", "Quasi-random sampling"], 
+                                   key="design_mode", 
+                                   horizontal=True,
+                                   help="Quasi-random sampling draws a chosen number of combinations uniformly over the possible fractions.\
+                                        It is useful for designs with many isotopomers, whose full grid cannot be simulated.")
+            if design_mode == "Quasi-random sampling":
+                nb_points, sampling_method, seed = st.columns(3)
+                with nb_points:
+                    nb_points = st.number_input("Number of combinations", 
+                                                min_value=1, 
+                                                value=100, 
+                                                key="nb_points")
+                with sampling_method:
+                    sampling_method = st.selectbox("Sampling method", 
+                                                   ["sobol", "halton", "latin hypercube"], 
+                                                   key="sampling_method")
+                with seed:
+                    seed = st.number_input("Seed", 
+                                           min_value=0, 
+                                           value=0, 
+                                           key="sampling_seed",
+                                           help="The same seed gives the same combinations.")
+
             submit = st.button("Submit",
                             key="submit_button")
 
         with configured_substrates:
             st.header("Configured label inputs")
+            # Isotopomers of symmetric substrates giving the same results as another isotopomer
+            for substrate_name, labellings in process_object.find_equivalent_isotopomers().items():
+                for labelling, equivalent_labelling in labellings.items():
+                    st.warning(f"{substrate_name}: isotopomer {labelling} is equivalent to isotopomer {equivalent_labelling} "
+                               "(symmetric molecule). It will not be used to generate the combinations.")
             for substrate_name in process_object.isotopomers.keys():
                 # Create an expander to display the isotopomers for each labels input
                 with st.expander(f"{substrate_name}", expanded=True):
@@ -157,11 +232,37 @@ else:
                                                 args=(isotopomer.name, isotopomer.labelling))
                     
         
+    # Estimate the cost of the design before generating its combinations
+    too_long_design = False
+    try:
+        # Timings of the influx_si mode selected on the simulation page (if any) are used
+        influx_mode = session.get_widget("mode", page="3_Run_simulations.py")
+        cost = process_object.estimate_design_cost(influx_mode=influx_mode.split(" ")[0] if influx_mode else None)
+        st.info(f"{cost.nb_combinations} combinations in the full grid "
+                f"({', '.join(f'{substrate}: {count}' for substrate, count in cost.combinations_per_substrate.items())}). "
+                f"Estimated memory: {cost.memory_size / 1e6:.1f} MB, estimated linp files size: {cost.linp_files_size / 1e6:.1f} MB"
+                + (f", estimated simulation time: {cost.simulation_time / 3600:.1f} h." if cost.simulation_time is not None else "."))
+        
+        if design_mode == "Full grid" and cost.simulation_time is not None and cost.simulation_time > process_object.MAX_SIMULATION_TIME:
+            too_long_design = True
+            st.warning(f"Simulating this design would take about {cost.simulation_time / 86400:.1f} days. "
+                       "Consider reducing the number of intervals or isotopomers.")
+            confirm_design = st.checkbox("Generate the combinations anyway",
+                                         key="confirm_long_design")
+    except ValueError as e:
+        st.error(f"An error occurred: {e}")
+        
     if submit:
         session.register_widgets({"submit_button": submit})
         # Generate the combinations of isotopomers
         try:
-            process_object.generate_combinations()
+            if design_mode == "Quasi-random sampling":
+                process_object.sample_combinations(int(nb_points), sampling_method, int(seed))
+            else:
+                if too_long_design and not confirm_design:
+                    raise ValueError("The estimated simulation time of this design is too long. "
+                                     "Please confirm the generation of the combinations.")
+                process_object.generate_combinations()
             process_object.configure_linp_files()
         except ValueError as e:
             st.error(f"An error occurred: {e}")
@@ -172,6 +273,13 @@ else:
    
     if process_object.linp_dataframes:
         st.info(f"{len(process_object.linp_dataframes)} combinations were generated.")
+        # A sample can be extended with the next points of its sequence, the previous combinations being kept
+        if design_mode == "Quasi-random sampling" and st.button("Add combinations to the sample", key="extend_sample"):
+            try:
+                process_object.sample_combinations(int(nb_points), extend=True)
+                st.rerun()
+            except ValueError as e:
+                st.error(f"An error occurred: {e}")
         # Creates two columns: one for displaying combinations and one for submitting simulations
         show_comb, go_simulations = st.columns([1, 7])
         with show_comb:
@@ -188,35 +296,35 @@ else:
 
     # If the show_combinations button is clicked, the combinations are displayed in a dataframe
     if session.widget_space["show_combinations"]: 
-        # Display the combinations in a dataframe
-        df = pd.DataFrame(process_object.linp_dataframes.values(),
-                            columns=["Specie", "Isotopomer", "Value", "Price"])
-        df.insert(0, "ID", process_object.linp_dataframes.keys())
-        
-        df_combinations=st.dataframe(df, 
+        # Only the combinations of the selected page are built
+        start = select_page(len(process_object.linp_dataframes), "combinations_page")
+        df_combinations=st.dataframe(process_object.get_combinations(start, start + COMBINATIONS_PAGE_SIZE), 
                     hide_index=True, 
                     width="stretch",
                     on_select="rerun",
                     selection_mode="multi-row",
                     key="df_combinations")
         
-        remove_combination = st.button("Remove selected combination(s)",
-                                on_click=remove_rows,
-                                args=[df_combinations.selection.rows],
-                                key="remove_combination")
+        remove, undo = st.columns([1, 7])
+        with remove:
+            # Selected rows are positions in the page
+            remove_combination = st.button("Remove selected combination(s)",
+                                    on_click=remove_rows,
+                                    args=[[start + row for row in df_combinations.selection.rows]],
+                                    key="remove_combination")
+        with undo:
+            # Removals and reintegrations are recorded in the combinations store
+            st.button("Undo last change",
+                      on_click=process_object.undo_linp_configuration,
+                      disabled=not process_object.combinations.history,
+                      key="undo_combination")
        
     # If the remove_combination button is clicked, the selected combinations to remove are displayed in a dataframe
-        if process_object.linp_to_remove:
+        if len(process_object.combinations.disabled_rows):
             st.header("Removed combinations") 
-            # Display the removed combinations in a dataframe
-            df_unused = pd.DataFrame()
-            for linp_id in process_object.linp_to_remove.values():
-                df = pd.DataFrame(
-                    linp_id.values(),
-                    columns=["Specie", "Isotopomer", "Value", "Price"]
-                )
-                df.insert(0, "ID", linp_id.keys())
-                df_unused = pd.concat([df_unused, df])
+            # Display the removed combinations of the selected page in a dataframe
+            removed_start = select_page(len(process_object.combinations.disabled_rows), "removed_combinations_page")
+            df_unused = process_object.get_combinations(removed_start, removed_start + COMBINATIONS_PAGE_SIZE, enabled=False)
            
             df_unused_combs = st.dataframe(df_unused, 
                         hide_index=True, 
@@ -226,11 +334,11 @@ else:
 
             reintegrate_combination = st.button("Reintegrate selected combination(s)",
                                             on_click=reintegrate_rows,
-                                            args=[df_unused_combs.selection.rows],
+                                            args=[[removed_start + row for row in df_unused_combs.selection.rows]],
                                             key="reintegrate_combination")
     # If the simulation_button is clicked, the linp files are generated and the user is redirected to the simulation options page
     if session.widget_space["simulation_button"]:  
-        process_object.clear_previous_linp()
+        # Only the new or changed linp files are written, the obsolete ones are deleted
         process_object.generate_linp_files()    
         process_object.generate_vmtf_file()
         process_object.copy_files()
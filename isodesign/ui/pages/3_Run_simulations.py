@@ -1,3 +1,4 @@
+import os
 import streamlit as st
 import time
 from sess_i.base.main import SessI
@@ -7,6 +8,9 @@ import logging
 
 logger = logging.getLogger("IsoDesign")
 
+# Time (in seconds) between two refreshes of the progress of the simulation
+PROGRESS_REFRESH_INTERVAL = 2
+
 #############
 # FUNCTIONS #
 #############
@@ -43,28 +47,40 @@ def execute_simulation():
     if ctx:
         add_script_run_ctx(st.session_state.th) #Thread.current_thread())
     try:
-        st.session_state["subprocess"] = process_object.influx_simulation(command_list)
-        while True:  
-            # Check if the subprocess is still running
-            if st.session_state["subprocess"].poll() is not None:
-                if st.session_state["subprocess"].returncode != 0 :
-                    process_object.check_err_files()
-                    # Read the error message from the stderr file
-                    stderr_output = st.session_state["subprocess"].stderr.read()
-                    # Extract the last line of the error message to display it to the user
-                    error_message = stderr_output.strip().split('\n')[-1]
-                    logger.error(f"An error has occured during the simulation: {stderr_output}")
-                    raise Exception(error_message)
-                return
+        st.session_state["subprocess"] = process_object.influx_simulation(command_list, nb_shards, max_workers, cpu_affinity)
+        # Wait for the end of the simulation without polling 
+        # (the error output is read and logged while the simulation runs)
+        if st.session_state["subprocess"].wait() != 0:
+            process_object.check_err_files()
+            stderr_output = st.session_state["subprocess"].stderr_output
+            # Extract the last line of the error message to display it to the user
+            error_message = stderr_output.strip().split('\n')[-1]
+            logger.error(f"An error has occured during the simulation: {stderr_output}")
+            raise Exception(error_message)
     except Exception as e:
         st.error(f"An error occured: {e}")
         return
 
-def start_simulation():
+def show_progress(progress_bar, progress):
+    """
+    Display the progress of the simulation (see SimulationProgress.snapshot).
+    """
+    text = f"{progress['completed']}/{progress['total']} combinations simulated"
+    if progress["combinations_per_minute"]:
+        text += f" ({progress['combinations_per_minute']:.1f} combinations/min"
+        text += f", remaining time: {time.strftime('%H:%M:%S', time.gmtime(progress['eta']))})" if progress["eta"] is not None else ")"
+    if progress["stragglers"]:
+        text += f". Slow combinations: {', '.join(progress['stragglers'][:5])}"
+    progress_bar.progress(progress["completed"] / max(progress["total"], 1), text=text)
+
+def start_simulation(linp_to_simulate):
     """
     Launch the simulation task in a separate thread and 
     wait for its completion. Ensures that the Streamlit 
     runtime context is properly attached to the thread.
+    The progress of the simulation is displayed while waiting 
+    and the results are ingested as they arrive (preview in the 
+    'Analyze results' page).
     """
     st.session_state.running = True
     task_thread = Thread(target=execute_simulation)
@@ -72,9 +88,16 @@ def start_simulation():
     st.session_state.th=task_thread
     # Attach the context to the thread
     add_script_run_ctx(task_thread)  
+    progress = process_object.track_simulation_progress(linp_to_simulate)
+    progress_bar = st.progress(0.0, text="Starting the simulation...")
     task_thread.start()
-    # Wait for the thread to complete before continuing
-    task_thread.join()
+    # Wait for the thread to complete before continuing, the progress being refreshed periodically
+    while task_thread.is_alive():
+        task_thread.join(timeout=PROGRESS_REFRESH_INTERVAL)
+        show_progress(progress_bar, progress.snapshot())
+        process_object.update_summary(progress)
+    progress.stop()
+    show_progress(progress_bar, progress.snapshot())
 
 def interrupt_simulation():
     """
@@ -83,6 +106,7 @@ def interrupt_simulation():
     """
     st.session_state.running = False
     st.session_state["subprocess"].terminate()
+    session.object_space["process_object"].discard_partial_summary()
 
 ########
 # MAIN #
@@ -187,23 +211,75 @@ else:
                                             on_click=delete_option,
                                             args=(option,))
 
-    st.info(f"{len(process_object.linp_dataframes)} combinations will be simulated.")
+    with st.container(border=True):
+        # The combinations can be split in shards simulated by concurrent influx_si processes
+        nb_shards = st.number_input("Number of shards", 
+                                    key="nb_shards",
+                                    min_value=1,
+                                    value=1,
+                                    help="Number of parts in which the combinations are split. "
+                                         "Each part is simulated by its own influx_si process.")
+        max_workers = st.number_input("Maximal number of shards simulated at the same time", 
+                                      key="max_workers",
+                                      min_value=1,
+                                      value=os.cpu_count(),
+                                      disabled=nb_shards == 1)
+        cpu_affinity = st.checkbox("Bind each shard to its own CPU cores", 
+                                   key="cpu_affinity",
+                                   value=False,
+                                   disabled=nb_shards == 1)
+        session.register_widgets({"nb_shards": nb_shards, "max_workers": max_workers, "cpu_affinity": cpu_affinity})
+
+    st.info(f"{len(process_object.vmtf_element_dict['linp'])} combinations will be simulated "
+            f"({len(process_object.linp_dataframes)} combinations, identical linp files are simulated once).")
     st.info(f"Command to run: {command_list}")
 
+    # An interrupted or failed run can be resumed: only the combinations without results are simulated
+    resume = st.checkbox("Resume the previous run", 
+                         key="resume",
+                         value=False,
+                         help="Keep the results of the combinations already simulated "
+                              "and only simulate the remaining combinations.")
+    # Results of combinations already simulated with the same model and options are reused
+    use_cache = st.checkbox("Reuse cached results", 
+                            key="use_cache",
+                            value=True,
+                            help="Results of the combinations already simulated with the same model "
+                                 "and the same influx_si options (in any session) are not simulated again.")
+    # The summary is always exported in parquet, feather and tsv formats, the excel file is optional
+    excel_summary = st.checkbox("Export the summary in an Excel file", 
+                                key="excel_summary",
+                                value=False,
+                                help="The Excel file (rows with missing values highlighted) is written "
+                                     "in the background and can take a long time for many combinations.")
+    session.register_widgets({"resume": resume, "use_cache": use_cache, "excel_summary": excel_summary})
+
     submit, interrupt = st.columns([1, 1])
     with submit:
         if st.button("Start simulation", key="start_button"):
             with st.spinner("Simulating..."):
-                # if there is a previous run, clear it
-                process_object.clear_previous_results()
-                # Clear the summary dataframe if it exists
-                if process_object.summary_dataframe is not None:
+                # if there is a previous run, clear it (unless it is resumed)
+                process_object.set_result_cache(use_cache)
+                linp_to_simulate = process_object.prepare_simulation(resume, command_list)
+                # Clear the results of the previous summary if they exist
+                if process_object.results is not None:
                     process_object.summary_dataframe = None
-                start_simulation()
+                start_time = time.time()
+                if linp_to_simulate:
+                    start_simulation(linp_to_simulate)
+                    if st.session_state["subprocess"] is None or st.session_state["subprocess"].returncode != 0:
+                        process_object.discard_partial_summary()
+                else:
+                    st.session_state["subprocess"] = None
+                    st.info("All combinations have already been simulated.")
                 # Check if the subprocess has completed
-                if st.session_state["subprocess"]:
-                    if st.session_state["subprocess"].returncode == 0:
-                        process_object.generate_summary()
+                if not linp_to_simulate or st.session_state["subprocess"]:
+                    if not linp_to_simulate or st.session_state["subprocess"].returncode == 0:
+                        # Timings are used to estimate the simulation time of future designs
+                        process_object.record_simulation_time(time.time() - start_time, len(linp_to_simulate))
+                        process_object.cache_simulation_results(linp_to_simulate)
+                        # The excel export is checked in the 'Analyze results' page (errors are shown there)
+                        st.session_state["excel_export"] = process_object.generate_summary(excel=excel_summary)
                         process_object.save_process_to_file()
                         st.success("Simulation completed.")
                         logger.info(f"Simulation with {mode} has been completed successfully.\n")
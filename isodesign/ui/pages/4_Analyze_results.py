@@ -29,7 +29,7 @@ def display_dataframe(count):
                 else process_object.all_scores[count]["filters"]["fluxes_names"] 
         
         fluxes_name.multiselect(label="Fluxes_name", 
-                                options=process_object.summary_dataframe["Name"].drop_duplicates(), 
+                                options=process_object.results.fluxes["Name"].drop_duplicates(), 
                                 label_visibility="collapsed",
                                 placeholder= "Flux",
                                 key=f"selected_flux_{count}")
@@ -257,9 +257,22 @@ process_object = session.object_space['process_object']
 
 if not process_object:
     st.warning("Please load a metabolic network model in 'Upload data' page.")
-elif process_object.summary_dataframe is None:
+elif process_object.results is None:
     st.warning("Please run the simulation in 'Simulation options' page.")
 else:
+    # Excel summary written in the background (see Process.generate_summary)
+    excel_export = st.session_state.get("excel_export")
+    if excel_export is not None:
+        if not excel_export.done():
+            st.info("The Excel summary is being written in the background.")
+        else:
+            st.session_state["excel_export"] = None
+            if excel_export.exception() is not None:
+                st.error(f"The Excel summary could not be written: {excel_export.exception()}")
+    # Results ingested while the simulation is running (see Process.update_summary)
+    if process_object.summary_builder is not None:
+        st.info(f"Preview of the results of the {len(process_object.results)} combinations simulated so far. "
+                "The results are updated until the end of the simulation.")
     # Checks if the "scores" key does not exist in st.session_state. If it does not exist, 
     # it is initialised with [1] if process_object.all_scores is empty (no pickle file imported), 
     # otherwise it is filled with the values from process_object.all_scores in the form of a list.   